@@ -0,0 +1,193 @@
+"""
+Stand-ins for the pmd, snyk, trufflehog and ggshield executables. They accept the command
+lines the tools build, take time proportional to the files they read and print output in
+the real tools' formats and roughly their volume, so the benchmarks measure our side of
+the pipeline (process handling, parsing, caching) without the real scanners installed.
+
+Latency is tuned with FAKE_SCANNER_STARTUP (seconds per invocation, default 0.2, like a
+JVM or Node start) and FAKE_SCANNER_FILE_COST (seconds per file read, default 0.0005).
+
+    python benchmarks/fake_scanners.py install <bin dir>   # write the executables
+"""
+import hashlib
+import json
+import os
+import re
+import stat
+import sys
+import time
+from typing import Dict, Iterator, List, Tuple
+
+TOOLS = ("pmd", "snyk", "trufflehog", "ggshield")
+SOURCE_EXTENSIONS = (".java", ".py", ".js", ".ts", ".go", ".rb", ".php", ".cs")
+PMD_RULES = ("UnusedLocalVariable", "AvoidCatchingGenericException", "SystemPrintln", "HardCodedCryptoKey",
+             "AvoidDuplicateLiterals", "MethodArgumentCouldBeFinal", "LocalVariableCouldBeFinal")
+AWS_KEY = re.compile(r"\bAKIA[0-9A-Z]{16}\b")
+
+
+def install(bin_dir: str) -> List[str]:
+    """Write one executable per scanner into `bin_dir`; returns their paths."""
+    os.makedirs(bin_dir, exist_ok=True)
+    script = os.path.abspath(__file__)
+    paths = []
+    for tool in TOOLS:
+        path = os.path.join(bin_dir, tool)
+        with open(path, "w") as f:
+            f.write(f'#!/bin/sh\nexec "{sys.executable}" "{script}" {tool} "$@"\n')
+        os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+        paths.append(path)
+    return paths
+
+
+def _latency(files: int) -> None:
+    time.sleep(float(os.getenv("FAKE_SCANNER_STARTUP") or 0.2) + files * float(os.getenv("FAKE_SCANNER_FILE_COST") or 0.0005))
+
+
+def _walk(paths: List[str], extensions: Tuple[str, ...] = ()) -> Iterator[str]:
+    for path in paths:
+        if os.path.isfile(path):
+            if not extensions or path.endswith(extensions):
+                yield path
+            continue
+        for directory, dirs, files in os.walk(path):
+            dirs[:] = [d for d in dirs if d not in (".git", "node_modules")]
+            for name in sorted(files):
+                if not extensions or name.endswith(extensions):
+                    yield os.path.join(directory, name)
+
+
+def _read_lines(path: str) -> List[str]:
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        return f.read().split("\n")
+
+
+def _option(args: List[str], name: str, default=None):
+    for i, arg in enumerate(args):
+        if arg == name and i + 1 < len(args):
+            return args[i + 1]
+        if arg.startswith(name + "="):
+            return arg.split("=", 1)[1]
+    return default
+
+
+def _sarif(driver: str, results: List[Dict]) -> Dict:
+    return {"version": "2.1.0", "runs": [{"tool": {"driver": {"name": driver}}, "results": results}]}
+
+
+def _sarif_result(rule: str, level: str, uri: str, line: int, message: str) -> Dict:
+    return {"ruleId": rule, "level": level, "message": {"text": message},
+            "locations": [{"physicalLocation": {"artifactLocation": {"uri": uri}, "region": {"startLine": line}}}]}
+
+
+def pmd(args: List[str]) -> int:
+    """`pmd check -f sarif -R <rules> (-d <dirs> | --file-list <file>) -r <report>`: ~1 violation per 10 lines."""
+    if "--file-list" in args:
+        with open(_option(args, "--file-list")) as f:
+            sources = [line.strip() for line in f if line.strip()]
+    else:
+        sources = (_option(args, "-d") or ".").split(",")
+    results = []
+    files = list(_walk(sources, (".java",)))
+    for path in files:
+        lines = _read_lines(path)
+        for number in range(3, len(lines), 10):
+            rule = PMD_RULES[(number + len(path)) % len(PMD_RULES)]
+            results.append(_sarif_result(rule, "warning", os.path.abspath(path), number,
+                                         f"{rule}: avoid this construct in {os.path.basename(path)}"))
+    _latency(len(files))
+    with open(_option(args, "-r"), "w") as f:
+        json.dump(_sarif("PMD", results), f)
+    return 4 if results else 0
+
+
+def snyk(args: List[str]) -> int:
+    if args[:2] == ["code", "test"]:
+        files = list(_walk(["."], SOURCE_EXTENSIONS))
+        results = []
+        for path in files:
+            lines = _read_lines(path)
+            for number in range(5, len(lines), 40):
+                results.append(_sarif_result("javascript/NoHardcodedCredentials" if path.endswith(".js") else
+                                             "java/Sqli", "error", os.path.relpath(path), number,
+                                             "Unsanitized input flows into a sensitive sink."))
+        _latency(len(files))
+        print(json.dumps(_sarif("SnykCode", results)))
+        return 1 if results else 0
+    if args[:1] == ["test"]:
+        manifest = _option(args, "--file")
+        with open(manifest, "r", encoding="utf-8") as f:
+            text = f.read()
+        packages = re.findall(r"([A-Za-z][\w.-]*)[\"']?(?:==|\s\(|\": \"|</artifactId><version>| v)([\d.]+)", text)
+        vulnerabilities = []
+        for name, version in packages:
+            digest = int(hashlib.sha256(name.encode("utf-8")).hexdigest(), 16)
+            if digest % 10 == 0:
+                for path in range(digest % 3 + 1):  # one entry per dependency path, as snyk reports them
+                    vulnerabilities.append({
+                        "id": f"SNYK-BENCH-{digest % 100000}", "packageName": name, "version": version,
+                        "severity": ("low", "medium", "high", "critical")[digest % 4],
+                        "title": "Prototype Pollution", "fixedIn": [version + ".1"],
+                        "from": ["bench"] * (path + 2),
+                    })
+        _latency(len(packages))
+        print(json.dumps({"vulnerabilities": vulnerabilities, "ok": not vulnerabilities,
+                          "displayTargetFile": manifest, "dependencyCount": len(packages)}))
+        return 1 if vulnerabilities else 0
+    return 2
+
+
+def _secrets(paths: List[str]) -> Tuple[int, List[Tuple[str, int, str]]]:
+    files = 0
+    found = []
+    for path in _walk(paths):
+        files += 1
+        for number, line in enumerate(_read_lines(path), start=1):
+            for match in AWS_KEY.finditer(line):
+                found.append((path, number, match.group(0)))
+    return files, found
+
+
+def trufflehog(args: List[str]) -> int:
+    """`trufflehog filesystem <paths...> --json`: one JSON object per line."""
+    files, found = _secrets([a for a in args[1:] if not a.startswith("--")])
+    _latency(files)
+    for path, line, raw in found:
+        print(json.dumps({
+            "SourceMetadata": {"Data": {"Filesystem": {"file": path, "line": line}}},
+            "SourceName": "trufflehog - filesystem", "DetectorName": "AWS", "DecoderName": "PLAIN",
+            "Verified": False, "Raw": raw, "Redacted": raw[:8], "ExtraData": {"account": "123456789012"},
+        }))
+    return 0
+
+
+def ggshield(args: List[str]) -> int:
+    """`ggshield secret scan path <paths...> [--recursive] --yes --json`."""
+    paths = [a for a in args[3:] if not a.startswith("--")]
+    files, found = _secrets(paths)
+    _latency(files)
+    # A scanned directory reports paths relative to it, scanned files as given
+    root = paths[0] if len(paths) == 1 and os.path.isdir(paths[0]) else None
+    entities: Dict[str, List[Dict]] = {}
+    for path, line, raw in found:
+        entities.setdefault(os.path.relpath(path, root) if root else path, []).append({
+            "type": "AWS Keys", "validity": "unknown", "policy": "Secrets detection",
+            "occurrences": [{"match": raw, "type": "client_id", "line_start": line, "line_end": line}],
+        })
+    print(json.dumps({"type": "path_scan", "total_incidents": len(found), "total_occurrences": len(found),
+                      "entities_with_incidents": [{"filename": f, "incidents": i} for f, i in entities.items()]}))
+    return 1 if found else 0
+
+
+def main(argv: List[str]) -> int:
+    if argv[:1] == ["install"]:
+        print("\n".join(install(argv[1])))
+        return 0
+    tool, args = argv[0], argv[1:]
+    if "--version" in args:
+        print(f"{tool} 0.0.0-benchmark")
+        return 0
+    return {"pmd": pmd, "snyk": snyk, "trufflehog": trufflehog, "ggshield": ggshield}[tool](args)
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
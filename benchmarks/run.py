@@ -0,0 +1,217 @@
+"""
+Benchmark the clone path and each scanner tool on synthetic repositories.
+
+    python -m benchmarks.run --scales small,medium --repeat 3 --output results.json
+    python -m benchmarks.run --baseline results.json   # exit 1 on regressions
+
+The scanners are replaced by the stubs in benchmarks/fake_scanners.py and every cache is
+disabled, so the numbers cover our own overhead for a fixed scanner cost. Results are
+written as JSON together with the git commit and Python version they were measured on.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Dict, List, Optional
+
+from benchmarks import fake_scanners
+from benchmarks.synthetic_repo import SCALES, SyntheticRepo, generate
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@dataclass
+class BenchmarkResult:
+    scale: str
+    benchmark: str
+    runs: List[float] = field(default_factory=list)  # wall-clock seconds
+    child_cpu: float = 0.0  # user + system seconds of the subprocesses, summed over the runs
+    output_bytes: int = 0
+    error: Optional[str] = None
+
+    @property
+    def median(self) -> Optional[float]:
+        return statistics.median(self.runs) if self.runs else None
+
+    def to_json(self) -> Dict:
+        return dict(asdict(self), median=self.median, min=min(self.runs) if self.runs else None)
+
+
+def _environment(work_dir: str) -> None:
+    """Point PATH at the stub scanners and every cache at the work directory (before the tools are imported)."""
+    bin_dir = os.path.join(work_dir, "bin")
+    fake_scanners.install(bin_dir)
+    os.environ["PATH"] = bin_dir + os.pathsep + os.environ.get("PATH", "")
+    os.environ.update({
+        "SCAN_CACHE_DISABLED": "1", "INCREMENTAL_SCAN_DISABLED": "1", "DEPENDENCY_BACKEND": "snyk",
+        "SNYK_ORG": "benchmark", "SNYK_TOKEN": "benchmark", "GITGUARDIAN_API_KEY": "benchmark",
+        "SCAN_CACHE_DIR": os.path.join(work_dir, "scan-cache"), "PMD_CACHE_DIR": os.path.join(work_dir, "pmd-cache"),
+        "REPO_CACHE_DIR": os.path.join(work_dir, "mirrors"), "BACKUP_DIR": os.path.join(work_dir, "backups"),
+    })
+    sys.path.insert(0, os.path.join(ROOT, "src"))
+
+
+def _benchmarks(repo: SyntheticRepo, work_dir: str) -> Dict[str, Callable[[int], str]]:
+    """Benchmark name -> function of the run number returning the tool output."""
+    checkout = os.path.join(work_dir, f"checkout-{repo.scale.name}")
+    url = "file://" + repo.path
+
+    def clone(use_cache: bool, fresh_mirror: bool) -> Callable[[int], str]:
+        def run(attempt: int) -> str:
+            from appsec_agents.tools.git_cloner_tool import CloneGitHubRepoTool
+            cache_dir = os.path.join(work_dir, "mirrors", f"{repo.scale.name}-{attempt if fresh_mirror else 'warm'}")
+            target = os.path.join(work_dir, f"clone-{repo.scale.name}")
+            output = CloneGitHubRepoTool(use_cache=use_cache, cache_dir=cache_dir)._run(url, target)
+            shutil.rmtree(target, ignore_errors=True)
+            return output
+        return run
+
+    def tool(factory: Callable[[], object], *args) -> Callable[[int], str]:
+        return lambda attempt: factory()._run(checkout, *args)
+
+    def pmd():
+        from appsec_agents.tools.sca_pmd_scan import PMDStaticCodeAnalysisTool
+        return PMDStaticCodeAnalysisTool(use_cache=False, incremental=False)
+
+    def snyk_code():
+        from appsec_agents.tools.sca_tool import StaticCodeAnalysisTool
+        return StaticCodeAnalysisTool(use_cache=False)
+
+    def dependencies():
+        from appsec_agents.tools.dependency_scanner import DependencyVulnScanTool
+        return DependencyVulnScanTool(use_cache=False)
+
+    def trufflehog():
+        from appsec_agents.tools.secret_tool import SecretDetectionTool
+        return SecretDetectionTool(use_cache=False, incremental=False)
+
+    def ggshield():
+        from appsec_agents.tools.secret_tool_ggshield import GgShieldTool
+        return GgShieldTool()
+
+    def code_patterns():
+        from appsec_agents.tools.code_catcher_tool import CodePatternMatcherTool
+        return CodePatternMatcherTool(incremental=False)
+
+    if not os.path.isdir(checkout):
+        subprocess.run(["git", "clone", "-q", repo.path, checkout], check=True)
+    return {
+        "clone_cold_mirror": clone(use_cache=True, fresh_mirror=True),
+        "clone_warm_mirror": clone(use_cache=True, fresh_mirror=False),
+        "clone_direct": clone(use_cache=False, fresh_mirror=False),
+        "pmd": tool(pmd),
+        "snyk_code": tool(snyk_code),
+        "dependencies": tool(dependencies),
+        "trufflehog": tool(trufflehog),
+        "ggshield": tool(ggshield),
+        "code_patterns": tool(code_patterns, r"eval\(|exec\(|AKIA[0-9A-Z]{16}"),
+    }
+
+
+def _child_cpu() -> float:
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def run_benchmark(scale: str, name: str, benchmark: Callable[[int], str], repeat: int) -> BenchmarkResult:
+    result = BenchmarkResult(scale, name)
+    for attempt in range(repeat):
+        cpu = _child_cpu()
+        started = time.perf_counter()
+        try:
+            output = benchmark(attempt)
+        except Exception as e:
+            result.error = f"{type(e).__name__}: {e}"
+            break
+        result.runs.append(time.perf_counter() - started)
+        result.child_cpu += _child_cpu() - cpu
+        result.output_bytes = len(output.encode("utf-8"))
+        if output.startswith(("Error", "Failed", "An error")) or "error occurred" in output[:200]:
+            result.error = output[:500]
+            break
+    return result
+
+
+def compare(results: List[BenchmarkResult], baseline: Dict, threshold: float) -> List[str]:
+    """Benchmarks whose median is more than `threshold` slower than in `baseline`."""
+    previous = {(r["scale"], r["benchmark"]): r for r in baseline.get("results", [])}
+    regressions = []
+    for result in results:
+        before = previous.get((result.scale, result.benchmark), {}).get("median")
+        if before and result.median and result.median > before * (1 + threshold):
+            regressions.append(f"{result.scale}/{result.benchmark}: {before:.3f}s -> {result.median:.3f}s "
+                               f"(+{(result.median / before - 1) * 100:.0f}%)")
+    return regressions
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "-C", ROOT, "rev-parse", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scales", default="small", help=f"Comma-separated scales: {', '.join(SCALES)}")
+    parser.add_argument("--only", default="", help="Comma-separated benchmark names to run (default: all)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default=None, help="JSON file for the results (default: stdout)")
+    parser.add_argument("--baseline", default=None, help="Earlier results to compare the medians against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed slowdown before a regression is reported")
+    parser.add_argument("--work-dir", default=None, help="Directory for the repositories (kept between runs)")
+    args = parser.parse_args(argv)
+
+    work_dir = os.path.abspath(args.work_dir or tempfile.mkdtemp(prefix="appsec-bench-"))
+    _environment(work_dir)
+    only = {name for name in args.only.split(",") if name}
+
+    results: List[BenchmarkResult] = []
+    for scale_name in args.scales.split(","):
+        scale = SCALES[scale_name]
+        path = os.path.join(work_dir, f"repo-{scale.name}")
+        started = time.perf_counter()
+        shutil.rmtree(path, ignore_errors=True)
+        repo = generate(path, scale)
+        print(f"Generated {scale.name} repository ({scale.files} files, {scale.commits} commits) "
+              f"in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+        for name, benchmark in _benchmarks(repo, work_dir).items():
+            if only and name not in only:
+                continue
+            result = run_benchmark(scale.name, name, benchmark, args.repeat)
+            status = result.error or f"median {result.median:.3f}s, {result.output_bytes} bytes of output"
+            print(f"{scale.name:<8} {name:<20} {status}", file=sys.stderr)
+            results.append(result)
+
+    report = {
+        "git_commit": _git_commit(), "python": platform.python_version(), "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "scales": {name: asdict(SCALES[name]) for name in args.scales.split(",")},
+        "results": [result.to_json() for result in results],
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print("Regressions:\n" + "\n".join(regressions), file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
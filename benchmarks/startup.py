@@ -0,0 +1,65 @@
+"""
+Cold-start time of the CLI entry points: each command runs in a fresh interpreter and
+the median wall-clock time over `--repeat` runs is reported, as JSON like benchmarks.run.
+
+    python -m benchmarks.startup --repeat 10 --output startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# label -> arguments after `python`; none of them reaches the network or a scanner
+COMMANDS: Dict[str, List[str]] = {
+    "import_main": ["-c", "import appsec_agents.main"],
+    "usage": ["-m", "appsec_agents.main"],
+    "ingest_osv_usage": ["-c", "from appsec_agents.main import ingest_osv; ingest_osv([])"],
+    "batch_help": ["-c", "from appsec_agents.main import batch; batch(['--help'])"],
+    "train_usage": ["-c", "import sys; sys.argv = ['train']; from appsec_agents.main import train; train()"],
+    "replay_usage": ["-c", "import sys; sys.argv = ['replay']; from appsec_agents.main import replay; replay()"],
+    "import_crew": ["-c", "import appsec_agents.crew"],
+    # What train, replay and test pay before they start: CrewBase builds every agent and tool
+    "build_crew": ["-c", "from appsec_agents.crew import AppsecAgents; AppsecAgents()"],
+}
+
+
+def measure(args: List[str], repeat: int) -> List[float]:
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [os.path.join(ROOT, "src"),
+                                                                     os.environ.get("PYTHONPATH")])))
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, *args], env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        runs.append(time.perf_counter() - started)
+    return runs
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.startup", description="CLI cold-start times.")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", default=None, help="JSON file for the results (default: stdout)")
+    args = parser.parse_args(argv)
+
+    results = []
+    for label, command in COMMANDS.items():
+        runs = measure(command, args.repeat)
+        results.append({"benchmark": label, "runs": runs, "median": statistics.median(runs), "min": min(runs)})
+        print(f"{label:<18} median {statistics.median(runs):.3f}s", file=sys.stderr)
+    report = {"python": sys.version.split()[0], "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+              "results": results}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
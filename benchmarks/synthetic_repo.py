@@ -0,0 +1,224 @@
+"""
+Generator of synthetic repositories for the benchmarks: source files in several languages,
+planted secrets at known locations, dependency manifests and a deep git history built
+with `git fast-import`, so even the large scale is created in seconds.
+"""
+import json
+import os
+import random
+import string
+import subprocess
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Tuple
+
+# (language, file extension), in the order they are added as `Scale.languages` grows
+LANGUAGES: List[Tuple[str, str]] = [
+    ("java", ".java"),
+    ("python", ".py"),
+    ("javascript", ".js"),
+    ("go", ".go"),
+    ("ruby", ".rb"),
+    ("config", ".yml"),
+]
+
+
+@dataclass
+class Scale:
+    """Size of a synthetic repository."""
+    name: str
+    files: int
+    languages: int
+    secrets: int
+    dependencies: int  # per manifest
+    commits: int
+    lines_per_file: int = 80
+
+
+SCALES: Dict[str, Scale] = {
+    "small": Scale("small", files=100, languages=3, secrets=5, dependencies=50, commits=50),
+    "medium": Scale("medium", files=1000, languages=5, secrets=25, dependencies=300, commits=500),
+    "large": Scale("large", files=10000, languages=6, secrets=100, dependencies=1000, commits=5000),
+}
+
+
+@dataclass
+class PlantedSecret:
+    file: str
+    line: int
+    value: str
+    in_history_only: bool = False
+
+
+@dataclass
+class SyntheticRepo:
+    path: str
+    scale: Scale
+    files: List[str] = field(default_factory=list)
+    manifests: List[str] = field(default_factory=list)
+    secrets: List[PlantedSecret] = field(default_factory=list)
+
+    def to_json(self) -> Dict:
+        return asdict(self)
+
+
+def aws_key(rng: random.Random) -> str:
+    return "AKIA" + "".join(rng.choices(string.ascii_uppercase + string.digits, k=16))
+
+
+def _source(language: str, index: int, lines: int, rng: random.Random) -> List[str]:
+    body = []
+    for i in range(lines):
+        name = f"value{i}"
+        if language == "java":
+            body.append(f"        int {name} = compute({i}, {rng.randint(0, 9999)});")
+        elif language == "python":
+            body.append(f"    {name} = compute({i}, {rng.randint(0, 9999)})")
+        elif language == "javascript":
+            body.append(f"  const {name} = compute({i}, {rng.randint(0, 9999)});")
+        elif language == "go":
+            body.append(f"\t{name} := compute({i}, {rng.randint(0, 9999)})")
+        elif language == "ruby":
+            body.append(f"    {name} = compute({i}, {rng.randint(0, 9999)})")
+        else:
+            body.append(f"  {name}: {rng.randint(0, 9999)}")
+    if language == "java":
+        return [f"package com.example.m{index % 7};", "", f"public class Service{index} {{",
+                "    public void run() {"] + body + ["    }", "}"]
+    if language == "python":
+        return ["import os", "", "", f"def run_{index}():"] + body
+    if language == "javascript":
+        return [f"function run{index}() {{"] + body + ["}", f"module.exports = run{index};"]
+    if language == "go":
+        return ["package main", "", f"func run{index}() {{"] + body + ["}"]
+    if language == "ruby":
+        return [f"class Service{index}", "  def run"] + body + ["  end", "end"]
+    return [f"service{index}:"] + body
+
+
+def _secret_line(language: str, value: str) -> str:
+    return {
+        "java": f'        String awsKey = "{value}";',
+        "python": f'    AWS_KEY = "{value}"',
+        "javascript": f'  const awsKey = "{value}";',
+        "go": f'\tawsKey := "{value}"',
+        "ruby": f'    aws_key = "{value}"',
+    }.get(language, f"  aws_key: {value}")
+
+
+def _path(language: str, extension: str, index: int) -> str:
+    if language == "java":
+        # Several Maven modules, so PMD sharding has something to split
+        return f"module{index % 4}/src/main/java/com/example/m{index % 7}/Service{index}{extension}"
+    directory = {"python": "app", "javascript": "web/src", "go": "cmd", "ruby": "lib", "config": "config"}[language]
+    return f"{directory}/pkg{index % 20}/file{index}{extension}"
+
+
+def _manifests(languages: List[str], dependencies: int, rng: random.Random) -> Dict[str, str]:
+    def version() -> str:
+        return f"{rng.randint(0, 5)}.{rng.randint(0, 20)}.{rng.randint(0, 30)}"
+
+    manifests = {}
+    names = [f"lib-{i}" for i in range(dependencies)]
+    if "java" in languages:
+        deps = "\n".join(f"    <dependency><groupId>org.example</groupId><artifactId>{n}</artifactId>"
+                         f"<version>{version()}</version></dependency>" for n in names)
+        manifests["pom.xml"] = (f"<project>\n  <groupId>org.example</groupId>\n  <artifactId>bench</artifactId>\n"
+                                f"  <dependencies>\n{deps}\n  </dependencies>\n</project>\n")
+        for module in range(4):
+            manifests[f"module{module}/pom.xml"] = (
+                f"<project>\n  <parent><artifactId>bench</artifactId></parent>\n"
+                f"  <artifactId>module{module}</artifactId>\n</project>\n")
+    if "python" in languages:
+        manifests["requirements.txt"] = "".join(f"{n.replace('-', '_')}=={version()}\n" for n in names)
+    if "javascript" in languages:
+        packages = {n: version() for n in names}
+        manifests["web/package.json"] = json.dumps({"name": "web", "dependencies": packages}, indent=2)
+        manifests["web/package-lock.json"] = json.dumps({
+            "name": "web", "lockfileVersion": 3,
+            "packages": {f"node_modules/{n}": {"version": v} for n, v in packages.items()},
+        }, indent=2)
+    if "go" in languages:
+        manifests["go.mod"] = "module example.com/bench\n\nrequire (\n" + "".join(
+            f"\texample.com/{n} v{version()}\n" for n in names) + ")\n"
+    if "ruby" in languages:
+        manifests["Gemfile.lock"] = "GEM\n  specs:\n" + "".join(f"    {n} ({version()})\n" for n in names)
+    return manifests
+
+
+def generate(path: str, scale: Scale, seed: int = 0) -> SyntheticRepo:
+    """
+    Create a git repository at `path` with `scale.files` source files and `scale.commits`
+    commits. Most files are added in the first commit; the remaining commits each change one
+    file, and some secrets are committed and removed again so they only exist in history.
+    """
+    rng = random.Random(seed)
+    languages = [language for language, _ in LANGUAGES[:max(1, scale.languages)]]
+    extensions = dict(LANGUAGES)
+    repo = SyntheticRepo(path, scale)
+
+    contents: Dict[str, List[str]] = {}
+    for index in range(scale.files):
+        language = languages[index % len(languages)]
+        rel_path = _path(language, extensions[language], index)
+        contents[rel_path] = _source(language, index, scale.lines_per_file, rng)
+        repo.files.append(rel_path)
+
+    for rel_path in rng.sample(repo.files, min(scale.secrets, len(repo.files))):
+        language = next(l for l, e in LANGUAGES if rel_path.endswith(e))
+        value = aws_key(rng)
+        line = rng.randint(5, len(contents[rel_path]) - 2)
+        contents[rel_path].insert(line - 1, _secret_line(language, value))
+        repo.secrets.append(PlantedSecret(rel_path, line, value))
+    repo.secrets.sort(key=lambda s: (s.file, s.line))
+
+    manifests = _manifests(languages, scale.dependencies, rng)
+    repo.manifests = sorted(manifests)
+
+    # Commits between the first and the last one each touch one file; the last restores the final content
+    history_commits = max(scale.commits - 2, 0)
+    changes: List[Tuple[str, str]] = []
+    removed_secrets = max(1, scale.secrets // 10) if scale.secrets else 0
+    for i in range(history_commits):
+        rel_path = repo.files[i % len(repo.files)]
+        if i < removed_secrets * 2 and i % 2 == 0:
+            value = aws_key(rng)
+            changes.append((rel_path, "\n".join(contents[rel_path] + [f"# aws_key = {value}"]) + "\n"))
+            repo.secrets.append(PlantedSecret(rel_path, len(contents[rel_path]) + 1, value, in_history_only=True))
+        else:
+            changes.append((rel_path, "\n".join(contents[rel_path] + [f"# revision {i}"]) + "\n"))
+
+    os.makedirs(path, exist_ok=True)
+    subprocess.run(["git", "init", "-q", "-b", "main", path], check=True)
+    stream = _fast_import_stream(contents, manifests, changes)
+    subprocess.run(["git", "-C", path, "fast-import", "--quiet"], input=stream, check=True)
+    subprocess.run(["git", "-C", path, "checkout", "-q", "-f", "main"], check=True)
+    return repo
+
+
+def _fast_import_stream(contents: Dict[str, List[str]], manifests: Dict[str, str],
+                        changes: List[Tuple[str, str]]) -> bytes:
+    out: List[bytes] = []
+    timestamp = 1_700_000_000
+
+    def commit(mark: int, message: str, files: Dict[str, str]) -> None:
+        data = message.encode("utf-8")
+        out.append(f"commit refs/heads/main\nmark :{mark}\n"
+                   f"author Bench <bench@example.com> {timestamp + mark * 60} +0000\n"
+                   f"committer Bench <bench@example.com> {timestamp + mark * 60} +0000\n"
+                   f"data {len(data)}\n".encode("utf-8") + data + b"\n")
+        if mark > 1:
+            out.append(f"from :{mark - 1}\n".encode("utf-8"))
+        for rel_path, text in files.items():
+            blob = text.encode("utf-8")
+            out.append(f"M 100644 inline {rel_path}\ndata {len(blob)}\n".encode("utf-8") + blob + b"\n")
+        out.append(b"\n")
+
+    initial = {p: "\n".join(lines) + "\n" for p, lines in contents.items()}
+    initial.update(manifests)
+    commit(1, "Initial import", initial)
+    for index, (rel_path, text) in enumerate(changes):
+        commit(index + 2, f"Change {rel_path}", {rel_path: text})
+    if changes:
+        # Restore the final content of every file touched by the history
+        commit(len(changes) + 2, "Final content", {p: initial[p] for p, _ in changes})
+    return b"".join(out)
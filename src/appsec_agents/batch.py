@@ -0,0 +1,229 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import subprocess
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, field
+from typing import IO, Callable, Dict, Iterable, List, Optional, Sequence
+
+from appsec_agents.findings import FindingsStore
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF = 5.0
+# Exception class names (from litellm, requests, ...) that usually succeed on a retry
+TRANSIENT_ERROR_NAMES = (
+    "RateLimitError", "APIConnectionError", "ServiceUnavailableError", "InternalServerError",
+    "Timeout", "ConnectTimeout", "ReadTimeout",
+)
+# Git fails with the same exit status for a dropped connection and a missing repository,
+# so git errors are told apart by their stderr
+TRANSIENT_GIT_ERRORS = re.compile(
+    r"Could not resolve host|Connection timed out|Connection reset|Connection refused|Operation timed out"
+    r"|Failed to connect|early EOF|unexpected disconnect|RPC failed|remote end hung up"
+    r"|returned error: (429|5\d\d)|TLS connection was non-properly terminated",
+    re.IGNORECASE,
+)
+
+# run_repo(repo_url, local_path) -> RepoOutcome
+RepoRunner = Callable[[str, str], "RepoOutcome"]
+
+
+@dataclass
+class RepoOutcome:
+    """What a single repository run hands back to the batch runner."""
+    stages: Dict[str, float] = field(default_factory=dict)
+    output: str = ""
+
+
+@dataclass
+class RepoResult:
+    """One line of the batch JSONL output."""
+    repo_url: str
+    status: str  # "ok" or "failed"
+    attempts: int
+    duration: float
+    local_path: str
+    stages: Dict[str, float] = field(default_factory=dict)
+    output: str = ""
+    error: Optional[str] = None
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self))
+
+
+def read_repo_list(stream: IO[str]) -> List[str]:
+    """
+    Repository URLs from a text stream: one per line, blank lines and `#` comments ignored.
+    JSON Lines with a `repo_url` key are accepted as well.
+    """
+    repos = []
+    for line in stream:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("{"):
+            line = json.loads(line)["repo_url"]
+        repos.append(line.split()[0])
+    return repos
+
+
+def is_transient(error: BaseException) -> bool:
+    """Network, timeout and rate limit errors are retried; everything else fails the repo at once."""
+    if isinstance(error, (ConnectionError, TimeoutError, subprocess.TimeoutExpired)):
+        return True
+    names = {cls.__name__ for cls in type(error).__mro__}
+    if names & {"GitCommandError", "CalledProcessError"}:
+        stderr = getattr(error, "stderr", None) or str(error)
+        if isinstance(stderr, bytes):
+            stderr = stderr.decode("utf-8", "replace")
+        return bool(TRANSIENT_GIT_ERRORS.search(stderr))
+    return bool(names & set(TRANSIENT_ERROR_NAMES))
+
+
+def workspace_for(root: str, repo_url: str) -> str:
+    """Directory for one repository, unique per URL so concurrent runs never share a checkout."""
+    name = re.sub(r"[^A-Za-z0-9_.-]", "_", repo_url.rstrip("/").rsplit("/", 1)[-1].removesuffix(".git"))
+    digest = hashlib.sha256(repo_url.encode("utf-8")).hexdigest()[:8]
+    return os.path.join(root, f"{name}-{digest}")
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+    """Linear-interpolated percentile of `values` (0 for an empty sequence)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    lower = int(k)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (k - lower)
+
+
+@dataclass
+class BatchSummary:
+    """Throughput and per-stage latency of a finished batch."""
+    results: List[RepoResult]
+    elapsed: float
+
+    @property
+    def succeeded(self) -> int:
+        return sum(1 for r in self.results if r.status == "ok")
+
+    @property
+    def repos_per_minute(self) -> float:
+        return len(self.results) / self.elapsed * 60 if self.elapsed > 0 else 0.0
+
+    def stage_latencies(self) -> Dict[str, Dict[str, float]]:
+        stages: Dict[str, List[float]] = {"total": [r.duration for r in self.results]}
+        for result in self.results:
+            for stage, seconds in result.stages.items():
+                stages.setdefault(stage, []).append(seconds)
+        return {
+            stage: {"count": len(values), "p50": percentile(values, 50), "p95": percentile(values, 95)}
+            for stage, values in stages.items()
+        }
+
+    def format(self) -> str:
+        lines = [
+            f"{len(self.results)} repositories in {self.elapsed:.1f}s "
+            f"({self.succeeded} ok, {len(self.results) - self.succeeded} failed, "
+            f"{self.repos_per_minute:.2f} repos/min)",
+            f"{'stage':<32} {'count':>6} {'p50':>9} {'p95':>9}",
+        ]
+        for stage, stats in self.stage_latencies().items():
+            lines.append(f"{stage:<32} {stats['count']:>6} {stats['p50']:>8.2f}s {stats['p95']:>8.2f}s")
+        return "\n".join(lines)
+
+
+class BatchRunner:
+    """
+    Runs many repositories through `run_repo` on a bounded thread pool in one process,
+    so the crewai import and setup cost is paid once. Each repository gets its own
+    workspace under `workspace_root`, transient failures are retried with exponential
+    backoff and every result is written to `output` as soon as the repository finishes.
+    With a WorkspaceManager as `workspaces`, the checkouts are leased from it instead.
+    """
+
+    def __init__(self, run_repo: RepoRunner, workspace_root: str, workers: int = 4,
+                 retries: int = DEFAULT_RETRIES, backoff: float = DEFAULT_BACKOFF, keep_workspaces: bool = False,
+                 workspaces=None):
+        if workers < 1:
+            raise ValueError("workers must be at least 1.")
+        self.run_repo = run_repo
+        self.workspace_root = workspace_root
+        self.workers = workers
+        self.retries = retries
+        self.backoff = backoff
+        self.keep_workspaces = keep_workspaces
+        self.workspaces = workspaces
+        self._output_lock = threading.Lock()
+
+    def _run_one(self, repo_url: str) -> RepoResult:
+        local_path = workspace_for(self.workspace_root, repo_url)
+        run_id = None
+        if self.workspaces is not None:
+            run_id = f"{os.path.basename(local_path)}-{uuid.uuid4().hex[:8]}"
+            local_path = self.workspaces.path_for(run_id)
+        start = time.monotonic()
+        attempt = 0
+        try:
+            while True:
+                attempt += 1
+                # Never let a retry see a half-cloned tree from the previous attempt
+                shutil.rmtree(local_path, ignore_errors=True)
+                try:
+                    try:
+                        if run_id is None:
+                            outcome = self.run_repo(repo_url, local_path)
+                        else:
+                            with self.workspaces.workspace(repo_url, run_id) as workspace:
+                                outcome = self.run_repo(repo_url, workspace.path)
+                    finally:
+                        # A retry starts without the findings of the failed attempt
+                        FindingsStore.default().discard(local_path)
+                    return RepoResult(repo_url, "ok", attempt, time.monotonic() - start, local_path,
+                                      outcome.stages, outcome.output)
+                except Exception as e:
+                    if attempt > self.retries or not is_transient(e):
+                        logger.error(f"{repo_url} failed after {attempt} attempt(s): {e}")
+                        return RepoResult(repo_url, "failed", attempt, time.monotonic() - start, local_path,
+                                          error=f"{type(e).__name__}: {e}")
+                    delay = self.backoff * 2 ** (attempt - 1)
+                    logger.warning(f"{repo_url} attempt {attempt} failed ({e}), retrying in {delay:.0f}s")
+                    time.sleep(delay)
+        finally:
+            if not self.keep_workspaces:
+                shutil.rmtree(local_path, ignore_errors=True)
+
+    def _emit(self, result: RepoResult, output: Optional[IO[str]]) -> None:
+        if output is None:
+            return
+        with self._output_lock:
+            output.write(result.to_json() + "\n")
+            output.flush()
+
+    def run(self, repos: Iterable[str], output: Optional[IO[str]] = None) -> BatchSummary:
+        repos = list(dict.fromkeys(repos))  # duplicates would share a workspace
+        os.makedirs(self.workspace_root, exist_ok=True)
+        start = time.monotonic()
+        results = []
+        logger.info(f"Scanning {len(repos)} repositories with {self.workers} workers")
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="batch") as pool:
+            futures = [pool.submit(self._run_one, repo) for repo in repos]
+            for done, future in enumerate(as_completed(futures), start=1):
+                result = future.result()
+                results.append(result)
+                self._emit(result, output)
+                logger.info(f"[{done}/{len(repos)}] {result.repo_url}: {result.status} in {result.duration:.1f}s")
+        summary = BatchSummary(results, time.monotonic() - start)
+        logger.info(f"Batch summary:\n{summary.format()}")
+        if self.workspaces is not None:
+            logger.info(f"Workspaces: {self.workspaces.report()}")
+        return summary
@@ -0,0 +1,135 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from appsec_agents.fileio import atomic_write
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHECKPOINT_DIR = os.path.join(tempfile.gettempdir(), "appsec_checkpoints")
+# Rewrite a log once it holds this many times more records than it needs
+COMPACT_RATIO = 2
+
+
+def input_hash(inputs: Dict[str, Any]) -> str:
+    """Stable hash of a run's inputs; checkpoints of other inputs are never reused."""
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+
+class CheckpointStore:
+    """
+    Task outputs of a run, kept in CHECKPOINT_DIR so a failed run can be resumed without
+    running its completed tasks again.
+
+    Each run has an append-only JSON Lines log: one `run` record with the inputs, then a
+    `task` record per finished task and a `findings` snapshot of the FindingsStore after it.
+    Every record is appended with a single write and fsync'ed, so a crash can at worst leave
+    a torn last line, which is ignored. Records that are superseded (older snapshots, tasks
+    run with other inputs) are dropped by `compact`, which rewrites the log atomically.
+    Logs are only readable by the owner, since findings include the location of secrets.
+    """
+
+    _default: Optional["CheckpointStore"] = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, checkpoint_dir: str):
+        self.checkpoint_dir = checkpoint_dir
+        self._lock = threading.Lock()
+
+    @classmethod
+    def default(cls) -> "CheckpointStore":
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls(os.getenv("CHECKPOINT_DIR") or DEFAULT_CHECKPOINT_DIR)
+            return cls._default
+
+    def _path(self, run_id: str) -> str:
+        return os.path.join(self.checkpoint_dir, f"{run_id}.jsonl")
+
+    def _append(self, run_id: str, record: Dict[str, Any]) -> None:
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        data = (json.dumps(dict(record, time=time.time()), default=str) + "\n").encode("utf-8")
+        with self._lock:
+            fd = os.open(self._path(run_id), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            try:
+                os.write(fd, data)
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def _records(self, run_id: str) -> List[Dict[str, Any]]:
+        records = []
+        try:
+            with open(self._path(run_id), "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        logger.warning(f"Ignoring a torn checkpoint record of run {run_id}")
+        except FileNotFoundError:
+            pass
+        return records
+
+    def begin(self, run_id: str, inputs: Dict[str, Any], **meta: Any) -> str:
+        """Record the inputs (and e.g. the checked-out commit) of a run; returns their hash."""
+        digest = input_hash(inputs)
+        self._append(run_id, dict(meta, type="run", inputs=inputs, input_hash=digest))
+        return digest
+
+    def run(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """The latest `run` record of `run_id`, None if there is no checkpoint."""
+        runs = [r for r in self._records(run_id) if r.get("type") == "run"]
+        return runs[-1] if runs else None
+
+    def record_task(self, run_id: str, digest: str, task: str, output: Dict[str, Any]) -> None:
+        self._append(run_id, {"type": "task", "input_hash": digest, "task": task, "output": output})
+
+    def record_findings(self, run_id: str, digest: str, findings: List[Dict[str, Any]]) -> None:
+        self._append(run_id, {"type": "findings", "input_hash": digest, "findings": findings})
+
+    def _live(self, records: List[Dict[str, Any]], digest: str) -> List[Dict[str, Any]]:
+        """The records still needed for `digest`: the run, the last output per task and the last snapshot."""
+        runs = [r for r in records if r.get("type") == "run" and r.get("input_hash") == digest]
+        tasks: Dict[str, Dict[str, Any]] = {}
+        findings = None
+        for record in records:
+            if record.get("input_hash") != digest:
+                continue
+            if record.get("type") == "task":
+                tasks[record["task"]] = record
+            elif record.get("type") == "findings":
+                findings = record
+        return runs[-1:] + list(tasks.values()) + ([findings] if findings else [])
+
+    def completed(self, run_id: str, digest: str) -> Dict[str, Dict[str, Any]]:
+        """Task name -> output of every task that finished with these inputs."""
+        return {r["task"]: r["output"] for r in self._live(self._records(run_id), digest) if r["type"] == "task"}
+
+    def findings(self, run_id: str, digest: str) -> List[Dict[str, Any]]:
+        """The last FindingsStore snapshot taken with these inputs."""
+        snapshots = [r for r in self._live(self._records(run_id), digest) if r["type"] == "findings"]
+        return snapshots[-1]["findings"] if snapshots else []
+
+    def compact(self, run_id: str) -> None:
+        """Rewrite the log with only the records of the latest run's inputs, if enough are superseded."""
+        with self._lock:
+            records = self._records(run_id)
+            runs = [r for r in records if r.get("type") == "run"]
+            if not runs:
+                return
+            live = self._live(records, runs[-1]["input_hash"])
+            if len(records) < COMPACT_RATIO * len(live):
+                return
+            atomic_write(self._path(run_id), "".join(json.dumps(record, default=str) + "\n" for record in live))
+        logger.debug(f"Compacted checkpoint of run {run_id}: {len(records)} -> {len(live)} records")
+
+    def discard(self, run_id: str) -> None:
+        try:
+            os.remove(self._path(run_id))
+        except FileNotFoundError:
+            pass
@@ -1,16 +1,21 @@
 import logging
+import os
 from crewai import Agent, Crew, Process, Task
 from crewai.project import CrewBase, agent, crew, task, before_kickoff, after_kickoff
-from crewai_tools import FileReadTool
-from crewai_tools import FileWriterTool
 
 # Import custom tools for the project
 from appsec_agents.tools.git_pr_tool import GitPRTool
 from appsec_agents.tools.git_cloner_tool import CloneGitHubRepoTool
 from appsec_agents.tools.dependency_scanner import DependencyVulnScanTool
-from appsec_agents.tools.sca_tool import StaticCodeAnalysisTool
 from appsec_agents.tools.sca_pmd_scan import PMDStaticCodeAnalysisTool
 from appsec_agents.tools.secret_tool import SecretDetectionTool
+from appsec_agents.tools.secret_remediation_tool import SecretRemediationTool
+
+from appsec_agents.checkpoints import CheckpointStore
+from appsec_agents.scheduler import DagScheduler, ScheduleResult, TaskGraph
+from appsec_agents.scan_cache import ScanResultCache
+from appsec_agents.findings import Finding, FindingsStore
+from appsec_agents.llm_cache import LLMResponseCache, caching_llm, placeholders
 
 logger = logging.getLogger(__name__)
 
@@ -41,6 +46,7 @@ class AppsecAgents():
         """Agent responsible for cloning GitHub repositories."""
         return Agent(
             config=self.agents_config['repository_cloner'],
+            llm=caching_llm('repository_cloner'),
             tools=[CloneGitHubRepoTool()],
             verbose=True
         )
@@ -50,6 +56,7 @@ class AppsecAgents():
         """Agent responsible for static code analysis."""
         return Agent(
             config=self.agents_config['static_analyzer'],
+            llm=caching_llm('static_analyzer'),
             tools=[PMDStaticCodeAnalysisTool()],
             verbose=True
         )
@@ -59,6 +66,7 @@ class AppsecAgents():
         """Agent responsible for scanning dependencies for vulnerabilities."""
         return Agent(
             config=self.agents_config['dependency_scanner'],
+            llm=caching_llm('dependency_scanner'),
             tools=[DependencyVulnScanTool()],
             verbose=True
         )
@@ -68,6 +76,7 @@ class AppsecAgents():
         """Agent responsible for detecting hardcoded secrets."""
         return Agent(
             config=self.agents_config['secret_detector'],
+            llm=caching_llm('secret_detector'),
             tools=[SecretDetectionTool()],
             verbose=True
         )
@@ -77,7 +86,8 @@ class AppsecAgents():
         """Agent responsible for fixing hardcoded secrets."""
         return Agent(
             config=self.agents_config['secret_remediator'],
-            tools=[FileReadTool(), FileWriterTool()], 
+            llm=caching_llm('secret_remediator'),
+            tools=[SecretRemediationTool()],
             verbose=True
         )
 
@@ -85,6 +95,7 @@ class AppsecAgents():
     def remediation_engineer(self) -> Agent:
         return Agent(
             config=self.agents_config['remediation_engineer'],
+            llm=caching_llm('remediation_engineer'),
             tools=[GitPRTool()],  # Add the custom tool for submitting PRs
             verbose=True
         )
@@ -133,3 +144,78 @@ class AppsecAgents():
             process=Process.sequential,  # Run tasks sequentially
             verbose=True,
         )
+
+    def kickoff_dag(self, inputs, max_workers=None, run_id=None) -> ScheduleResult:
+        """
+        Run the tasks following the `depends_on` graph in tasks.yaml instead of sequentially.
+        Independent tasks (e.g. the scanners after the clone) run concurrently, bounded by
+        `max_workers` or the TASK_CONCURRENCY environment variable.
+
+        With a `run_id`, every task output is checkpointed as the task finishes, and tasks
+        already checkpointed for this run with the same inputs are skipped, so a failed run
+        continues from its first incomplete task.
+        """
+        inputs = self.setup_environment(inputs)
+        tasks = {
+            name: getattr(self, name)()
+            for name in self.tasks_config
+            if getattr(getattr(self, name, None), "is_task", False)
+        }
+        volatile = placeholders(inputs)
+        for crew_task in tasks.values():
+            crew_task.interpolate_inputs(inputs)
+            crew_task.agent.interpolate_inputs(inputs)
+            if hasattr(crew_task.agent.llm, "substitutions"):
+                crew_task.agent.llm.substitutions = volatile
+
+        def execute(name, upstream):
+            crew_task = tasks[name]
+            context = "\n\n".join(output.raw for output in upstream.values()) or None
+            return crew_task.execute_sync(agent=crew_task.agent, context=context,
+                                          tools=crew_task.tools or crew_task.agent.tools)
+
+        completed, on_done = {}, None
+        if run_id is not None:
+            completed, on_done = self._checkpointing(run_id, inputs)
+
+        if max_workers is None and os.getenv("TASK_CONCURRENCY"):
+            max_workers = int(os.getenv("TASK_CONCURRENCY"))
+        graph = TaskGraph.from_config(self.tasks_config, tasks)
+        result = DagScheduler(graph, max_workers=max_workers).run(execute, completed=completed, on_done=on_done)
+        logger.info(f"Task timings:\n{result.format_timings()}")
+        logger.info(f"Scan cache: {ScanResultCache.default().stats()}")
+        if LLMResponseCache.default().enabled:
+            logger.info(f"LLM cache per agent: {LLMResponseCache.default().agent_stats()}")
+        if os.getenv("SARIF_OUTPUT") and inputs.get("local_path"):
+            FindingsStore.default().write_sarif(inputs["local_path"], os.getenv("SARIF_OUTPUT"))
+            logger.info(f"Findings exported to {os.getenv('SARIF_OUTPUT')}")
+        self.summarize_results(result.final_output)
+        return result
+
+    @staticmethod
+    def _checkpointing(run_id, inputs):
+        """Outputs of the tasks checkpointed for `run_id` and the callback that checkpoints the others."""
+        from crewai.tasks.task_output import TaskOutput
+
+        store = CheckpointStore.default()
+        run = store.run(run_id)
+        digest = run["input_hash"] if run and run["inputs"] == inputs else store.begin(run_id, inputs)
+        store.compact(run_id)
+        completed = {name: TaskOutput(**output) for name, output in store.completed(run_id, digest).items()}
+        local_path = inputs.get("local_path")
+        if completed and local_path:
+            # The scanners' findings are read by the later tasks (e.g. remediation) from the store
+            FindingsStore.default().add(local_path, [Finding.from_dict(f) for f in store.findings(run_id, digest)])
+
+        def on_done(name, output):
+            try:
+                # `pydantic` holds an instance of the task's output model, which is not restored
+                store.record_task(run_id, digest, name, output.model_dump(mode="json", exclude={"pydantic"}))
+                if local_path:
+                    store.record_findings(run_id, digest,
+                                          [f.to_dict() for f in FindingsStore.default().get(local_path)])
+                store.compact(run_id)
+            except Exception as e:
+                logger.warning(f"Could not checkpoint task '{name}' of run {run_id}: {e}")
+
+        return completed, on_done
@@ -0,0 +1,296 @@
+import abc
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Tuple, Type
+
+from appsec_agents.findings import Finding, ScanError, dependency_finding, snyk_vulnerabilities
+from appsec_agents.lockfiles import parse_lockfile
+from appsec_agents.osv import OsvIndex
+from appsec_agents.runner import run_command, timeout_for
+from appsec_agents.scan_cache import DiskLRUCache, tool_version
+
+logger = logging.getLogger(__name__)
+
+SKIPPED_DIRS = {".git", ".hg", ".svn", "node_modules", "vendor", "target", "build", ".venv", "venv", "__pycache__"}
+# (file scanned by the backend, ecosystem, files next to it that change the resolved dependencies),
+# in order of preference when one directory has several files of the same ecosystem
+MANIFEST_TYPES: List[Tuple[str, str, Tuple[str, ...]]] = [
+    ("package-lock.json", "npm", ("package.json",)),
+    ("yarn.lock", "npm", ("package.json",)),
+    ("pnpm-lock.yaml", "npm", ("package.json",)),
+    ("pom.xml", "maven", ()),
+    ("build.gradle", "gradle", ("gradle.lockfile", "settings.gradle")),
+    ("build.gradle.kts", "gradle", ("gradle.lockfile", "settings.gradle.kts")),
+    ("poetry.lock", "pypi", ("pyproject.toml",)),
+    ("Pipfile.lock", "pypi", ("Pipfile",)),
+    ("requirements.txt", "pypi", ()),
+    ("go.mod", "go", ("go.sum",)),
+    ("Gemfile.lock", "rubygems", ("Gemfile",)),
+    ("composer.lock", "packagist", ("composer.json",)),
+    ("Cargo.lock", "crates.io", ("Cargo.toml",)),
+    ("packages.config", "nuget", ()),
+]
+# Child modules inherit from build files further up the tree
+INHERITED_FILES = {
+    "maven": ("pom.xml",),
+    "gradle": ("build.gradle", "build.gradle.kts", "settings.gradle", "settings.gradle.kts", "gradle.lockfile"),
+}
+DEFAULT_WORKERS = 4
+
+
+@dataclass
+class Manifest:
+    """A dependency manifest and the hash of everything its resolved dependencies depend on."""
+    path: str  # relative to the repository root
+    ecosystem: str
+    files: List[str] = field(default_factory=list)
+    content_hash: str = ""
+
+
+@dataclass
+class Vulnerability:
+    """A vulnerable package version, independent of the manifest it was found in."""
+    id: str
+    severity: str
+    package: str
+    version: str
+    title: str
+    fixed_in: List[str] = field(default_factory=list)
+
+
+def _file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _manifest_hash(local_path: str, manifest: Manifest) -> str:
+    # Paths are relative to the manifest so identical lockfiles in different repos share a hash
+    base = os.path.dirname(os.path.join(local_path, manifest.path))
+    parts = [manifest.ecosystem, os.path.basename(manifest.path)]
+    for rel in manifest.files:
+        path = os.path.join(local_path, rel)
+        parts.append([os.path.relpath(path, base).replace(os.sep, "/"), _file_digest(path)])
+    return hashlib.sha256(json.dumps(parts).encode("utf-8")).hexdigest()
+
+
+def discover_manifests(local_path: str) -> List[Manifest]:
+    """Dependency manifests in the repository, one per ecosystem and directory."""
+    manifests = []
+    for dirpath, dirs, files in os.walk(local_path):
+        dirs[:] = sorted(d for d in dirs if d not in SKIPPED_DIRS and not d.startswith("."))
+        rel_dir = os.path.relpath(dirpath, local_path)
+        rel_dir = "" if rel_dir == "." else rel_dir.replace(os.sep, "/") + "/"
+        seen = set()
+        for name, ecosystem, companions in MANIFEST_TYPES:
+            if name not in files or ecosystem in seen:
+                continue
+            seen.add(ecosystem)
+            manifest = Manifest(rel_dir + name, ecosystem)
+            manifest.files = [manifest.path] + [rel_dir + c for c in companions if c in files]
+            # Parent POMs and root Gradle files of multi-module builds
+            parent = os.path.dirname(rel_dir.rstrip("/"))
+            while rel_dir and ecosystem in INHERITED_FILES:
+                prefix = parent + "/" if parent else ""
+                for inherited in INHERITED_FILES.get(ecosystem, ()):
+                    if os.path.isfile(os.path.join(local_path, prefix + inherited)):
+                        manifest.files.append(prefix + inherited)
+                if not parent:
+                    break
+                parent = os.path.dirname(parent)
+            manifest.content_hash = _manifest_hash(local_path, manifest)
+            manifests.append(manifest)
+    return manifests
+
+
+class DependencyBackend(abc.ABC):
+    """Resolves the vulnerabilities of one manifest. Subclasses register in BACKENDS."""
+
+    name = ""
+
+    @abc.abstractmethod
+    def version(self) -> str:
+        """Identifies the backend and its vulnerability data; part of every cache key."""
+
+    @abc.abstractmethod
+    def scan(self, local_path: str, manifest: Manifest) -> List[Vulnerability]:
+        """The vulnerabilities of `manifest` in the checkout at `local_path`."""
+
+
+class SnykBackend(DependencyBackend):
+    """Runs `snyk test --file=<manifest>` for each manifest."""
+
+    name = "snyk"
+
+    def version(self) -> str:
+        # The Snyk database is updated continuously and has no version of its own, so results
+        # are reused for a day unless DEPENDENCY_DB_DATE pins the date
+        db_date = os.getenv("DEPENDENCY_DB_DATE") or time.strftime("%Y-%m-%d", time.gmtime())
+        return f"{tool_version('snyk')}@{db_date}"
+
+    def scan(self, local_path: str, manifest: Manifest) -> List[Vulnerability]:
+        command = ["snyk", "test", f"--file={manifest.path}", "--json"]
+        if os.getenv("SNYK_ORG"):
+            command.append(f"--org={os.getenv('SNYK_ORG')}")
+        result = run_command(command, cwd=local_path, timeout=timeout_for("snyk", 1800))
+        try:
+            if result.timed_out:
+                raise ScanError(f"Snyk scan of {manifest.path} timed out after {result.duration:.0f} seconds.")
+            # Snyk exits with 1 when vulnerabilities were found
+            if result.returncode not in (0, 1):
+                raise ScanError(f"Snyk scan of {manifest.path} failed:\n{result.stderr or result.stdout}")
+            with result.open_stdout() as output:
+                document = json.load(output)
+        except ValueError as e:
+            raise ScanError(f"Could not parse the Snyk output for {manifest.path}: {e}")
+        finally:
+            result.cleanup()
+        vulnerabilities = {}
+        # The same advisory is listed once per dependency path
+        for _, vuln in snyk_vulnerabilities(document):
+            key = (vuln.get("id"), vuln.get("packageName"), vuln.get("version"))
+            vulnerabilities.setdefault(key, Vulnerability(
+                id=vuln.get("id", "unknown"), severity=vuln.get("severity", "info"),
+                package=vuln.get("packageName", "?"), version=vuln.get("version", "?"),
+                title=vuln.get("title", ""), fixed_in=list(vuln.get("fixedIn") or []),
+            ))
+        return list(vulnerabilities.values())
+
+
+class OsvBackend(DependencyBackend):
+    """
+    Resolves lockfiles offline against a local OSV index. Dumps found in OSV_DUMP_DIR
+    are ingested incrementally when the backend is created.
+    """
+
+    name = "osv"
+
+    def __init__(self, index: Optional[OsvIndex] = None):
+        self.index = index or OsvIndex.default()
+        if os.getenv("OSV_DUMP_DIR"):
+            self.index.ingest([os.getenv("OSV_DUMP_DIR")])
+
+    def version(self) -> str:
+        return f"osv@{self.index.version()}"
+
+    def scan(self, local_path: str, manifest: Manifest) -> List[Vulnerability]:
+        if not len(self.index):
+            raise ScanError("The OSV index is empty. Ingest an advisory dump with `main.py ingest_osv <path>`.")
+        try:
+            packages = parse_lockfile(os.path.join(local_path, manifest.path))
+        except (OSError, ValueError) as e:
+            raise ScanError(f"Could not parse {manifest.path}: {e}")
+        matches = self.index.lookup(manifest.ecosystem, packages)
+        return [
+            Vulnerability(a.id, a.severity, name, version, a.summary, a.fixed)
+            for (name, version), advisories in sorted(matches.items())
+            for a in advisories
+        ]
+
+
+BACKENDS: Dict[str, Type[DependencyBackend]] = {
+    "snyk": SnykBackend,
+    "osv": OsvBackend,
+}
+
+
+def get_backend(name: Optional[str] = None) -> DependencyBackend:
+    """Backend selected by `name` or DEPENDENCY_BACKEND (default: snyk)."""
+    name = name or os.getenv("DEPENDENCY_BACKEND") or "snyk"
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown dependency backend '{name}'. Available: {', '.join(sorted(BACKENDS))}")
+    return BACKENDS[name]()
+
+
+@dataclass
+class ManifestScanResult:
+    findings: List[Finding]
+    manifests: List[Manifest]
+    cached: int = 0
+    scanned: int = 0
+    errors: Dict[str, str] = field(default_factory=dict)  # manifest path -> message
+
+
+class ManifestScanner:
+    """
+    Scans a repository manifest by manifest. Results are cached by manifest content hash
+    and backend version, so a lockfile shared by many repositories is only resolved once;
+    the backend runs just for hashes it has not seen.
+    """
+
+    # Scans in progress, shared by every scanner of the process: DependencyVulnScanTool
+    # creates a scanner per call, and concurrent calls must still wait for each other
+    _inflight: Dict[str, threading.Event] = {}
+    _inflight_lock = threading.Lock()
+
+    def __init__(self, backend: DependencyBackend, cache: Optional[DiskLRUCache] = None,
+                 workers: int = DEFAULT_WORKERS):
+        self.backend = backend
+        self.cache = cache
+        self.workers = workers
+
+    def cache_key(self, manifest: Manifest, backend_version: str) -> str:
+        material = json.dumps(["manifest", self.backend.name, backend_version, manifest.content_hash])
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _resolve(self, local_path: str, manifest: Manifest, key: str) -> Tuple[List[Vulnerability], bool]:
+        """Vulnerabilities for `manifest` and whether they came from the cache."""
+        # Concurrent repositories with the same lockfile wait for the first scan instead of repeating it
+        while True:
+            with self._inflight_lock:
+                event = self._inflight.get(key)
+                if event is None:
+                    cached = self.cache.get(key) if self.cache is not None else None
+                    if cached is not None:
+                        return [Vulnerability(**v) for v in cached], True
+                    self._inflight[key] = threading.Event()
+                    break
+            event.wait()
+        try:
+            vulnerabilities = self.backend.scan(local_path, manifest)
+            if self.cache is not None:
+                self.cache.put(key, [asdict(v) for v in vulnerabilities])
+            return vulnerabilities, False
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key).set()
+
+    def scan(self, local_path: str) -> ManifestScanResult:
+        manifests = discover_manifests(local_path)
+        result = ManifestScanResult(findings=[], manifests=manifests)
+        if not manifests:
+            return result
+        backend_version = self.backend.version()
+        unique: Dict[str, Manifest] = {}
+        for manifest in manifests:
+            unique.setdefault(self.cache_key(manifest, backend_version), manifest)
+
+        resolved: Dict[str, List[Vulnerability]] = {}
+        with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(unique)))) as pool:
+            futures = {key: pool.submit(self._resolve, local_path, manifest, key) for key, manifest in unique.items()}
+            for key, future in futures.items():
+                try:
+                    resolved[key], from_cache = future.result()
+                except ScanError as e:
+                    result.errors[unique[key].path] = str(e)
+                    continue
+                if from_cache:
+                    result.cached += 1
+                else:
+                    result.scanned += 1
+
+        for manifest in manifests:
+            for v in resolved.get(self.cache_key(manifest, backend_version), []):
+                result.findings.append(dependency_finding(
+                    self.backend.name, v.id, v.severity, v.package, v.version, v.title, v.fixed_in, manifest.path))
+        logger.info(f"Dependency scan of {local_path}: {len(manifests)} manifests, {len(unique)} unique, "
+                    f"{result.cached} cached, {result.scanned} scanned, {len(result.errors)} failed")
+        return result
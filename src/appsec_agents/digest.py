@@ -0,0 +1,164 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from appsec_agents.fileio import atomic_write
+from appsec_agents.findings import (CHARS_PER_TOKEN, DEFAULT_TOKEN_BUDGET, SEVERITIES, SEVERITY_RANK, Finding,
+                                    dedupe, rank, summarize, summary_line)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ARTIFACT_DIR = os.path.join(tempfile.gettempdir(), "appsec_artifacts")
+DEFAULT_MAX_AGE_HOURS = 24
+SAMPLE_LOCATIONS = 3
+MAX_MESSAGE_CHARS = 200
+
+GroupKey = Tuple[str, str, str]  # severity, tool, rule
+
+
+@dataclass
+class FindingGroup:
+    """All findings of one rule reported by one tool with one severity."""
+    severity: str
+    tool: str
+    rule: str
+    message: str
+    count: int = 0
+    files: Set[str] = field(default_factory=set)
+    samples: List[str] = field(default_factory=list)
+
+    def format(self) -> str:
+        message = self.message if len(self.message) <= MAX_MESSAGE_CHARS else self.message[:MAX_MESSAGE_CHARS] + "..."
+        more = f" and {self.count - len(self.samples)} more" if self.count > len(self.samples) else ""
+        return (f"[{self.severity.upper()}] {self.rule} ({self.tool}) x{self.count} in {len(self.files)} files, "
+                f"e.g. {', '.join(self.samples)}{more} - {message}")
+
+
+class ArtifactStore:
+    """
+    Full scanner results written to ARTIFACT_DIR when a digest leaves findings out, so the
+    complete list can be read by the path at the end of the summary. Files are named by
+    content hash, only readable by the owner and removed after ARTIFACT_MAX_AGE_HOURS.
+    """
+
+    _default: Optional["ArtifactStore"] = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, artifact_dir: str, max_age: float = DEFAULT_MAX_AGE_HOURS * 3600):
+        self.artifact_dir = artifact_dir
+        self.max_age = max_age
+
+    @classmethod
+    def default(cls) -> "ArtifactStore":
+        with cls._default_lock:
+            if cls._default is None:
+                max_age = float(os.getenv("ARTIFACT_MAX_AGE_HOURS") or DEFAULT_MAX_AGE_HOURS) * 3600
+                cls._default = cls(os.getenv("ARTIFACT_DIR") or DEFAULT_ARTIFACT_DIR, max_age)
+            return cls._default
+
+    def put(self, tool: str, findings: List[Finding]) -> str:
+        """Write `findings` as a JSON list and return the path. Tool-private data (e.g. raw secrets) is left out."""
+        data = json.dumps([dict(f.to_dict(), extra={}) for f in findings], indent=1).encode("utf-8")
+        path = os.path.join(self.artifact_dir, f"{tool}-{hashlib.sha256(data).hexdigest()[:16]}.json")
+        os.makedirs(self.artifact_dir, mode=0o700, exist_ok=True)
+        self.prune()
+        if os.path.exists(path):
+            os.utime(path)  # Still in use, keep it
+            return path
+        atomic_write(path, data)
+        return path
+
+    def prune(self) -> int:
+        """Remove the artifacts older than `max_age` seconds; returns how many were removed."""
+        removed = 0
+        cutoff = time.time() - self.max_age
+        try:
+            entries = list(os.scandir(self.artifact_dir))
+        except FileNotFoundError:
+            return 0
+        for entry in entries:
+            try:
+                if entry.is_file(follow_symlinks=False) and entry.stat(follow_symlinks=False).st_mtime < cutoff:
+                    os.remove(entry.path)
+                    removed += 1
+            except OSError:
+                continue  # Removed by another process
+        if removed:
+            logger.debug(f"Removed {removed} artifacts older than {self.max_age:.0f}s from {self.artifact_dir}")
+        return removed
+
+    @staticmethod
+    def load(path: str) -> List[Finding]:
+        with open(path, "r", encoding="utf-8") as f:
+            return [Finding.from_dict(item) for item in json.load(f)]
+
+
+def group_by_rule(findings: Iterable[Finding], root: Optional[str] = None) -> List[FindingGroup]:
+    """
+    Group findings by (severity, tool, rule), most severe first and the most frequent rule
+    first within a severity.
+    """
+    groups: Dict[GroupKey, FindingGroup] = {}
+    for finding in findings:
+        key = (finding.severity, finding.tool, finding.rule)
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = FindingGroup(finding.severity, finding.tool, finding.rule, finding.message)
+        group.count += 1
+        group.files.add(finding.file)
+        if len(group.samples) < SAMPLE_LOCATIONS:
+            group.samples.append(os.path.join(root, finding.location) if root else finding.location)
+    return sorted(groups.values(), key=lambda g: (SEVERITY_RANK[g.severity], -g.count, g.tool, g.rule))
+
+
+def _counts(findings: Iterable[Finding]) -> str:
+    counts = Counter(f.severity for f in findings)
+    return ", ".join(f"{counts[s]} {s}" for s in SEVERITIES if counts[s])
+
+
+def digest(findings: Iterable[Finding], tool: str, root: Optional[str] = None, token_budget: Optional[int] = None,
+           artifacts: Optional[ArtifactStore] = None) -> str:
+    """
+    Summary of a scanner's findings for the agents. Results that fit in `token_budget`
+    (FINDINGS_TOKEN_BUDGET) are listed one per line as by `summarize`. Larger results are
+    grouped by rule into one ranked list cut at the budget. The complete findings are then
+    written to the ArtifactStore and the summary ends with their path.
+    """
+    findings = rank(dedupe(findings))
+    if token_budget is None:
+        token_budget = int(os.getenv("FINDINGS_TOKEN_BUDGET") or DEFAULT_TOKEN_BUDGET)
+    budget = token_budget * CHARS_PER_TOKEN
+    # Room for the header line that `summarize` adds
+    if sum(len(summary_line(f, root)) + 1 for f in findings) <= budget - 100:
+        return summarize(findings, token_budget, root)
+
+    groups = group_by_rule(findings, root)
+
+    path = (artifacts or ArtifactStore.default()).put(tool, findings)
+    reference = f"Full results ({len(findings)} findings as a JSON list): {path}"
+    header = (f"{len(findings)} findings ({_counts(findings)}) in {len({f.file for f in findings})} files, "
+              f"grouped by rule:")
+    lines = [header]
+    budget -= len(header) + len(reference) + 100  # and the "more rules" line
+    shown = 0
+    for group in groups:
+        line = group.format()
+        if len(line) + 1 > budget:
+            break
+        lines.append(line)
+        budget -= len(line) + 1
+        shown += 1
+    if shown < len(groups):
+        rest = groups[shown:]
+        lines.append(f"... {len(rest)} more rules with {sum(g.count for g in rest)} findings not shown")
+    lines.append(reference)
+    logger.info(f"Digest of {len(findings)} {tool} findings: {len(groups)} rules, "
+                f"{shown} shown, full results in {path}")
+    return "\n".join(lines)
@@ -0,0 +1,34 @@
+import os
+import shutil
+import tempfile
+from typing import BinaryIO, Union
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def atomic_write(path: str, content: Union[str, bytes, BinaryIO]) -> None:
+    """
+    Replace `path` in one step: the content goes to a temp file in the same directory, which
+    is fsync'ed and renamed over `path`. The temp file is removed if anything fails. An existing
+    file keeps its permissions; a new one is only readable by its owner.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            if isinstance(content, str):
+                f.write(content.encode("utf-8"))
+            elif isinstance(content, bytes):
+                f.write(content)
+            else:
+                shutil.copyfileobj(content, f, CHUNK_SIZE)
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(path):
+            os.chmod(tmp_path, os.stat(path).st_mode & 0o7777)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
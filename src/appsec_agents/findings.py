@@ -0,0 +1,370 @@
+import hashlib
+import io
+import json
+import os
+import threading
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from typing import IO, Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from appsec_agents.fileio import atomic_write
+
+SEVERITIES = ["critical", "high", "medium", "low", "info"]
+SEVERITY_RANK = {severity: rank for rank, severity in enumerate(SEVERITIES)}
+SARIF_LEVELS = {"critical": "error", "high": "error", "medium": "warning", "low": "note", "info": "note"}
+LEVEL_SEVERITY = {"error": "high", "warning": "medium", "note": "low", "none": "info"}
+DEFAULT_TOKEN_BUDGET = 2000
+CHARS_PER_TOKEN = 4  # Rough estimate used to keep summaries inside the budget
+
+# Scanner output: the text, or a stream such as CommandResult.open_stdout()
+Output = Union[str, IO[str]]
+
+
+class ScanError(Exception):
+    """Raised by a scanner with the message that should be returned to the agent."""
+
+
+def fingerprint(*parts: Any) -> str:
+    return hashlib.sha256(json.dumps(parts).encode("utf-8")).hexdigest()[:20]
+
+
+# Keys of `Finding.extra` holding secret material, never serialized
+SECRET_KEYS = ("raw",)
+
+
+def secret_hash(raw: str) -> str:
+    """Digest used to find a secret on its line again once the plaintext is gone."""
+    return hashlib.sha256(f"secret\0{raw}".encode("utf-8")).hexdigest()
+
+
+@dataclass
+class Finding:
+    """
+    One normalized scanner result. `file` is relative to the repository root and
+    `fingerprint` identifies the same issue across tools and runs. `extra` holds
+    tool-specific data (e.g. the raw secret) that is never shown to the agents. Keys in
+    SECRET_KEYS stay in memory: `to_dict` drops them unless `secrets=True`, so caches,
+    watermarks and checkpoints never hold the plaintext.
+    """
+    tool: str
+    rule: str
+    severity: str
+    file: str
+    line: Optional[int]
+    message: str
+    category: str
+    fingerprint: str = ""
+    extra: Dict[str, Any] = field(default_factory=dict)
+
+    def __post_init__(self):
+        self.severity = self.severity.lower() if self.severity.lower() in SEVERITY_RANK else "info"
+        if not self.fingerprint:
+            self.fingerprint = fingerprint(self.tool, self.rule, self.file, self.line)
+
+    @property
+    def location(self) -> str:
+        return f"{self.file}:{self.line}" if self.line else self.file
+
+    def to_dict(self, secrets: bool = False) -> Dict[str, Any]:
+        data = asdict(self)
+        if not secrets:
+            data["extra"] = {k: v for k, v in data["extra"].items() if k not in SECRET_KEYS}
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Finding":
+        return cls(**data)
+
+
+def findings_to_json(findings: Iterable[Finding]) -> str:
+    return json.dumps([f.to_dict() for f in findings])
+
+
+def findings_from_json(text: str) -> List[Finding]:
+    return [Finding.from_dict(item) for item in json.loads(text)]
+
+
+def _relative(path: str, root: Optional[str]) -> str:
+    if path.startswith("file://"):
+        path = path[len("file://"):]
+    if root and os.path.isabs(path):
+        path = os.path.relpath(path, root)
+    return path.replace(os.sep, "/")
+
+
+def _json_lines(stream: IO[str]) -> Iterator[Any]:
+    for line in stream:
+        line = line.strip()
+        if line.startswith(("{", "[")):
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def _load_json_documents(output: Output) -> List[Any]:
+    """
+    Parse a single JSON document, or one document per line (JSON Lines). A stream in JSON
+    Lines form is parsed line by line, without reading the whole output at once.
+    """
+    stream = io.StringIO(output) if isinstance(output, str) else output
+    start = stream.tell()
+    line = stream.readline()
+    while line and not line.strip():
+        line = stream.readline()
+    line = line.strip()
+    if not line:
+        return []
+    if line.startswith(("{", "[")):
+        try:
+            first = json.loads(line)
+        except ValueError:
+            pass  # The first line of a multi-line document, or a log line
+        else:
+            return [first, *_json_lines(stream)]
+    stream.seek(start)
+    try:
+        return [json.load(stream)]
+    except ValueError:
+        stream.seek(start)
+        return list(_json_lines(stream))
+
+
+def dependency_finding(tool: str, vuln_id: str, severity: str, package: str, version: str, title: str,
+                       fixed_in: Iterable[str], manifest: str) -> Finding:
+    """Finding for a vulnerable package version declared in `manifest`."""
+    package = f"{package}@{version}"
+    fixed_in = list(fixed_in or [])
+    message = f"{package}: {title}"
+    if fixed_in:
+        message += f" (fixed in {', '.join(fixed_in)})"
+    return Finding(
+        tool=tool, rule=vuln_id, severity=severity, file=manifest, line=None, message=message,
+        category="dependency", fingerprint=fingerprint("dependency", vuln_id, package, manifest),
+    )
+
+
+def snyk_vulnerabilities(document: Any, root: Optional[str] = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    (manifest, vulnerability object) pairs of a parsed `snyk test --json` document: one
+    project object, or a list of them for --all-projects. An advisory is listed once per
+    dependency path.
+    """
+    for project in document if isinstance(document, list) else [document]:
+        if not isinstance(project, dict):
+            continue
+        manifest = _relative(project.get("displayTargetFile") or project.get("targetFile") or "", root)
+        for vuln in project.get("vulnerabilities", []):
+            yield manifest, vuln
+
+
+def _sarif_findings(document: Any, tool: str, root: Optional[str]) -> List[Finding]:
+    findings = []
+    for run in document.get("runs", []) if isinstance(document, dict) else []:
+        for result in run.get("results", []):
+            location = (result.get("locations") or [{}])[0].get("physicalLocation", {})
+            file = _relative(location.get("artifactLocation", {}).get("uri", ""), root)
+            line = location.get("region", {}).get("startLine")
+            findings.append(Finding(
+                tool=tool, rule=result.get("ruleId", "unknown"),
+                severity=LEVEL_SEVERITY.get(result.get("level", "warning"), "medium"),
+                file=file, line=line, message=result.get("message", {}).get("text", "").strip(),
+                category="code",
+            ))
+    return findings
+
+
+def parse_sarif(output: Output, tool: str, root: Optional[str] = None) -> List[Finding]:
+    """Findings from a SARIF 2.1 log, as written by `pmd check -f sarif` and `snyk code test --json`."""
+    return [f for document in _load_json_documents(output) for f in _sarif_findings(document, tool, root)]
+
+
+def parse_sarif_file(path: str, tool: str, root: Optional[str] = None) -> List[Finding]:
+    """
+    Like `parse_sarif`, for a single report written to `path`. A report that is not valid
+    JSON (e.g. truncated by a crash) raises ScanError instead of reading as "no findings".
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        try:
+            document = json.load(f)
+        except ValueError as e:
+            raise ScanError(f"Could not parse the {tool} report: {e}")
+    return _sarif_findings(document, tool, root)
+
+
+def _secret(tool: str, rule: str, verified: bool, file: str, line: Optional[int], raw: str) -> Finding:
+    return Finding(
+        tool=tool, rule=rule, severity="critical" if verified else "high", file=file, line=line,
+        message=f"{rule} secret ({'verified' if verified else 'unverified'})", category="secret",
+        # Keyed on location only so trufflehog and ggshield hits on the same line collapse
+        fingerprint=fingerprint("secret", file, line),
+        extra={"raw": raw, "verified": verified, "secret_hash": secret_hash(raw), "secret_length": len(raw)},
+    )
+
+
+def parse_trufflehog(output: Output, root: Optional[str] = None) -> List[Finding]:
+    """Findings from `trufflehog ... --json` (one JSON object per line)."""
+    findings = []
+    for item in _load_json_documents(output):
+        if not isinstance(item, dict) or "DetectorName" not in item:
+            continue
+        data = item.get("SourceMetadata", {}).get("Data", {})
+        source = data.get("Filesystem") or data.get("Git") or {}
+        findings.append(_secret(
+            "trufflehog", item.get("DetectorName", "unknown"), bool(item.get("Verified")),
+            _relative(source.get("file", ""), root), source.get("line"), item.get("Raw", ""),
+        ))
+    return findings
+
+
+def parse_ggshield(output: Output, root: Optional[str] = None) -> List[Finding]:
+    """Findings from `ggshield secret scan ... --json`."""
+    findings = []
+    for document in _load_json_documents(output):
+        scans = [document] + document.get("scans", []) if isinstance(document, dict) else []
+        for scan in scans:
+            for entity in scan.get("entities_with_incidents", []):
+                file = _relative(entity.get("filename", ""), root)
+                for incident in entity.get("incidents", []):
+                    verified = incident.get("validity") == "valid"
+                    for occurrence in incident.get("occurrences", []):
+                        findings.append(_secret(
+                            "ggshield", incident.get("type", "unknown"), verified, file,
+                            occurrence.get("line_start"), occurrence.get("match", ""),
+                        ))
+    return findings
+
+
+def dedupe(findings: Iterable[Finding]) -> List[Finding]:
+    """Collapse findings with the same fingerprint, keeping the highest severity and all tool names."""
+    merged: Dict[str, Finding] = {}
+    for finding in findings:
+        existing = merged.get(finding.fingerprint)
+        if existing is None:
+            merged[finding.fingerprint] = Finding(**{**finding.to_dict(secrets=True), "extra": dict(finding.extra)})
+            continue
+        tools = set(existing.tool.split(",")) | set(finding.tool.split(","))
+        if SEVERITY_RANK[finding.severity] < SEVERITY_RANK[existing.severity]:
+            existing.severity = finding.severity
+            existing.message = finding.message
+        existing.tool = ",".join(sorted(tools))
+        for key, value in finding.extra.items():
+            existing.extra.setdefault(key, value)
+    return list(merged.values())
+
+
+def rank(findings: Iterable[Finding]) -> List[Finding]:
+    """Most severe first, then by file and line for a stable order."""
+    return sorted(findings, key=lambda f: (SEVERITY_RANK[f.severity], f.file, f.line or 0, f.rule))
+
+
+def summary_line(finding: Finding, root: Optional[str] = None) -> str:
+    location = os.path.join(root, finding.location) if root else finding.location
+    return f"[{finding.severity.upper()}] {finding.rule} ({finding.tool}) Location: {location} - {finding.message}"
+
+
+def summarize(findings: Iterable[Finding], token_budget: Optional[int] = None, root: Optional[str] = None) -> str:
+    """
+    Compact, ranked text summary for the agents. Lines are added in severity order until
+    `token_budget` (FINDINGS_TOKEN_BUDGET by default) is reached; the rest is counted only.
+    Locations are made absolute when `root` is given so agents can open the files.
+    """
+    findings = rank(dedupe(findings))
+    if token_budget is None:
+        token_budget = int(os.getenv("FINDINGS_TOKEN_BUDGET") or DEFAULT_TOKEN_BUDGET)
+    if not findings:
+        return "No findings."
+
+    counts = Counter(f.severity for f in findings)
+    header = f"{len(findings)} findings (" + ", ".join(
+        f"{counts[s]} {s}" for s in SEVERITIES if counts[s]) + ")"
+    lines = [header]
+    budget = token_budget * CHARS_PER_TOKEN - len(header)
+    shown = 0
+    for finding in findings:
+        line = summary_line(finding, root)
+        if len(line) + 1 > budget:
+            break
+        lines.append(line)
+        budget -= len(line) + 1
+        shown += 1
+    if shown < len(findings):
+        rest = Counter(f.severity for f in findings[shown:])
+        lines.append(f"... {len(findings) - shown} more findings not shown (" + ", ".join(
+            f"{rest[s]} {s}" for s in SEVERITIES if rest[s]) + ")")
+    return "\n".join(lines)
+
+
+def group_by_file(findings: Iterable[Finding]) -> Dict[str, List[str]]:
+    """Serialized findings keyed by file, the record format used by incremental scans."""
+    results: Dict[str, List[str]] = {}
+    for finding in findings:
+        results.setdefault(finding.file, []).append(json.dumps(finding.to_dict()))
+    return results
+
+
+def ungroup(results: Dict[str, List[str]]) -> List[Finding]:
+    return [Finding.from_dict(json.loads(record)) for records in results.values() for record in records]
+
+
+def to_sarif(findings: Iterable[Finding]) -> Dict[str, Any]:
+    """SARIF 2.1.0 log with one run per tool."""
+    runs: Dict[str, Dict[str, Any]] = {}
+    for finding in rank(findings):
+        run = runs.setdefault(finding.tool, {"tool": {"driver": {"name": finding.tool, "rules": []}}, "results": []})
+        rules = run["tool"]["driver"]["rules"]
+        if not any(rule["id"] == finding.rule for rule in rules):
+            rules.append({"id": finding.rule})
+        location = {"artifactLocation": {"uri": finding.file}}
+        if finding.line:
+            location["region"] = {"startLine": finding.line}
+        run["results"].append({
+            "ruleId": finding.rule,
+            "level": SARIF_LEVELS[finding.severity],
+            "message": {"text": finding.message},
+            "locations": [{"physicalLocation": location}],
+            "partialFingerprints": {"appsecFingerprint/v1": finding.fingerprint},
+            "properties": {"severity": finding.severity, "category": finding.category},
+        })
+    return {
+        "$schema": "https://json.schemastore.org/sarif-2.1.0.json",
+        "version": "2.1.0",
+        "runs": list(runs.values()),
+    }
+
+
+class FindingsStore:
+    """Process-wide collection of findings per repository checkout, shared by the tools."""
+
+    _default: Optional["FindingsStore"] = None
+    _default_lock = threading.Lock()
+
+    def __init__(self):
+        self._findings: Dict[str, List[Finding]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def default(cls) -> "FindingsStore":
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls()
+            return cls._default
+
+    def add(self, local_path: str, findings: Iterable[Finding]) -> None:
+        with self._lock:
+            self._findings.setdefault(os.path.abspath(local_path), []).extend(findings)
+
+    def discard(self, local_path: str) -> None:
+        """Forget the findings of a checkout once it has been reported (long-running processes)."""
+        with self._lock:
+            self._findings.pop(os.path.abspath(local_path), None)
+
+    def get(self, local_path: str, category: Optional[str] = None) -> List[Finding]:
+        """Deduplicated, ranked findings for a checkout, optionally of one category."""
+        with self._lock:
+            findings = list(self._findings.get(os.path.abspath(local_path), []))
+        return rank(f for f in dedupe(findings) if category is None or f.category == category)
+
+    def write_sarif(self, local_path: str, path: str) -> None:
+        """Export the findings of a checkout as a SARIF file, written atomically."""
+        atomic_write(path, json.dumps(to_sarif(self.get(local_path)), indent=2))
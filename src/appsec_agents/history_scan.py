@@ -0,0 +1,209 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from appsec_agents.fileio import atomic_write
+from appsec_agents.findings import Finding, ScanError, fingerprint, parse_trufflehog
+from appsec_agents.incremental import DEFAULT_STATE_DIR, repo_key
+from appsec_agents.pull_requests import git, git_output
+from appsec_agents.runner import run_command, timeout_for
+from appsec_agents.secret_prefilter import DEFAULT_MAX_FILE_SIZE, PREFILTER_VERSION, may_contain_secret, skipped
+
+logger = logging.getLogger(__name__)
+
+# Blobs written to the scan directory per trufflehog invocation
+BLOBS_PER_INVOCATION = 5000
+
+
+def history_scan_enabled() -> bool:
+    """True when SECRET_HISTORY_SCAN is set, which adds the git history to secret detection."""
+    return os.getenv("SECRET_HISTORY_SCAN", "").lower() in ("1", "true", "yes")
+
+
+def _cat_blobs(local_path: str, shas: List[str],
+               max_size: int = DEFAULT_MAX_FILE_SIZE) -> Iterator[Tuple[str, bytes]]:
+    """Contents of `shas` from one `git cat-file --batch` process; blobs over `max_size` bytes are skipped."""
+    proc = subprocess.Popen(["git", "-C", local_path, "cat-file", "--batch"],
+                            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+    def feed():
+        try:
+            for sha in shas:
+                proc.stdin.write(sha.encode("ascii") + b"\n")
+        except BrokenPipeError:
+            pass
+        finally:
+            proc.stdin.close()
+
+    # Writing from a thread so neither pipe can fill up while the other is waited on
+    writer = threading.Thread(target=feed, daemon=True)
+    writer.start()
+    try:
+        for _ in shas:
+            header = proc.stdout.readline().split()
+            if len(header) < 3:  # "<sha> missing"
+                continue
+            size = int(header[2])
+            if size > max_size:
+                remaining = size + 1  # drained in chunks with the trailing newline, never held in memory
+                while remaining > 0:
+                    chunk = proc.stdout.read(min(remaining, 1024 * 1024))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                logger.debug(f"Skipping blob {header[0].decode('ascii')} of {size} bytes")
+                continue
+            data = proc.stdout.read(size)
+            proc.stdout.read(1)  # trailing newline
+            yield header[0].decode("ascii"), data
+    finally:
+        proc.stdout.close()
+        proc.wait()
+        writer.join()
+
+
+class HistorySecretScan:
+    """
+    Secret scan of every blob reachable from any ref, each unique blob exactly once.
+
+    Blobs of the checked-out tree are left to the working-tree scan. The SHAs of the blobs
+    already scanned, and the secrets found in them, are kept per repository in WATERMARK_DIR,
+    so later runs only read blobs that appeared since; blobs over 16 MB are skipped. Each hit
+    is reported with the commit that introduced the blob and the path it was added under.
+    """
+
+    def __init__(self, local_path: str, state_dir: Optional[str] = None, use_prefilter: bool = False):
+        self.local_path = os.path.abspath(local_path)
+        self.use_prefilter = use_prefilter
+        repo_hash = hashlib.sha256(repo_key(self.local_path).encode("utf-8")).hexdigest()[:16]
+        state_dir = state_dir or os.getenv("WATERMARK_DIR") or DEFAULT_STATE_DIR
+        name = f"history-v{PREFILTER_VERSION}.json" if use_prefilter else "history.json"
+        self.state_path = os.path.join(state_dir, repo_hash, name)
+
+    def _git(self, *args: str) -> str:
+        return git_output(self.local_path, *args)
+
+    def reachable_blobs(self) -> Dict[str, str]:
+        """SHA -> path of every blob reachable from any ref (one of the paths it appears under)."""
+        blobs = {}
+        for line in self._git("rev-list", "--objects", "--all", "--filter=object:type=blob").splitlines():
+            sha, _, path = line.partition(" ")
+            if path:  # commits are listed without a path
+                blobs[sha] = path
+        return blobs
+
+    def head_blobs(self) -> Set[str]:
+        try:
+            listing = self._git("ls-tree", "-r", "--full-tree", "HEAD")
+        except subprocess.CalledProcessError:
+            return set()  # no commits yet
+        return {line.split("\t", 1)[0].split()[2] for line in listing.splitlines() if "\t" in line}
+
+    def introduced(self, shas: Set[str]) -> Dict[str, Tuple[str, str]]:
+        """SHA -> oldest commit on any ref that added the blob and the path it was added under, in one pass."""
+        origins: Dict[str, Tuple[str, str]] = {}
+        result = git(self.local_path, "log", "--all", "--reverse", "--format=%H", "--raw", "--no-abbrev",
+                     "--no-renames")
+        try:
+            commit = None
+            with result.open_stdout() as output:
+                for line in output:
+                    line = line.rstrip("\n")
+                    if line.startswith(":"):
+                        # ":<old mode> <new mode> <old sha> <new sha> <status>\t<path>"
+                        meta, _, path = line.partition("\t")
+                        sha = meta.split()[3]
+                        if sha in shas and sha not in origins:
+                            origins[sha] = (commit, path)
+                    elif line:
+                        commit = line
+        finally:
+            result.cleanup()
+        return origins
+
+    def _load(self) -> Tuple[Set[str], List[Finding]]:
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            return set(state["blobs"]), [Finding.from_dict(item) for item in state["findings"]]
+        except (OSError, ValueError, KeyError, TypeError):
+            return set(), []
+
+    def _save(self, blobs: Set[str], findings: List[Finding]) -> None:
+        atomic_write(self.state_path, json.dumps({"blobs": sorted(blobs),
+                                                  "findings": [finding.to_dict() for finding in findings]}))
+
+    def run(self) -> List[Finding]:
+        if self._git("rev-parse", "--is-shallow-repository").strip() == "true":
+            logger.warning(f"{self.local_path} is a shallow clone, only the fetched history is scanned")
+        scanned, previous = self._load()
+        blobs = self.reachable_blobs()
+        in_head = self.head_blobs()
+        new = sorted(sha for sha, path in blobs.items()
+                     if sha not in scanned and sha not in in_head and not skipped(path))
+        logger.info(f"History scan of {self.local_path}: {len(blobs)} reachable blobs, "
+                    f"{len(new)} not scanned before")
+
+        found: List[Finding] = []
+        for i in range(0, len(new), BLOBS_PER_INVOCATION):
+            found.extend(self._scan(new[i:i + BLOBS_PER_INVOCATION], blobs))
+        # Blobs of the checked-out tree are not recorded, so they are scanned once they leave it
+        scanned.update(new)
+        findings = [f for f in previous if f.extra.get("blob") in blobs] + found
+        self._save(scanned, findings)
+        return [f for f in findings if f.extra.get("blob") not in in_head]
+
+    def _scan(self, shas: List[str], paths: Dict[str, str]) -> List[Finding]:
+        scan_dir = tempfile.mkdtemp(prefix="appsec-history-")
+        try:
+            files: Dict[str, str] = {}
+            for sha, data in _cat_blobs(self.local_path, shas):
+                if self.use_prefilter and not may_contain_secret(data):
+                    continue
+                # Keep the extension, some detectors only look at certain file types
+                name = os.path.join(sha[:2], sha + os.path.splitext(paths[sha])[1])
+                os.makedirs(os.path.join(scan_dir, sha[:2]), exist_ok=True)
+                with open(os.path.join(scan_dir, name), "wb") as f:
+                    f.write(data)
+                files[name.replace(os.sep, "/")] = sha
+            if not files:
+                return []
+            result = run_command(["trufflehog", "filesystem", scan_dir, "--json"],
+                                 timeout=timeout_for("trufflehog", 1800))
+            try:
+                if result.timed_out:
+                    raise ScanError(f"History secret scan timed out after {result.duration:.0f} seconds.")
+                if result.returncode != 0:
+                    raise ScanError(f"History secret scan failed:\n{result.stderr}")
+                with result.open_stdout() as output:
+                    hits = parse_trufflehog(output, root=scan_dir)
+            finally:
+                result.cleanup()
+        finally:
+            shutil.rmtree(scan_dir, ignore_errors=True)
+        return self._map_hits(hits, files, paths)
+
+    def _map_hits(self, hits: Iterable[Finding], files: Dict[str, str], paths: Dict[str, str]) -> List[Finding]:
+        hits = [hit for hit in hits if hit.file in files]
+        origins = self.introduced({files[hit.file] for hit in hits}) if hits else {}
+        findings = []
+        for hit in hits:
+            sha = files[hit.file]
+            commit, path = origins.get(sha, (None, None))
+            verified = hit.extra.get("verified", False)
+            findings.append(Finding(
+                tool=hit.tool, rule=hit.rule, severity=hit.severity, file=path or paths[sha], line=hit.line,
+                message=f"{hit.rule} secret ({'verified' if verified else 'unverified'}) in git history, "
+                        f"introduced in commit {commit[:12] if commit else 'unknown'}",
+                # Kept apart from the working-tree secrets, which are remediated in place
+                category="secret-history",
+                fingerprint=fingerprint("secret-history", sha, hit.line),
+                extra=dict(hit.extra, blob=sha, commit=commit),
+            ))
+        return findings
@@ -0,0 +1,144 @@
+import hashlib
+import json
+import logging
+import os
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from git import GitCommandError, InvalidGitRepositoryError, NoSuchPathError, Repo
+
+from appsec_agents.fileio import atomic_write
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STATE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "appsec_agents", "watermarks")
+REPO_PLACEHOLDER = "<repo>"
+
+
+def incremental_disabled() -> bool:
+    """True when INCREMENTAL_SCAN_DISABLED is set, which forces full scans."""
+    return os.getenv("INCREMENTAL_SCAN_DISABLED", "").lower() in ("1", "true", "yes")
+
+
+def _repo_key(repo: Repo) -> str:
+    # Workspaces are cloned to per-run paths, so identify the repository by its remote
+    try:
+        return repo.remote("origin").url
+    except ValueError:
+        return os.path.abspath(repo.working_tree_dir)
+
+
+def repo_key(local_path: str) -> str:
+    """Identity of the checkout at `local_path` that survives re-cloning to another path."""
+    try:
+        return _repo_key(Repo(local_path))
+    except (InvalidGitRepositoryError, NoSuchPathError):
+        return os.path.abspath(local_path)
+
+
+class IncrementalScan:
+    """
+    Watermark of the last fully scanned commit for one (repository, tool, arguments)
+    combination, together with the tool's results grouped by repository-relative file.
+
+    On the next run `changed` holds the files touched since the watermark (committed,
+    modified or untracked); the tool only rescans those and `merge` carries the results
+    of every other file over. `changed` is None when a full scan is required: first
+    run or unreachable watermark (force push, shallow clone).
+    """
+
+    def __init__(self, tool: str, repo: Repo, args: Any = None, state_dir: Optional[str] = None):
+        self.local_path = os.path.abspath(repo.working_tree_dir)
+        self.head = repo.head.commit.hexsha
+        self.changed: Optional[Set[str]] = None
+        self.previous: Dict[str, List[str]] = {}
+
+        args_hash = hashlib.sha256(json.dumps([tool, args], sort_keys=True).replace(
+            self.local_path, REPO_PLACEHOLDER).encode("utf-8")).hexdigest()[:16]
+        repo_hash = hashlib.sha256(_repo_key(repo).encode("utf-8")).hexdigest()[:16]
+        state_dir = state_dir or os.getenv("WATERMARK_DIR") or DEFAULT_STATE_DIR
+        self.state_path = os.path.join(state_dir, repo_hash, f"{args_hash}.json")
+
+        dirty = set(repo.git.diff("--name-only", "--no-renames", "HEAD").splitlines())
+        dirty.update(repo.untracked_files)
+        self.clean = not dirty
+
+        state = self._load()
+        if state is None:
+            return
+        try:
+            repo.git.cat_file("-e", f"{state['commit']}^{{commit}}")
+            committed = repo.git.diff("--name-only", "--no-renames", state["commit"], "HEAD")
+        except GitCommandError:
+            logger.info(f"Watermark {state['commit']} is not reachable, running a full scan")
+            return
+        self.changed = set(committed.splitlines()) | dirty
+        self.previous = state["files"]
+        logger.info(f"Incremental scan of {self.local_path}: {len(self.changed)} files changed since {state['commit'][:12]}")
+
+    @classmethod
+    def for_repo(cls, tool: str, local_path: str, args: Any = None,
+                 state_dir: Optional[str] = None) -> Optional["IncrementalScan"]:
+        """Watermark for the repository at `local_path`, or None if it is not a git checkout."""
+        try:
+            return cls(tool, Repo(local_path), args=args, state_dir=state_dir)
+        except (InvalidGitRepositoryError, NoSuchPathError, ValueError):
+            return None
+
+    @property
+    def full(self) -> bool:
+        return self.changed is None
+
+    def _load(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        state["files"] = {
+            path: [record.replace(REPO_PLACEHOLDER, self.local_path) for record in records]
+            for path, records in state["files"].items()
+        }
+        return state
+
+    def changed_paths(self, suffixes: Iterable[str] = (), prefix: str = "") -> List[str]:
+        """Absolute paths of changed files that still exist, optionally filtered."""
+        suffixes = tuple(suffixes)
+        paths = []
+        for rel in sorted(self.changed or ()):
+            if not rel.startswith(prefix) or (suffixes and not rel.endswith(suffixes)):
+                continue
+            path = os.path.join(self.local_path, rel)
+            if os.path.isfile(path):
+                paths.append(path)
+        return paths
+
+    def relative(self, path: str) -> str:
+        """Repository-relative form of a path reported by a scanner."""
+        path = os.path.abspath(os.path.join(self.local_path, path))
+        return os.path.relpath(path, self.local_path).replace(os.sep, "/")
+
+    def merge(self, results: Dict[str, List[str]]) -> Dict[str, List[str]]:
+        """Combine fresh per-file results with the carried-over results of unchanged files."""
+        if self.full:
+            return dict(results)
+        merged = {path: records for path, records in self.previous.items() if path not in self.changed}
+        merged.update(results)
+        return merged
+
+    def save(self, results: Dict[str, List[str]]) -> None:
+        """Advance the watermark to HEAD. Dirty checkouts never become a watermark."""
+        if not self.clean:
+            return
+        state = {
+            "commit": self.head,
+            "files": {
+                path: [record.replace(self.local_path, REPO_PLACEHOLDER) for record in records]
+                for path, records in sorted(results.items())
+            },
+        }
+        atomic_write(self.state_path, json.dumps(state))
+
+
+def render(results: Dict[str, List[str]], separator: str = "\n") -> str:
+    """Flatten per-file results back into a report ordered by file."""
+    return separator.join(record for path in sorted(results) for record in results[path])
@@ -0,0 +1,73 @@
+import os
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+MAIN_SOURCE_DIR = os.path.join("src", "main", "java")
+# Build output, dependencies and VCS metadata never contain sources worth analysing
+SKIPPED_DIRS = {".git", ".hg", ".svn", ".gradle", ".idea", ".mvn", "target", "build", "out", "node_modules"}
+DEFAULT_FILES_PER_SHARD = 3000
+
+
+@dataclass
+class SourceRoot:
+    """A `src/main/java` directory (relative to the repository) and the number of Java files in it."""
+    path: str
+    files: int
+
+
+@dataclass
+class Shard:
+    """Source roots analysed together by one PMD invocation."""
+    roots: List[SourceRoot] = field(default_factory=list)
+
+    @property
+    def files(self) -> int:
+        return sum(root.files for root in self.roots)
+
+
+def _count_java_files(path: str) -> int:
+    count = 0
+    for _, dirs, files in os.walk(path):
+        dirs[:] = [d for d in dirs if d not in SKIPPED_DIRS]
+        count += sum(1 for name in files if name.endswith(".java"))
+    return count
+
+
+def discover_source_roots(local_path: str) -> List[SourceRoot]:
+    """
+    Find the main Java source roots of every Maven/Gradle module under `local_path`,
+    e.g. `src/main/java` and `services/api/src/main/java`. Repositories without the
+    standard layout fall back to the repository root if it holds any Java files.
+    """
+    roots = []
+    for dirpath, dirs, _ in os.walk(local_path):
+        dirs[:] = sorted(d for d in dirs if d not in SKIPPED_DIRS and not d.startswith("."))
+        rel = os.path.relpath(dirpath, local_path)
+        if rel == MAIN_SOURCE_DIR or rel.endswith(os.sep + MAIN_SOURCE_DIR):
+            files = _count_java_files(dirpath)
+            if files:
+                roots.append(SourceRoot(rel.replace(os.sep, "/"), files))
+            # Nested modules do not live inside a source root
+            dirs[:] = []
+    if not roots:
+        files = _count_java_files(local_path)
+        if files:
+            roots.append(SourceRoot(".", files))
+    return roots
+
+
+def plan_shards(roots: List[SourceRoot], max_shards: int,
+                files_per_shard: Optional[int] = None) -> List[Shard]:
+    """
+    Split source roots into at most `max_shards` groups of similar size, largest roots
+    first. Small projects stay in a single shard because every PMD run starts a JVM.
+    """
+    files_per_shard = files_per_shard or DEFAULT_FILES_PER_SHARD
+    total = sum(root.files for root in roots)
+    count = max(1, min(max_shards, len(roots), -(-total // files_per_shard)))
+    shards = [Shard() for _ in range(count)]
+    for root in sorted(roots, key=lambda r: (-r.files, r.path)):
+        min(shards, key=lambda s: s.files).roots.append(root)
+    for shard in shards:
+        shard.roots.sort(key=lambda r: r.path)
+    return [shard for shard in shards if shard.roots]
@@ -0,0 +1,193 @@
+import functools
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from appsec_agents.scan_cache import DiskLRUCache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "appsec_agents", "llm")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024  # 256 MB
+DEFAULT_TTL = 7 * 24 * 3600  # a week
+DEFAULT_MODEL = "gpt-4o-mini"
+
+OFF, READWRITE, REPLAY = "off", "readwrite", "replay"
+
+# Inputs that differ between runs of the same scan; they are hashed and stored as placeholders
+VOLATILE_INPUTS = ("local_path", "repo_url", "commit")
+
+# Completion parameters that change what the model answers
+SAMPLING_PARAMS = ("temperature", "top_p", "n", "stop", "max_tokens", "max_completion_tokens",
+                   "presence_penalty", "frequency_penalty", "response_format", "seed")
+
+
+class LLMCacheMiss(RuntimeError):
+    """Raised in replay mode when a prompt has no recorded response."""
+
+
+def placeholders(inputs: Dict[str, Any]) -> Dict[str, str]:
+    """Value -> placeholder for the run-specific crew inputs (workspace path, repository URL, commit)."""
+    return {
+        str(inputs[name]): f"<{name}>"
+        for name in VOLATILE_INPUTS
+        # Short values such as "HEAD" would also match ordinary prompt text
+        if inputs.get(name) and len(str(inputs[name])) >= 8
+    }
+
+
+def _substitute(value: Any, substitutions: Dict[str, str]) -> Any:
+    """`value` (a string or JSON-like structure) with each key of `substitutions` replaced by its value."""
+    if isinstance(value, str):
+        # Longest first, so a path is replaced before a shorter value it contains
+        for old in sorted(substitutions, key=len, reverse=True):
+            value = value.replace(old, substitutions[old])
+        return value
+    if isinstance(value, list):
+        return [_substitute(item, substitutions) for item in value]
+    if isinstance(value, dict):
+        return {k: _substitute(v, substitutions) for k, v in value.items()}
+    return value
+
+
+def _normalize_text(text: str) -> str:
+    return "\n".join(line.rstrip() for line in text.strip().splitlines())
+
+
+def normalize_messages(messages: Any) -> List[Dict[str, Any]]:
+    """Chat messages reduced to what the model sees, with insignificant whitespace removed."""
+    if isinstance(messages, str):
+        messages = [{"role": "user", "content": messages}]
+    normalized = []
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, str):
+            content = _normalize_text(content)
+        entry = {"role": message.get("role"), "content": content}
+        for extra in ("name", "tool_calls", "tool_call_id"):
+            if message.get(extra):
+                entry[extra] = message[extra]
+        normalized.append(entry)
+    return normalized
+
+
+class LLMResponseCache(DiskLRUCache):
+    """
+    Completions keyed by a hash of (model, messages including the system prompt, tool schema,
+    sampling parameters). Run-specific values are replaced by placeholders before hashing, so
+    the same finding explained for another checkout of the repository is still a hit.
+
+    Modes: "readwrite" serves hits and records misses; "replay" serves hits only and raises
+    LLMCacheMiss otherwise, so a rerun is deterministic and makes no LLM calls; "off" disables it.
+    """
+
+    _default: Optional["LLMResponseCache"] = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, cache_dir: str, max_bytes: int = DEFAULT_MAX_BYTES, ttl: Optional[float] = DEFAULT_TTL,
+                 mode: str = READWRITE):
+        if mode not in (OFF, READWRITE, REPLAY):
+            raise ValueError(f"Unknown LLM cache mode {mode!r}, expected one of {OFF}, {READWRITE}, {REPLAY}")
+        super().__init__(cache_dir, max_bytes, ttl)
+        self.mode = mode
+        self._agents: Dict[str, Dict[str, int]] = {}
+
+    @classmethod
+    def default(cls) -> "LLMResponseCache":
+        """Process-wide cache configured from LLM_CACHE_MODE, LLM_CACHE_DIR, LLM_CACHE_MAX_BYTES and LLM_CACHE_TTL."""
+        with cls._default_lock:
+            if cls._default is None:
+                ttl = os.getenv("LLM_CACHE_TTL")
+                cls._default = cls(
+                    os.getenv("LLM_CACHE_DIR") or DEFAULT_CACHE_DIR,
+                    int(os.getenv("LLM_CACHE_MAX_BYTES") or DEFAULT_MAX_BYTES),
+                    # 0 keeps entries until they are evicted for space
+                    (float(ttl) or None) if ttl else DEFAULT_TTL,
+                    (os.getenv("LLM_CACHE_MODE") or OFF).lower(),
+                )
+            return cls._default
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != OFF
+
+    def key(self, model: str, messages: Any, tools: Optional[List[Dict[str, Any]]] = None,
+            params: Optional[Dict[str, Any]] = None, substitutions: Optional[Dict[str, str]] = None) -> str:
+        material = {
+            "model": model,
+            "messages": _substitute(normalize_messages(messages), substitutions or {}),
+            "tools": tools or [],
+            "params": {k: v for k, v in (params or {}).items() if v is not None},
+        }
+        return hashlib.sha256(json.dumps(material, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def complete(self, agent: str, model: str, messages: Any, call: Callable[[], Any],
+                 tools: Optional[List[Dict[str, Any]]] = None, params: Optional[Dict[str, Any]] = None,
+                 substitutions: Optional[Dict[str, str]] = None) -> Any:
+        """The cached response for the prompt, or the result of `call()`, which is stored if it is text."""
+        substitutions = substitutions or {}
+        key = self.key(model, messages, tools, params, substitutions)
+        cached = self.get(key)
+        self._count(agent, "hits" if cached is not None else "misses")
+        if cached is not None:
+            logger.debug(f"LLM cache hit for {agent} ({key[:12]})")
+            return _substitute(cached, {placeholder: value for value, placeholder in substitutions.items()})
+        if self.mode == REPLAY:
+            raise LLMCacheMiss(f"No recorded response for {agent} with {model} (key {key[:12]}) in replay mode")
+        response = call()
+        if isinstance(response, str):
+            self.put(key, _substitute(response, substitutions))
+        return response
+
+    def _count(self, agent: str, outcome: str) -> None:
+        with self._lock:
+            counts = self._agents.setdefault(agent, {"hits": 0, "misses": 0})
+            counts[outcome] += 1
+
+    def agent_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Hits, misses and hit rate per agent since the process started."""
+        with self._lock:
+            return {
+                agent: dict(counts, hit_rate=round(counts["hits"] / max(1, counts["hits"] + counts["misses"]), 3))
+                for agent, counts in self._agents.items()
+            }
+
+
+@functools.lru_cache(maxsize=None)
+def _caching_llm_class():
+    from crewai import LLM
+
+    class CachingLLM(LLM):
+        """crewai LLM whose completions go through the LLMResponseCache, with stats under `agent`."""
+
+        def __init__(self, *args, agent: str = "", cache: Optional[LLMResponseCache] = None, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.agent = agent
+            self.cache = cache or LLMResponseCache.default()
+            self.substitutions: Dict[str, str] = {}
+
+        def call(self, messages, *args, **kwargs):
+            if kwargs.get("available_functions"):
+                # The call would execute tools itself; replaying it would skip their side effects
+                return super().call(messages, *args, **kwargs)
+            params = {name: getattr(self, name, None) for name in SAMPLING_PARAMS}
+            return self.cache.complete(self.agent, self.model, messages,
+                                       lambda: super(CachingLLM, self).call(messages, *args, **kwargs),
+                                       tools=kwargs.get("tools"), params=params, substitutions=self.substitutions)
+
+    return CachingLLM
+
+
+def caching_llm(agent: str, model: Optional[str] = None):
+    """
+    LLM for the crew agent `agent` that answers repeated prompts from the LLMResponseCache,
+    or None when LLM_CACHE_MODE is off, which leaves crewai's default LLM in place.
+    """
+    cache = LLMResponseCache.default()
+    if not cache.enabled:
+        return None
+    model = model or os.getenv("MODEL") or os.getenv("OPENAI_MODEL_NAME") or DEFAULT_MODEL
+    return _caching_llm_class()(model=model, agent=agent, cache=cache)
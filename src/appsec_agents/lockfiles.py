@@ -0,0 +1,117 @@
+import json
+import os
+import re
+from typing import Callable, Dict, List, Tuple
+
+# (name, version) pairs resolved from a manifest
+Packages = List[Tuple[str, str]]
+
+_REQUIREMENT = re.compile(r"^\s*([A-Za-z0-9][A-Za-z0-9._-]*)(?:\[[^\]]*\])?\s*===?\s*([^\s;#,]+)")
+_TOML_PACKAGE = re.compile(r'^\[\[package\]\]\s*$\s*^name\s*=\s*"([^"]+)"\s*$\s*^version\s*=\s*"([^"]+)"', re.M)
+_YARN_ENTRY = re.compile(r'^"?((?:@[^@/\s"]+/)?[^@\s"]+)@[^\n]*:\s*\n\s+version:?\s+"?([^"\s]+)"?', re.M)
+_PNPM_PACKAGE = re.compile(r"^\s{2}'?/?((?:@[^@/\s']+/)?[^@/\s'(]+)[@/](\d[^:('\s]*)", re.M)
+_GO_REQUIRE = re.compile(r"^\s*(?:require\s+)?([^\s()]+\.[^\s()]+/[^\s()]*)\s+(v[^\s]+)", re.M)
+_GEM_SPEC = re.compile(r"^ {4}([A-Za-z0-9._-]+) \(([^)\s]+)\)$", re.M)
+_GRADLE_LOCK = re.compile(r"^([^#:\s]+:[^:\s]+):([^=\s]+)=", re.M)
+_GRADLE_COORDINATE = re.compile(r"""['"]([\w.\-]+:[\w.\-]+):(\d[\w.\-]*)['"]""")
+_NUGET_PACKAGE = re.compile(r'<package\s+id="([^"]+)"\s+version="([^"]+)"', re.I)
+_XML_DEPENDENCY = re.compile(r"<dependency>(.*?)</dependency>", re.S)
+_XML_PROPERTY = re.compile(r"<([\w.\-]+)>([^<]*)</\1>")
+
+
+def _read(path: str) -> str:
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        return f.read()
+
+
+def _package_lock(text: str) -> Packages:
+    document = json.loads(text)
+    packages = []
+    for path, info in (document.get("packages") or {}).items():  # lockfileVersion 2 and 3
+        if path and "version" in info and not info.get("link"):
+            packages.append((info.get("name") or path.rsplit("node_modules/", 1)[-1], info["version"]))
+    if packages:
+        return packages
+
+    def walk(dependencies):  # lockfileVersion 1
+        for name, info in (dependencies or {}).items():
+            if "version" in info:
+                packages.append((name, info["version"]))
+            walk(info.get("dependencies"))
+
+    walk(document.get("dependencies"))
+    return packages
+
+
+def _pipfile_lock(text: str) -> Packages:
+    document = json.loads(text)
+    return [
+        (name, info["version"].lstrip("="))
+        for section in ("default", "develop")
+        for name, info in (document.get(section) or {}).items()
+        if info.get("version", "").startswith("==")
+    ]
+
+
+def _composer_lock(text: str) -> Packages:
+    document = json.loads(text)
+    return [
+        (p["name"], p["version"].lstrip("v"))
+        for section in ("packages", "packages-dev")
+        for p in document.get(section) or []
+        if "name" in p and "version" in p
+    ]
+
+
+def _pom(text: str) -> Packages:
+    # Only versions written in the POM itself or in its <properties>; no parent or BOM resolution
+    properties = dict(_XML_PROPERTY.findall(text.split("<properties>", 1)[-1].split("</properties>", 1)[0])) \
+        if "<properties>" in text else {}
+    packages = []
+    for block in _XML_DEPENDENCY.findall(text):
+        fields = dict(_XML_PROPERTY.findall(block))
+        version = fields.get("version", "")
+        version = re.sub(r"\$\{([^}]+)\}", lambda m: properties.get(m.group(1), m.group(0)), version)
+        if fields.get("groupId") and fields.get("artifactId") and version and "${" not in version:
+            packages.append((f"{fields['groupId']}:{fields['artifactId']}", version))
+    return packages
+
+
+def _gradle(path: str) -> Packages:
+    lockfile = os.path.join(os.path.dirname(path), "gradle.lockfile")
+    if os.path.isfile(lockfile):
+        return _GRADLE_LOCK.findall(_read(lockfile))
+    return _GRADLE_COORDINATE.findall(_read(path))
+
+
+def _requirements(text: str) -> Packages:
+    return [m.groups() for m in map(_REQUIREMENT.match, text.splitlines()) if m]
+
+
+PARSERS: Dict[str, Callable[[str], Packages]] = {
+    "package-lock.json": lambda path: _package_lock(_read(path)),
+    "yarn.lock": lambda path: _YARN_ENTRY.findall(_read(path)),
+    "pnpm-lock.yaml": lambda path: _PNPM_PACKAGE.findall(_read(path).split("\npackages:", 1)[-1]),
+    "pom.xml": lambda path: _pom(_read(path)),
+    "build.gradle": _gradle,
+    "build.gradle.kts": _gradle,
+    "poetry.lock": lambda path: _TOML_PACKAGE.findall(_read(path)),
+    "Pipfile.lock": lambda path: _pipfile_lock(_read(path)),
+    "requirements.txt": lambda path: _requirements(_read(path)),
+    "go.mod": lambda path: _GO_REQUIRE.findall(_read(path)),
+    "Gemfile.lock": lambda path: _GEM_SPEC.findall(_read(path)),
+    "composer.lock": lambda path: _composer_lock(_read(path)),
+    "Cargo.lock": lambda path: _TOML_PACKAGE.findall(_read(path)),
+    "packages.config": lambda path: _NUGET_PACKAGE.findall(_read(path)),
+}
+
+
+def parse_lockfile(path: str) -> Packages:
+    """
+    Resolved (name, version) pairs of a manifest, without running the package manager.
+    Unpinned requirements and versions that need remote resolution are left out.
+    """
+    parser = PARSERS.get(os.path.basename(path))
+    if parser is None:
+        raise ValueError(f"Unsupported manifest: {path}")
+    return sorted(set(parser(path)))
@@ -0,0 +1,78 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Optional
+
+DEFAULT_LOG_DIR = "logs"
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+DEFAULT_BACKUP_COUNT = 5
+
+# Attributes every LogRecord has; anything else was passed with `extra=` and goes into the JSON
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+_listener: Optional[QueueListener] = None
+_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, thread, message, `extra` fields and traceback."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(log_dir: Optional[str] = None, level: Optional[str] = None) -> QueueListener:
+    """
+    Route all logging through a queue: the logging call only enqueues the record and a
+    listener thread writes it to the console and to a rotating JSON-lines file
+    (`<LOG_DIR>/debug.jsonl`, LOG_MAX_BYTES per file, LOG_BACKUP_COUNT backups).
+    Safe to call more than once; later calls return the running listener.
+    """
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return _listener
+        log_dir = log_dir or os.getenv("LOG_DIR") or DEFAULT_LOG_DIR
+        os.makedirs(log_dir, exist_ok=True)
+
+        file_handler = RotatingFileHandler(
+            os.path.join(log_dir, "debug.jsonl"),
+            maxBytes=int(os.getenv("LOG_MAX_BYTES") or DEFAULT_MAX_BYTES),
+            backupCount=int(os.getenv("LOG_BACKUP_COUNT") or DEFAULT_BACKUP_COUNT),
+            encoding="utf-8", delay=True,
+        )
+        file_handler.setLevel(logging.DEBUG)
+        file_handler.setFormatter(JsonFormatter())
+
+        console_handler = logging.StreamHandler()
+        console_handler.setLevel(logging.INFO)
+        console_handler.setFormatter(logging.Formatter('%(message)s'))
+
+        log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+        root = logging.getLogger()
+        root.setLevel(level or os.getenv("LOG_LEVEL") or logging.INFO)
+        root.addHandler(QueueHandler(log_queue))
+
+        _listener = QueueListener(log_queue, console_handler, file_handler, respect_handler_level=True)
+        _listener.start()
+        # Flush the records still in the queue when the process exits
+        atexit.register(_listener.stop)
+        return _listener
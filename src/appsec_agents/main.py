@@ -1,49 +1,37 @@
 #!/usr/bin/env python
+import argparse
 import json
+import logging
+import os
 import random
 import string
 import sys
 import time
 import warnings
 
-from appsec_agents.crew import AppsecAgents
+from appsec_agents.batch import BatchRunner, RepoOutcome, read_repo_list
+from appsec_agents.findings import FindingsStore
+from appsec_agents.logging_config import configure_logging
+from appsec_agents.tracing import Tracer
 
-
-import logging
-from logging.handlers import RotatingFileHandler
-import os
+# crewai and the tools are imported by the commands that need them, so that
+# `ingest_osv` or a usage error do not pay for loading them.
 
 warnings.filterwarnings("ignore", category=SyntaxWarning, module="pysbd")
 
-# Ensure the "logs" folder exists
-os.makedirs("logs", exist_ok=True)
-
-# Create a rotating file handler
-rotating_file_handler = RotatingFileHandler(
-    "logs/debug.log",
-    maxBytes=50 * 1024,  # 50 KB
-    backupCount=5  # Keep up to 5 backups
-)
-rotating_file_handler.setLevel(logging.DEBUG)
-rotating_file_handler.setFormatter(
-    logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-)
-
-# Create a console handler
-console_handler = logging.StreamHandler()
-console_handler.setLevel(logging.INFO)
-console_handler.setFormatter(logging.Formatter('%(message)s'))
-
-# Configure logging with both handlers using basicConfig
-logging.basicConfig(
-    level=logging.INFO,
-    # Format for the root logger
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[rotating_file_handler, console_handler]  # Attach both handlers
-)
-
 logger = logging.getLogger(__name__)
 
+
+def _setup():
+    """Start queue-based logging and load .env once, for whichever entry point runs."""
+    configure_logging()
+    try:
+        from dotenv import load_dotenv
+    except ImportError:
+        return
+    load_dotenv()
+
+
 def generate_run_id(length=6):
     timestamp = int(time.time())
     random_chars = ''.join(random.choices(string.ascii_lowercase + string.digits, k=length))
@@ -55,24 +43,223 @@ def generate_run_id(length=6):
 def run():
     """
     Run the crew to analyze a GitHub repository for security vulnerabilities.
+    The checkout is leased from the workspace manager and removed when the run succeeds;
+    a failed run keeps it for `resume`.
     """
     inputs = {
         'repo_url': 'https://github.com/ewfx/appsec_sample_code',
-        'local_path': f'/tmp/cloned_repo_{generate_run_id()}',
+        'commit': 'HEAD',
         'scan_depth': 3,
         'analysis_mode': 'quick'
     }
+    _setup()
+    _run_crew(generate_run_id(), inputs)
+
+
+def resume(argv=None):
+    """
+    Continue a failed `run` from its first incomplete task, with the inputs and commit of
+    the original run, on the checkout the failed run kept. The outputs of the tasks that
+    completed are read from the checkpoint.
+    Usage: main.py resume <run_id>
+    """
+    _setup()
+    from appsec_agents.checkpoints import CheckpointStore
+
+    args = sys.argv[1:] if argv is None else argv
+    if not args:
+        print("Usage: main.py resume <run_id>")
+        sys.exit(1)
+    run = CheckpointStore.default().run(args[0])
+    if run is None:
+        print(f"No checkpoint found for run {args[0]}")
+        sys.exit(1)
+    _run_crew(args[0], dict(run["inputs"]), head=run.get("head"))
+
+
+def discard(argv=None):
+    """
+    Remove the checkpoint of a failed `run` and the checkout it kept for `resume`.
+    Usage: main.py discard <run_id>
+    """
+    _setup()
+    from appsec_agents.checkpoints import CheckpointStore
+    from appsec_agents.workspaces import WorkspaceManager
+
+    args = sys.argv[1:] if argv is None else argv
+    if not args:
+        print("Usage: main.py discard <run_id>")
+        sys.exit(1)
+    CheckpointStore.default().discard(args[0])
+    WorkspaceManager.default().discard(f"run_{args[0]}")
+
+
+def _run_crew(run_id, inputs, head=None):
+    """Run the crew with checkpoints under `run_id`; `head` is the commit a resumed run scanned."""
+    from appsec_agents.checkpoints import CheckpointStore
+    from appsec_agents.crew import AppsecAgents
+    from appsec_agents.pull_requests import git_output
+    from appsec_agents.workspaces import WorkspaceManager
+
+    workspaces = WorkspaceManager.default()
+    checkpoints = CheckpointStore.default()
     try:
-        logger.info("Starting the crew...")
-        appsec = AppsecAgents()
-        crew = appsec.crew()
-        crew_output = crew.kickoff(inputs=inputs)
-        logger.info("Crew execution completed.")
-        logger.info("Crew results:")
-        logger.info(crew_output.raw)
+        # The run id names the workspace too; a failed run keeps it, so `resume` continues on the
+        # same checkout without cloning again
+        with workspaces.workspace(inputs['repo_url'], f"run_{run_id}", ref=head, keep_on_error=True) as workspace:
+            inputs['local_path'] = workspace.path
+            if head is None:
+                checkpoints.begin(run_id, inputs, head=git_output(workspace.path, "rev-parse", "HEAD").strip())
+            logger.info(f"Starting the crew (run {run_id})...")
+            appsec = AppsecAgents()
+            result = appsec.kickoff_dag(inputs=inputs, run_id=run_id)
+            logger.info("Crew execution completed.")
+            logger.info("Crew results:")
+            logger.info(result.final_output.raw)
+        checkpoints.discard(run_id)
 
     except Exception as e:
         print(f"An error occurred while running the crew: {e}")
+        if checkpoints.run(run_id) is not None:
+            print(f"Continue from the first incomplete task with: main.py resume {run_id}")
+            print(f"or remove the checkpoint and the checkout with: main.py discard {run_id}")
+        else:
+            workspaces.discard(f"run_{run_id}")
+    finally:
+        logger.info(f"Workspaces: {workspaces.report()}")
+        Tracer.default().export()
+
+
+def scan_repository(repo_url, local_path, commit=None, crew=None):
+    """
+    Run the crew for one repository of a batch and return its per-task timings.
+    A long-running service passes its own warm `crew` instance.
+    """
+    inputs = {
+        'repo_url': repo_url,
+        'local_path': local_path,
+        'commit': commit or 'HEAD',
+        'scan_depth': 3,
+        'analysis_mode': 'quick'
+    }
+    if crew is None:
+        from appsec_agents.crew import AppsecAgents
+        crew = AppsecAgents()
+
+    try:
+        result = crew.kickoff_dag(inputs=inputs)
+    finally:
+        # The findings are in the crew output; a long batch must not keep them in memory
+        FindingsStore.default().discard(local_path)
+    return RepoOutcome(
+        stages={timing.name: timing.duration for timing in result.timings},
+        output=result.final_output.raw if result.final_output is not None else "",
+    )
+
+
+def batch(argv=None):
+    """
+    Scan many repositories in one process.
+    Usage: main.py batch [REPO_LIST|-] [--output results.jsonl] [--workers N] [--retries N]
+    """
+    _setup()
+    if argv is None:
+        argv = sys.argv[1:]
+    parser = argparse.ArgumentParser(prog="main.py batch", description="Scan a list of repositories.")
+    parser.add_argument("repos", nargs="?", default="-",
+                        help="File with one repository URL per line, or - for stdin")
+    parser.add_argument("--output", default=os.getenv("BATCH_OUTPUT") or "-",
+                        help="JSONL file the results are appended to, or - for stdout")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("BATCH_WORKERS") or 4))
+    parser.add_argument("--retries", type=int, default=int(os.getenv("BATCH_RETRIES") or 2))
+    parser.add_argument("--workspace", default=os.getenv("BATCH_WORKSPACE_DIR") or f"/tmp/appsec_batch_{generate_run_id()}",
+                        help="Directory the per-repository checkouts are created in with --keep-workspaces")
+    parser.add_argument("--keep-workspaces", action="store_true",
+                        help="Clone into --workspace and do not delete the checkouts after each repository "
+                             "(by default they are leased from the workspace manager)")
+    args = parser.parse_args(argv)
+
+    if args.repos == "-":
+        repos = read_repo_list(sys.stdin)
+    else:
+        with open(args.repos, "r", encoding="utf-8") as f:
+            repos = read_repo_list(f)
+
+    workspaces = None
+    if not args.keep_workspaces:
+        from appsec_agents.workspaces import WorkspaceManager
+        workspaces = WorkspaceManager.default()
+    runner = BatchRunner(scan_repository, args.workspace, workers=args.workers,
+                         retries=args.retries, keep_workspaces=args.keep_workspaces, workspaces=workspaces)
+    if args.output == "-":
+        summary = runner.run(repos, output=sys.stdout)
+    else:
+        with open(args.output, "a", encoding="utf-8") as output:
+            summary = runner.run(repos, output=output)
+    Tracer.default().export()
+    if summary.succeeded < len(summary.results):
+        sys.exit(1)
+
+
+def serve(argv=None):
+    """
+    Run as a long-lived scan service: jobs are submitted over HTTP (or a Unix socket),
+    queued by priority, and duplicate requests for the same repository and commit share
+    one execution. Each worker keeps its crew loaded between jobs.
+    Usage: main.py serve [--host H] [--port P | --socket PATH] [--workers N]
+    """
+    _setup()
+    from appsec_agents.service import ScanService, WarmCrewRunner, make_server
+
+    if argv is None:
+        argv = sys.argv[1:]
+    parser = argparse.ArgumentParser(prog="main.py serve", description="Serve scan jobs over HTTP.")
+    parser.add_argument("--host", default=os.getenv("SERVICE_HOST") or "127.0.0.1")
+    parser.add_argument("--port", type=int, default=int(os.getenv("SERVICE_PORT") or 8787))
+    parser.add_argument("--socket", default=os.getenv("SERVICE_SOCKET") or None,
+                        help="Listen on this Unix socket instead of a TCP port")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("SERVICE_WORKERS") or 2))
+    parser.add_argument("--workspace", default=os.getenv("SERVICE_WORKSPACE_DIR") or "/tmp/appsec_service",
+                        help="Directory the per-job checkouts are created in with --keep-workspaces")
+    parser.add_argument("--keep-workspaces", action="store_true",
+                        help="Clone into --workspace and keep the checkouts instead of leasing them "
+                             "from the workspace manager")
+    args = parser.parse_args(argv)
+
+    workspaces = None
+    if not args.keep_workspaces:
+        from appsec_agents.workspaces import WorkspaceManager
+        workspaces = WorkspaceManager.default()
+    service = ScanService(WarmCrewRunner(scan_repository), args.workspace, workers=args.workers,
+                          keep_workspaces=args.keep_workspaces, workspaces=workspaces).start()
+    server = make_server(service, args.host, args.port, args.socket)
+    logger.info(f"Scan service listening on {args.socket or f'http://{args.host}:{args.port}'} "
+                f"with {args.workers} workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Shutting down, waiting for the running jobs")
+    finally:
+        server.server_close()
+        service.stop()
+        Tracer.default().export()
+
+
+def ingest_osv(argv=None):
+    """
+    Load OSV advisory dumps (JSON files, export zips or directories of them) into the
+    offline index used by DEPENDENCY_BACKEND=osv. Unchanged files are skipped.
+    """
+    _setup()
+    from appsec_agents.osv import OsvIndex
+
+    paths = sys.argv[1:] if argv is None else argv
+    if not paths:
+        print("Usage: main.py ingest_osv <dump file or directory> [...]")
+        sys.exit(1)
+    index = OsvIndex.default()
+    written = index.ingest(paths)
+    logger.info(f"{written} advisories added or updated, {len(index)} in {index.path}")
 
 
 def train():
@@ -82,9 +269,16 @@ def train():
     inputs = {
         'repo_url': 'https://github.com/ewfx/appsec_sample_code',
         'local_path': '/tmp/cloned_repo',
+        'commit': 'HEAD',
         'scan_depth': 3,
         'analysis_mode': 'quick',
     }
+    if len(sys.argv) < 3:
+        print("Usage: train <n_iterations> <filename>")
+        return
+    _setup()
+    from appsec_agents.crew import AppsecAgents
+
     try:
         AppsecAgents().crew().train(n_iterations=int(
             sys.argv[1]), filename=sys.argv[2], inputs=inputs)
@@ -96,6 +290,12 @@ def replay():
     """
     Replay the crew execution from a specific task.
     """
+    if len(sys.argv) < 2:
+        print("Usage: replay <task_id>")
+        return
+    _setup()
+    from appsec_agents.crew import AppsecAgents
+
     try:
         AppsecAgents().crew().replay(task_id=sys.argv[1])
     except Exception as e:
@@ -109,6 +309,9 @@ def test():
     inputs = {
         'repository_url': 'https://github.com/example/example-repo',
     }
+    _setup()
+    from appsec_agents.crew import AppsecAgents
+
     try:
         AppsecAgents().crew().test(n_iterations=int(
             sys.argv[1]), openai_model_name=sys.argv[2], inputs=inputs)
@@ -118,13 +321,23 @@ def test():
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
-        print("Usage: main.py [run|train|replay|test] [optional arguments...]")
+        print("Usage: main.py [run|resume|discard|batch|serve|ingest_osv|train|replay|test] [optional arguments...]")
         sys.exit(1)
 
     command = sys.argv[1].lower()
 
     if command == "run":
         run()
+    elif command == "resume":
+        resume(sys.argv[2:])
+    elif command == "discard":
+        discard(sys.argv[2:])
+    elif command == "batch":
+        batch(sys.argv[2:])
+    elif command == "serve":
+        serve(sys.argv[2:])
+    elif command == "ingest_osv":
+        ingest_osv(sys.argv[2:])
     elif command == "train":
         train()
     elif command == "replay":
@@ -133,5 +346,5 @@ if __name__ == "__main__":
         test()
     else:
         print(f"Unknown command: {command}")
-        print("Usage: main.py [run|train|replay|test] [optional arguments...]")
+        print("Usage: main.py [run|resume|discard|batch|serve|ingest_osv|train|replay|test] [optional arguments...]")
         sys.exit(1)
@@ -0,0 +1,297 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import zipfile
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_PATH = os.path.join(os.path.expanduser("~"), ".cache", "appsec_agents", "osv", "index.sqlite")
+LOOKUP_CHUNK = 500  # packages per SQL query, below SQLite's variable limit
+MMAP_SIZE = 256 * 1024 * 1024
+
+# Manifest ecosystems to OSV ecosystem names
+OSV_ECOSYSTEMS = {
+    "npm": "npm", "maven": "Maven", "gradle": "Maven", "pypi": "PyPI", "go": "Go",
+    "rubygems": "RubyGems", "packagist": "Packagist", "crates.io": "crates.io", "nuget": "NuGet",
+}
+OSV_SEVERITIES = {"CRITICAL": "critical", "HIGH": "high", "MODERATE": "medium", "MEDIUM": "medium", "LOW": "low"}
+
+# Version qualifiers ordered as Maven and PEP 440 do: dev < alpha < beta < milestone < rc < snapshot < release
+_PRE_RELEASE = {
+    "dev": 0, "alpha": 1, "a": 1, "beta": 2, "b": 2, "milestone": 3, "m": 3,
+    "rc": 4, "c": 4, "cr": 4, "pre": 4, "preview": 4, "snapshot": 5,
+}
+_POST_RELEASE = {"post", "sp", "patch", "p", "r", "rev"}
+_RELEASE = [1, 9, ""]  # sorts after every pre-release qualifier and before any number
+_POST = [1, 10, ""]  # after the release, before the next numeric component
+_TOKEN = re.compile(r"\d+|[a-z]+")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS advisories (
+    id TEXT PRIMARY KEY,
+    modified TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    severity TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS affected (
+    ecosystem TEXT NOT NULL,
+    package TEXT NOT NULL,
+    advisory_id TEXT NOT NULL,
+    ranges TEXT NOT NULL,
+    versions TEXT NOT NULL,
+    fixed TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS affected_package ON affected (ecosystem, package);
+CREATE INDEX IF NOT EXISTS affected_advisory ON affected (advisory_id);
+CREATE TABLE IF NOT EXISTS sources (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def version_key(version: str) -> List[List[Any]]:
+    """
+    Sort key for a package version that works across ecosystems: numeric components compare
+    as numbers, trailing zeros are ignored (1.0 == 1.0.0) and pre-release qualifiers sort
+    before the release. Qualifiers it does not know (e.g. `-jre`) are ignored.
+    """
+    version = version.strip().lower()
+    version = version.split("+", 1)[0]  # build metadata never affects ordering
+    if version.startswith("v"):
+        version = version[1:]
+    tokens = _TOKEN.findall(version)
+    release = []
+    while tokens and tokens[0].isdigit():
+        release.append(int(tokens.pop(0)))
+    while release and release[-1] == 0:
+        release.pop()
+    key = [[2, n, ""] for n in release]
+    for token in tokens:
+        if token.isdigit():
+            key.append([2, int(token), ""])
+        elif token in _PRE_RELEASE:
+            key.append([1, _PRE_RELEASE[token], ""])
+        elif token in _POST_RELEASE:
+            key.append(_POST)
+    key.append(_RELEASE)
+    return key
+
+
+def normalize_package(ecosystem: str, name: str) -> str:
+    if ecosystem == "PyPI":
+        return re.sub(r"[-_.]+", "-", name).lower()
+    if ecosystem in ("NuGet", "Packagist"):
+        return name.lower()
+    return name
+
+
+def compile_ranges(affected: Dict[str, Any]) -> List[List[Any]]:
+    """
+    OSV `ranges` of one affected package as [lower key, upper key, upper inclusive] intervals,
+    so lookups only compare keys. GIT ranges are skipped: commits cannot be matched to versions.
+    """
+    intervals = []
+    for version_range in affected.get("ranges", []):
+        if version_range.get("type") == "GIT":
+            continue
+        lower = None
+        open_interval = False
+        for event in version_range.get("events", []):
+            if "introduced" in event:
+                lower = None if event["introduced"] == "0" else version_key(event["introduced"])
+                open_interval = True
+            elif "fixed" in event or "limit" in event:
+                intervals.append([lower, version_key(event.get("fixed") or event["limit"]), False])
+                open_interval = False
+            elif "last_affected" in event:
+                intervals.append([lower, version_key(event["last_affected"]), True])
+                open_interval = False
+        if open_interval:
+            intervals.append([lower, None, False])
+    return intervals
+
+
+def in_ranges(key: List[List[Any]], intervals: Iterable[Sequence[Any]]) -> bool:
+    for lower, upper, inclusive in intervals:
+        if lower is not None and key < lower:
+            continue
+        if upper is None or key < upper or (inclusive and key == upper):
+            return True
+    return False
+
+
+def _severity(advisory: Dict[str, Any]) -> str:
+    for source in [advisory.get("database_specific") or {}] + [
+            a.get("ecosystem_specific") or {} for a in advisory.get("affected", [])]:
+        severity = source.get("severity")
+        if isinstance(severity, str) and severity.upper() in OSV_SEVERITIES:
+            return OSV_SEVERITIES[severity.upper()]
+    return "medium"
+
+
+def _iter_dump(path: str) -> Iterator[Dict[str, Any]]:
+    """Advisories from an OSV JSON file or an OSV export zip (e.g. `PyPI/all.zip`)."""
+    try:
+        if path.endswith(".zip"):
+            with zipfile.ZipFile(path) as archive:
+                for name in archive.namelist():
+                    if name.endswith(".json"):
+                        yield json.loads(archive.read(name))
+        else:
+            with open(path, "r", encoding="utf-8") as f:
+                document = json.load(f)
+            yield from document if isinstance(document, list) else [document]
+    except (OSError, ValueError, zipfile.BadZipFile) as e:
+        logger.warning(f"Skipping unreadable OSV dump {path}: {e}")
+
+
+@dataclass
+class Advisory:
+    """One advisory matching a package version."""
+    id: str
+    severity: str
+    summary: str
+    fixed: List[str] = field(default_factory=list)
+
+
+class OsvIndex:
+    """
+    SQLite index of OSV advisories keyed by (ecosystem, package). Version ranges are stored
+    precompiled, so resolving a lockfile is a handful of indexed queries plus key comparisons.
+    The database is opened with mmap enabled; each thread gets its own read connection.
+    """
+
+    _default: Optional["OsvIndex"] = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+
+    @classmethod
+    def default(cls) -> "OsvIndex":
+        """Process-wide index at OSV_INDEX_PATH."""
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls(os.getenv("OSV_INDEX_PATH") or DEFAULT_INDEX_PATH)
+            return cls._default
+
+    def _connect(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=60)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+            self._local.db = db
+        return db
+
+    def version(self) -> str:
+        """Changes whenever advisories are added or replaced; used in scan cache keys."""
+        row = self._connect().execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        return row[0] if row else "empty"
+
+    def __len__(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM advisories").fetchone()[0]
+
+    def _store(self, db: sqlite3.Connection, advisory: Dict[str, Any]) -> bool:
+        advisory_id = advisory.get("id")
+        modified = advisory.get("modified", "")
+        if not advisory_id:
+            return False
+        row = db.execute("SELECT modified FROM advisories WHERE id = ?", (advisory_id,)).fetchone()
+        if row and row[0] >= modified:
+            return False
+        db.execute("DELETE FROM affected WHERE advisory_id = ?", (advisory_id,))
+        db.execute("DELETE FROM advisories WHERE id = ?", (advisory_id,))
+        if advisory.get("withdrawn"):
+            return True
+        db.execute("INSERT INTO advisories VALUES (?, ?, ?, ?)", (
+            advisory_id, modified, advisory.get("summary") or advisory.get("details", "")[:200], _severity(advisory)))
+        for affected in advisory.get("affected", []):
+            package = affected.get("package", {})
+            ecosystem = package.get("ecosystem", "").split(":", 1)[0]  # e.g. "Debian:11"
+            if not ecosystem or not package.get("name"):
+                continue
+            fixed = [e["fixed"] for r in affected.get("ranges", []) for e in r.get("events", []) if "fixed" in e]
+            db.execute("INSERT INTO affected VALUES (?, ?, ?, ?, ?, ?)", (
+                ecosystem, normalize_package(ecosystem, package["name"]), advisory_id,
+                json.dumps(compile_ranges(affected)), json.dumps(affected.get("versions", [])), json.dumps(fixed),
+            ))
+        return True
+
+    def ingest(self, paths: Iterable[str]) -> int:
+        """
+        Load OSV JSON files or export zips (files or directories of them). Sources whose size
+        and mtime are unchanged since the last ingest are skipped, and an advisory is only
+        replaced by a newer `modified` revision. Returns the number of advisories written.
+        """
+        files = []
+        for path in paths:
+            if os.path.isdir(path):
+                for dirpath, _, names in os.walk(path):
+                    files.extend(os.path.join(dirpath, n) for n in sorted(names) if n.endswith((".json", ".zip")))
+            else:
+                files.append(path)
+
+        written = 0
+        with self._write_lock:
+            db = self._connect()
+            for path in files:
+                stat = os.stat(path)
+                source = os.path.abspath(path)
+                row = db.execute("SELECT size, mtime FROM sources WHERE path = ?", (source,)).fetchone()
+                if row and row[0] == stat.st_size and row[1] == stat.st_mtime:
+                    continue
+                with db:
+                    written += sum(self._store(db, advisory) for advisory in _iter_dump(path))
+                    db.execute("INSERT OR REPLACE INTO sources VALUES (?, ?, ?)", (source, stat.st_size, stat.st_mtime))
+            if written:
+                with db:
+                    count, latest = db.execute("SELECT COUNT(*), MAX(modified) FROM advisories").fetchone()
+                    version = hashlib.sha256(f"{count}:{latest}".encode("utf-8")).hexdigest()[:16]
+                    db.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (version,))
+        if written:
+            logger.info(f"OSV index {self.path}: {written} advisories added or updated")
+        return written
+
+    def lookup(self, ecosystem: str, packages: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], List[Advisory]]:
+        """Advisories affecting each (name, version) pair of one ecosystem."""
+        ecosystem = OSV_ECOSYSTEMS.get(ecosystem, ecosystem)
+        wanted: Dict[str, List[Tuple[str, str]]] = {}
+        for name, version in packages:
+            wanted.setdefault(normalize_package(ecosystem, name), []).append((name, version))
+
+        results: Dict[Tuple[str, str], List[Advisory]] = {}
+        db = self._connect()
+        names = sorted(wanted)
+        for i in range(0, len(names), LOOKUP_CHUNK):
+            chunk = names[i:i + LOOKUP_CHUNK]
+            rows = db.execute(
+                "SELECT a.package, a.ranges, a.versions, a.fixed, d.id, d.severity, d.summary "
+                "FROM affected a JOIN advisories d ON d.id = a.advisory_id "
+                f"WHERE a.ecosystem = ? AND a.package IN ({','.join('?' * len(chunk))})",
+                [ecosystem, *chunk],
+            )
+            for package, ranges, versions, fixed, advisory_id, severity, summary in rows:
+                ranges, versions = json.loads(ranges), json.loads(versions)
+                for name, version in wanted[package]:
+                    if version in versions or in_ranges(version_key(version), ranges):
+                        results.setdefault((name, version), []).append(
+                            Advisory(advisory_id, severity, summary, json.loads(fixed)))
+        return results
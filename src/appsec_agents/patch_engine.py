@@ -0,0 +1,320 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import BinaryIO, Dict, List, Optional, Sequence, Set, Tuple, Union
+
+from appsec_agents.fileio import atomic_write
+
+DEFAULT_BACKUP_DIR = os.path.join(os.path.expanduser("~"), ".cache", "appsec_agents", "backups")
+CHUNK_SIZE = 1024 * 1024
+_HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+
+class PatchError(Exception):
+    """Raised when edits do not apply to the current file content; the file is left untouched."""
+
+
+@dataclass
+class LineEdit:
+    """
+    Replace lines `start`..`end` (1-based, inclusive) with `text`; an empty `text` deletes them
+    and `end = start - 1` inserts before `start`.
+    """
+    start: int
+    end: int
+    text: str
+
+
+@dataclass
+class ByteEdit:
+    """Replace `length` bytes at `offset` with `data`."""
+    offset: int
+    length: int
+    data: Union[bytes, str]
+
+
+@dataclass
+class Hunk:
+    """One unified-diff hunk: the old lines it expects and the new lines it writes."""
+    old_start: int
+    old_lines: List[str] = field(default_factory=list)
+    new_lines: List[str] = field(default_factory=list)
+
+
+Edit = Union[LineEdit, ByteEdit, Hunk]
+
+
+@dataclass
+class PatchResult:
+    path: str
+    old_sha256: str
+    new_sha256: str
+    edits: int
+    backup: Optional[str] = None  # content hash of the original in the backup store
+
+
+def parse_unified_diff(diff: str) -> List[Hunk]:
+    """Hunks of a single-file unified diff; file headers are ignored."""
+    hunks: List[Hunk] = []
+    for line in diff.splitlines():
+        header = _HUNK_HEADER.match(line)
+        if header:
+            hunks.append(Hunk(int(header.group(1))))
+        elif not hunks:
+            continue  # file headers
+        elif line.startswith("\\"):
+            continue  # "\ No newline at end of file"
+        elif line.startswith("-"):
+            hunks[-1].old_lines.append(line[1:])
+        elif line.startswith("+"):
+            hunks[-1].new_lines.append(line[1:])
+        else:
+            context = line[1:] if line.startswith(" ") else line
+            hunks[-1].old_lines.append(context)
+            hunks[-1].new_lines.append(context)
+    if not hunks and diff.strip():
+        raise PatchError("The diff does not contain any hunks.")
+    return hunks
+
+
+def sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class BackupStore:
+    """
+    Content-addressed store of file versions: each distinct content is kept once under
+    `objects/<sha[:2]>/<sha>`, however many files or edits refer to it. `index.jsonl`
+    records which path had which content and when.
+    """
+
+    _default: Optional["BackupStore"] = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, root: str):
+        self.root = root
+        self._lock = threading.Lock()
+
+    @classmethod
+    def default(cls) -> "BackupStore":
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls(os.getenv("BACKUP_DIR") or DEFAULT_BACKUP_DIR)
+            return cls._default
+
+    def object_path(self, sha256: str) -> str:
+        return os.path.join(self.root, "objects", sha256[:2], sha256)
+
+    def staging_file(self) -> Tuple[BinaryIO, str]:
+        """Temporary file inside the store that `commit` turns into an object."""
+        os.makedirs(os.path.join(self.root, "tmp"), exist_ok=True)
+        fd, path = tempfile.mkstemp(dir=os.path.join(self.root, "tmp"))
+        return os.fdopen(fd, "wb"), path
+
+    def commit(self, staged_path: str, sha256: str, source: str) -> str:
+        target = self.object_path(sha256)
+        with self._lock:
+            if os.path.exists(target):
+                os.remove(staged_path)
+            else:
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.replace(staged_path, target)
+            with open(os.path.join(self.root, "index.jsonl"), "a", encoding="utf-8") as index:
+                index.write(json.dumps({"path": os.path.abspath(source), "sha256": sha256, "time": time.time()}) + "\n")
+        return sha256
+
+    def put(self, content: bytes, source: str) -> str:
+        """Store in-memory content of `source`; returns its hash."""
+        staged, staged_path = self.staging_file()
+        with staged:
+            staged.write(content)
+        return self.commit(staged_path, hashlib.sha256(content).hexdigest(), source)
+
+    def restore(self, path: str, sha256: str) -> None:
+        """Put the stored content `sha256` back at `path`."""
+        source = self.object_path(sha256)
+        if not os.path.exists(source):
+            raise PatchError(f"No backup with hash {sha256}.")
+        with open(source, "rb") as src:
+            atomic_write(path, src)
+
+
+def _encode(text: str, newline: bytes) -> bytes:
+    return text.replace("\r\n", "\n").replace("\n", newline.decode("ascii")).encode("utf-8")
+
+
+class _Scan:
+    """First streaming pass: content hash, newline style, offsets of the lines edits refer to."""
+
+    def __init__(self, path: str, wanted_offsets: Set[int], wanted_lines: Set[int], backup: Optional[BinaryIO]):
+        self.offsets: Dict[int, int] = {}
+        self.lines: Dict[int, str] = {}
+        self.newline = b"\n"
+        digest = hashlib.sha256()
+        offset = 0
+        line_no = 0
+        line = b""
+        with open(path, "rb") as f:
+            for line_no, line in enumerate(f, start=1):
+                digest.update(line)
+                if backup is not None:
+                    backup.write(line)
+                if line_no == 1 and line.endswith(b"\r\n"):
+                    self.newline = b"\r\n"
+                if line_no in wanted_offsets:
+                    self.offsets[line_no] = offset
+                if line_no in wanted_lines:
+                    self.lines[line_no] = line.decode("utf-8", errors="replace").rstrip("\r\n")
+                offset += len(line)
+        self.size = offset
+        self.line_count = line_no
+        self.ends_with_newline = not line or line.endswith(b"\n")
+        self.sha256 = digest.hexdigest()
+        # A line number one past the end addresses the end of the file
+        self.offsets.setdefault(self.line_count + 1, self.size)
+
+
+def _line_range(edit: LineEdit, line_count: int) -> Tuple[int, int]:
+    if edit.start < 1 or edit.end < edit.start - 1 or edit.end > line_count or edit.start > line_count + 1:
+        raise PatchError(f"Lines {edit.start}-{edit.end} are outside the file ({line_count} lines).")
+    return edit.start, edit.end + 1
+
+
+def apply_patch(path: str, edits: Sequence[Edit], expected_sha256: Optional[str] = None,
+                backup: Optional[BackupStore] = None) -> PatchResult:
+    """
+    Apply a batch of edits to `path` in one pass. Line numbers and offsets refer to the
+    file as it is before any of the edits. The file is streamed twice (once to hash and
+    index it, once to write the result to a temp file that replaces it), so it is never
+    loaded whole. Nothing is written if the content hash differs from `expected_sha256`,
+    a diff hunk does not match, or edits overlap.
+    """
+    line_edits = [e for e in edits if isinstance(e, LineEdit)]
+    for hunk in (e for e in edits if isinstance(e, Hunk)):
+        # A hunk with no old lines inserts after old_start
+        start = hunk.old_start + 1 if not hunk.old_lines else hunk.old_start
+        line_edits.append(LineEdit(start, start + len(hunk.old_lines) - 1, "\n".join(hunk.new_lines)))
+    byte_edits = [e for e in edits if isinstance(e, ByteEdit)]
+
+    wanted_offsets = {n for e in line_edits for n in (e.start, e.end + 1)}
+    wanted_lines = {n for h in edits if isinstance(h, Hunk) for n in range(
+        h.old_start, h.old_start + len(h.old_lines))}
+
+    staged = staged_path = None
+    if backup is not None:
+        staged, staged_path = backup.staging_file()
+    try:
+        before = os.stat(path)
+        scan = _Scan(path, wanted_offsets, wanted_lines, staged)
+    finally:
+        if staged is not None:
+            staged.close()
+    try:
+        if expected_sha256 and expected_sha256 != scan.sha256:
+            raise PatchError(f"{path} changed: expected content hash {expected_sha256}, found {scan.sha256}.")
+        for hunk in (e for e in edits if isinstance(e, Hunk)):
+            actual = [scan.lines.get(n) for n in range(hunk.old_start, hunk.old_start + len(hunk.old_lines))]
+            if actual != hunk.old_lines:
+                raise PatchError(f"Hunk at line {hunk.old_start} does not match the file content.")
+
+        replacements: List[Tuple[int, int, bytes]] = []
+        for edit in line_edits:
+            start, end = _line_range(edit, scan.line_count)
+            data = _encode(edit.text, scan.newline)
+            if data and not data.endswith(scan.newline) and (end <= scan.line_count or scan.ends_with_newline):
+                data += scan.newline
+            replacements.append((scan.offsets[start], scan.offsets[end], data))
+        for edit in byte_edits:
+            if edit.offset < 0 or edit.length < 0 or edit.offset + edit.length > scan.size:
+                raise PatchError(f"Byte range {edit.offset}+{edit.length} is outside the file ({scan.size} bytes).")
+            data = edit.data.encode("utf-8") if isinstance(edit.data, str) else edit.data
+            replacements.append((edit.offset, edit.offset + edit.length, data))
+        replacements.sort(key=lambda r: (r[0], r[1]))
+        for previous, current in zip(replacements, replacements[1:]):
+            if current[0] < previous[1]:
+                raise PatchError(f"Edits overlap at byte {current[0]}.")
+
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+        digest = hashlib.sha256()
+        try:
+            with open(path, "rb") as src, os.fdopen(fd, "wb") as dst:
+                def write(data: bytes) -> None:
+                    digest.update(data)
+                    dst.write(data)
+
+                position = 0
+                for start, end, data in replacements:
+                    remaining = start - position
+                    while remaining > 0:
+                        chunk = src.read(min(CHUNK_SIZE, remaining))
+                        if not chunk:
+                            break
+                        write(chunk)
+                        remaining -= len(chunk)
+                    write(data)
+                    src.seek(end)
+                    position = end
+                for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+                    write(chunk)
+                dst.flush()
+                os.fsync(dst.fileno())
+            after = os.stat(path)
+            if (after.st_size, after.st_mtime_ns) != (before.st_size, before.st_mtime_ns):
+                raise PatchError(f"{path} was modified while the patch was being applied.")
+            os.chmod(tmp_path, before.st_mode & 0o7777)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        backup_sha = backup.commit(staged_path, scan.sha256, path) if backup is not None else None
+        staged_path = None
+        return PatchResult(path, scan.sha256, digest.hexdigest(), len(edits), backup_sha)
+    finally:
+        if staged_path and os.path.exists(staged_path):
+            os.remove(staged_path)
+
+
+def find_occurrences(path: str, needle: str) -> List[ByteEdit]:
+    """Every non-overlapping occurrence of `needle` as a zero-data ByteEdit, found in a streaming pass."""
+    pattern = needle.encode("utf-8")
+    if not pattern:
+        return []
+    matches: List[ByteEdit] = []
+    with open(path, "rb") as f:
+        buffer = b""
+        base = 0  # file offset of buffer[0]
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            buffer += chunk
+            start = 0
+            while True:
+                index = buffer.find(pattern, start)
+                if index == -1:
+                    break
+                matches.append(ByteEdit(base + index, len(pattern), b""))
+                start = index + len(pattern)
+            # Bytes before `keep` can no longer be part of a match
+            keep = max(start, len(buffer) - len(pattern) + 1)
+            buffer = buffer[keep:]
+            base += keep
+    return matches
+
+
+def replace_all(path: str, old: str, new: str, expected_sha256: Optional[str] = None,
+                backup: Optional[BackupStore] = None) -> Optional[PatchResult]:
+    """Replace every occurrence of `old` with `new`; None when there is nothing to replace."""
+    edits = [ByteEdit(m.offset, m.length, new) for m in find_occurrences(path, old)]
+    if not edits:
+        return None
+    return apply_patch(path, edits, expected_sha256=expected_sha256, backup=backup)
@@ -0,0 +1,269 @@
+import mmap
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+IGNORE_FILES = (".gitignore", ".ignore")
+ALWAYS_IGNORED = {".git", ".hg", ".svn"}
+DEFAULT_MAX_FILE_SIZE = 2 * 1024 * 1024  # 2 MB
+BINARY_SNIFF_BYTES = 8192
+# Trees with at least this many files are spread over processes instead of threads
+PROCESS_POOL_THRESHOLD = 2000
+FILES_PER_BATCH = 64
+_NEWLINE = re.compile(b"\n")
+_BACKREFERENCE = re.compile(r"\\[1-9]|\(\?P=")
+
+
+@dataclass(frozen=True)
+class PatternMatch:
+    """One pattern hit: repository-relative file, 1-based line/column and pattern index."""
+    file: str
+    line: int
+    column: int
+    pattern_id: int
+    text: str
+
+    def format(self) -> str:
+        return f"{self.file}:{self.line}:{self.column}: [{self.pattern_id}] {self.text}"
+
+
+def _glob_to_regex(glob: str) -> str:
+    out = []
+    i = 0
+    while i < len(glob):
+        c = glob[i]
+        if glob.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+            continue
+        if glob.startswith("**", i):
+            out.append(".*")
+            i += 2
+            continue
+        if c == "*":
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            end = glob.find("]", i + 1)
+            if end == -1:
+                out.append(re.escape(c))
+            else:
+                body = glob[i + 1:end]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                out.append(f"[{body}]")
+                i = end
+        elif c == "\\" and i + 1 < len(glob):
+            i += 1
+            out.append(re.escape(glob[i]))
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return "".join(out)
+
+
+class IgnoreRules:
+    """
+    Subset of .gitignore semantics: comments, `!` negation, trailing `/` for directories,
+    patterns anchored by a slash, `*`, `?`, `[...]` and `**`. The last matching rule wins.
+    """
+
+    def __init__(self, rules: Optional[List[Tuple[str, "re.Pattern", bool, bool]]] = None):
+        self.rules = rules or []
+
+    def extended(self, base: str, lines: Iterable[str]) -> "IgnoreRules":
+        """New rule set with the patterns of an ignore file located in directory `base`."""
+        rules = list(self.rules)
+        for line in lines:
+            line = line.rstrip("\n").rstrip()
+            if not line or line.startswith("#"):
+                continue
+            negate = line.startswith("!")
+            if negate:
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            if not line:
+                continue
+            anchored = "/" in line
+            body = _glob_to_regex(line.lstrip("/"))
+            regex = re.compile(f"^{body}$" if anchored else f"^(?:.*/)?{body}$")
+            rules.append((base, regex, negate, dir_only))
+        return IgnoreRules(rules)
+
+    def ignored(self, rel_path: str, is_dir: bool) -> bool:
+        result = False
+        for base, regex, negate, dir_only in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if base:
+                if not rel_path.startswith(base + "/"):
+                    continue
+                candidate = rel_path[len(base) + 1:]
+            else:
+                candidate = rel_path
+            if regex.match(candidate):
+                result = not negate
+        return result
+
+
+def _read_ignore_file(path: str) -> List[str]:
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            return f.readlines()
+    except OSError:
+        return []
+
+
+def iter_files(root: str, max_file_size: int = DEFAULT_MAX_FILE_SIZE) -> Iterator[str]:
+    """
+    Walk `root` once and yield relative paths of regular files that are not ignored by
+    .gitignore/.ignore files, not inside VCS metadata and not larger than `max_file_size`.
+    """
+    stack: List[Tuple[str, IgnoreRules]] = [("", IgnoreRules())]
+    while stack:
+        rel_dir, rules = stack.pop()
+        abs_dir = os.path.join(root, rel_dir)
+        for name in IGNORE_FILES:
+            path = os.path.join(abs_dir, name)
+            if os.path.isfile(path):
+                rules = rules.extended(rel_dir, _read_ignore_file(path))
+        try:
+            entries = sorted(os.scandir(abs_dir), key=lambda e: e.name)
+        except OSError:
+            continue
+        subdirs = []
+        for entry in entries:
+            rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in ALWAYS_IGNORED and not rules.ignored(rel, True):
+                        subdirs.append(rel)
+                elif entry.is_file(follow_symlinks=False):
+                    if entry.stat().st_size <= max_file_size and not rules.ignored(rel, False):
+                        yield rel
+            except OSError:
+                continue
+        stack.extend((d, rules) for d in reversed(subdirs))
+
+
+def is_binary(data: bytes) -> bool:
+    return b"\0" in data[:BINARY_SNIFF_BYTES]
+
+
+class PatternEngine:
+    """
+    Scans a tree for a batch of regular expressions in a single pass.
+
+    All patterns are compiled into one alternation of named groups, so each file is read
+    once (via mmap) and searched once no matter how many patterns there are. Only the lines
+    hit by the combined matcher are re-checked against the individual patterns to report
+    every (line, column, pattern) pair. Like grep, matches are line based.
+    """
+
+    def __init__(self, patterns: Sequence[str], ignore_case: bool = False,
+                 max_file_size: int = DEFAULT_MAX_FILE_SIZE):
+        if not patterns:
+            raise ValueError("At least one pattern is required.")
+        self.patterns = list(patterns)
+        self.ignore_case = ignore_case
+        self.max_file_size = max_file_size
+        flags = re.MULTILINE | (re.IGNORECASE if ignore_case else 0)
+        self._compiled = [re.compile(p.encode("utf-8"), flags) for p in self.patterns]
+        # Numbered backreferences would point at the wrong group inside the alternation,
+        # so those patterns keep a pass of their own
+        simple = [i for i, p in enumerate(self.patterns) if not _BACKREFERENCE.search(p)]
+        self._matchers = [self._compiled[i] for i in range(len(self.patterns)) if i not in simple]
+        if simple:
+            alternation = b"|".join(b"(?P<p%d>%s)" % (i, self.patterns[i].encode("utf-8")) for i in simple)
+            try:
+                self._matchers.insert(0, re.compile(alternation, flags))
+            except re.error:
+                # e.g. the same group name used in two patterns
+                self._matchers[:0] = [self._compiled[i] for i in simple]
+
+    def __getstate__(self):
+        # Compiled patterns are rebuilt in worker processes
+        return {"patterns": self.patterns, "ignore_case": self.ignore_case, "max_file_size": self.max_file_size}
+
+    def __setstate__(self, state):
+        self.__init__(state["patterns"], state["ignore_case"], state["max_file_size"])
+
+    def _candidate_lines(self, data) -> Iterator[Tuple[int, int]]:
+        """Yield (start, end) offsets of lines containing at least one combined match."""
+        seen = set()
+        for matcher in self._matchers:
+            pos = 0
+            while True:
+                m = matcher.search(data, pos)
+                if m is None:
+                    break
+                start = data.rfind(b"\n", 0, m.start()) + 1
+                end = data.find(b"\n", m.start())
+                end = len(data) if end == -1 else end
+                if start not in seen:
+                    seen.add(start)
+                    yield start, end
+                pos = end + 1
+                if pos > len(data):
+                    break
+
+    def scan_file(self, root: str, rel_path: str) -> List[PatternMatch]:
+        path = os.path.join(root, rel_path)
+        try:
+            with open(path, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                if size == 0 or size > self.max_file_size:
+                    return []
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    if is_binary(data[:BINARY_SNIFF_BYTES]):
+                        return []
+                    return self._scan_data(rel_path, data)
+        except (OSError, ValueError):
+            return []
+
+    def _scan_data(self, rel_path: str, data) -> List[PatternMatch]:
+        matches = []
+        line_no = 1
+        counted_to = 0
+        for start, end in sorted(self._candidate_lines(data)):
+            line_no += len(_NEWLINE.findall(data, counted_to, start))
+            counted_to = start
+            line = data[start:end]
+            text = line.decode("utf-8", errors="replace").rstrip("\r")
+            for pattern_id, regex in enumerate(self._compiled):
+                for m in regex.finditer(line):
+                    column = len(line[:m.start()].decode("utf-8", errors="replace")) + 1
+                    matches.append(PatternMatch(rel_path, line_no, column, pattern_id, text.strip()[:300]))
+        return matches
+
+    def _scan_batch(self, root: str, rel_paths: Sequence[str]) -> List[PatternMatch]:
+        matches = []
+        for rel_path in rel_paths:
+            matches.extend(self.scan_file(root, rel_path))
+        return matches
+
+    def scan(self, root: str, paths: Optional[Iterable[str]] = None,
+             workers: Optional[int] = None) -> List[PatternMatch]:
+        """
+        Scan `root` (or only `paths`, relative or absolute, inside it) and return the
+        matches sorted by file, line, column and pattern. Large trees are processed on a
+        process pool, smaller ones on a thread pool.
+        """
+        root = os.path.abspath(root)
+        if paths is None:
+            files = list(iter_files(root, self.max_file_size))
+        else:
+            files = [os.path.relpath(os.path.join(root, p), root).replace(os.sep, "/") for p in paths]
+        batches = [files[i:i + FILES_PER_BATCH] for i in range(0, len(files), FILES_PER_BATCH)]
+        workers = workers or os.cpu_count() or 1
+        if len(batches) <= 1 or workers == 1:
+            matches = self._scan_batch(root, files)
+        else:
+            pool_class = ProcessPoolExecutor if len(files) >= PROCESS_POOL_THRESHOLD else ThreadPoolExecutor
+            with pool_class(max_workers=workers) as pool:
+                matches = [m for batch in pool.map(self._scan_batch, [root] * len(batches), batches) for m in batch]
+        return sorted(matches, key=lambda m: (m.file, m.line, m.column, m.pattern_id))
@@ -0,0 +1,230 @@
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from appsec_agents.runner import CommandResult, run_command, timeout_for
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PUSH_CONCURRENCY = 2
+
+
+def git(repository_path: str, *args: str) -> CommandResult:
+    """Run git against `repository_path` with `git -C`, so the process cwd is never changed."""
+    return run_command(["git", "-C", repository_path, *args], check=True, timeout=timeout_for("git", 600))
+
+
+def git_output(repository_path: str, *args: str) -> str:
+    """Stdout of `git(repository_path, *args)`; the result's spill file is removed."""
+    result = git(repository_path, *args)
+    try:
+        return result.stdout
+    finally:
+        result.cleanup()
+
+
+@dataclass
+class PendingChanges:
+    """Files changed by remediations in one repository and what each remediation did."""
+    paths: List[str] = field(default_factory=list)  # repository-relative
+    summaries: List[str] = field(default_factory=list)
+
+
+class ChangeTracker:
+    """
+    Records the files written by remediation tools so the pull request commits exactly
+    those paths (instead of `git add .`) and describes all of them in one commit.
+    Changes are keyed by repository root, found by walking up to the `.git` entry.
+    """
+
+    _default: Optional["ChangeTracker"] = None
+    _default_lock = threading.Lock()
+
+    def __init__(self):
+        self._pending: Dict[str, PendingChanges] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def default(cls) -> "ChangeTracker":
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls()
+            return cls._default
+
+    @staticmethod
+    def repository_root(path: str) -> Optional[str]:
+        directory = os.path.dirname(os.path.realpath(path))
+        while True:
+            if os.path.exists(os.path.join(directory, ".git")):
+                return directory
+            parent = os.path.dirname(directory)
+            if parent == directory:
+                return None
+            directory = parent
+
+    def record(self, paths: Iterable[str], summary: str) -> None:
+        """Remember `paths` (absolute or cwd-relative) as changed by the remediation `summary`."""
+        with self._lock:
+            for path in paths:
+                root = self.repository_root(path)
+                if root is None:
+                    logger.warning(f"Not tracking {path}: it is not inside a git repository")
+                    continue
+                pending = self._pending.setdefault(root, PendingChanges())
+                rel_path = os.path.relpath(os.path.realpath(path), root)
+                if rel_path not in pending.paths:
+                    pending.paths.append(rel_path)
+                if summary not in pending.summaries:
+                    pending.summaries.append(summary)
+
+    def take(self, repository_path: str) -> PendingChanges:
+        """Remove and return the changes recorded for `repository_path`."""
+        with self._lock:
+            return self._pending.pop(os.path.realpath(repository_path), PendingChanges())
+
+    def restore(self, repository_path: str, changes: PendingChanges) -> None:
+        """Put changes back after a failed commit so a retry still includes them."""
+        with self._lock:
+            pending = self._pending.setdefault(os.path.realpath(repository_path), PendingChanges())
+            pending.paths[:0] = [p for p in changes.paths if p not in pending.paths]
+            pending.summaries[:0] = [s for s in changes.summaries if s not in pending.summaries]
+
+
+class PushQueue:
+    """
+    Pushes branches with at most `workers` pushes in flight across all repositories.
+    A push that is still waiting in the queue is shared by later requests for the same
+    branch: it pushes the branch head when it runs, so it includes their commits too.
+    """
+
+    _default: Optional["PushQueue"] = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, workers: int = DEFAULT_PUSH_CONCURRENCY):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="git-push")
+        self._queued: Dict[Tuple[str, str], Future] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def default(cls) -> "PushQueue":
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls(int(os.getenv("GIT_PUSH_CONCURRENCY") or DEFAULT_PUSH_CONCURRENCY))
+            return cls._default
+
+    def push(self, repository_path: str, branch: str, remote: str = "origin") -> Future:
+        key = (os.path.realpath(repository_path), branch)
+        with self._lock:
+            future = self._queued.get(key)
+            if future is not None and not future.running() and not future.done():
+                return future
+            future = self._executor.submit(self._push, repository_path, branch, remote)
+            self._queued[key] = future
+            return future
+
+    @staticmethod
+    def _push(repository_path: str, branch: str, remote: str) -> str:
+        logger.info(f"Pushing {branch} of {repository_path} to {remote}")
+        result = git(repository_path, "push", "--set-upstream", remote, branch)
+        try:
+            return result.stderr.strip()
+        finally:
+            result.cleanup()
+
+
+class PullRequestPublisher:
+    """
+    Commits the tracked remediation changes of a repository and opens one pull request
+    per (repository, branch). Later publishes to the same branch add a commit and push
+    it to the already opened pull request instead of creating another one; an open pull
+    request of the branch is looked up with `gh pr list --head` first, so this also holds
+    across processes.
+    """
+
+    _default: Optional["PullRequestPublisher"] = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, tracker: ChangeTracker, pushes: PushQueue, gh_command: Sequence[str] = ("gh",)):
+        self.tracker = tracker
+        self.pushes = pushes
+        self.gh_command = list(gh_command)
+        self._opened: Dict[Tuple[str, str], str] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    @classmethod
+    def default(cls) -> "PullRequestPublisher":
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls(ChangeTracker.default(), PushQueue.default(),
+                                   (os.getenv("GH_COMMAND") or "gh").split())
+            return cls._default
+
+    def _lock(self, repository_path: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(os.path.realpath(repository_path), threading.Lock())
+
+    def publish(self, repository_path: str, branch: str, commit_message: str, title: str, body: str,
+                paths: Sequence[str] = ()) -> str:
+        """Commit, push and open (or update) the pull request; returns its URL."""
+        key = (os.path.realpath(repository_path), branch)
+        with self._lock(repository_path):
+            changes = self.tracker.take(repository_path)
+            for path in paths:
+                rel_path = os.path.relpath(os.path.join(repository_path, path), repository_path)
+                if rel_path not in changes.paths:
+                    changes.paths.append(rel_path)
+            if not changes.paths:
+                raise ValueError("No changed files were recorded for this repository; pass the changed `paths`.")
+            try:
+                self._commit(repository_path, branch, commit_message, changes)
+            except Exception:
+                self.tracker.restore(repository_path, changes)
+                raise
+        self.pushes.push(repository_path, branch).result()
+
+        with self._lock(repository_path):
+            url = self._opened.get(key) or self._find_open(repository_path, branch)
+            if url is None:
+                result = run_command(
+                    self.gh_command + ["pr", "create", "--head", branch, "--title", title, "--body", body],
+                    cwd=repository_path, check=True, timeout=timeout_for("gh", 300))
+                try:
+                    url = self._opened[key] = result.stdout.strip()
+                finally:
+                    result.cleanup()
+                logger.info(f"Opened pull request {url} for {len(changes.paths)} files of {repository_path}")
+            else:
+                self._opened[key] = url
+                logger.info(f"Pushed {len(changes.paths)} more files of {repository_path} to {url}")
+            return url
+
+    def _find_open(self, repository_path: str, branch: str) -> Optional[str]:
+        """URL of the open pull request for `branch`, e.g. opened by an earlier run."""
+        result = run_command(
+            self.gh_command + ["pr", "list", "--head", branch, "--state", "open", "--json", "url",
+                               "--jq", ".[0].url // empty"],
+            cwd=repository_path, check=True, timeout=timeout_for("gh", 300))
+        try:
+            return result.stdout.strip() or None
+        finally:
+            result.cleanup()
+
+    @staticmethod
+    def _commit(repository_path: str, branch: str, commit_message: str, changes: PendingChanges) -> None:
+        current = git_output(repository_path, "rev-parse", "--abbrev-ref", "HEAD").strip()
+        if current != branch:
+            # An existing branch keeps its commits (e.g. of an earlier run); -B would reset it
+            result = run_command(["git", "-C", repository_path, "rev-parse", "--verify", "--quiet",
+                                  f"refs/heads/{branch}"], timeout=timeout_for("git", 600))
+            result.cleanup()
+            git_output(repository_path, "checkout", *([branch] if result.returncode == 0 else ["-b", branch]))
+        git_output(repository_path, "add", "-A", "--", *changes.paths)
+        message = commit_message
+        if changes.summaries:
+            message += "\n\n" + "\n".join(f"- {summary}" for summary in changes.summaries)
+        # --only commits just these paths, even if something else was staged in the index
+        git_output(repository_path, "commit", "--only", "-m", message, "--", *changes.paths)
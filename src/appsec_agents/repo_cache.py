@@ -0,0 +1,110 @@
+import hashlib
+import logging
+import os
+import re
+import shutil
+import threading
+from typing import Dict, Optional
+
+from git import Repo
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "appsec_agents", "mirrors")
+
+
+def default_cache_dir() -> str:
+    """Mirror cache location, overridable with the REPO_CACHE_DIR environment variable."""
+    return os.getenv("REPO_CACHE_DIR") or DEFAULT_CACHE_DIR
+
+
+def _file_url(path: str) -> str:
+    # git ignores --depth/--filter for plain local paths, so go through the file:// transport
+    return "file://" + os.path.abspath(path).replace(os.sep, "/")
+
+
+class RepoMirrorCache:
+    """
+    Local cache of bare mirrors keyed by repository URL.
+
+    The first request for a repository does a `git clone --mirror`; later requests only
+    run an incremental `git remote update --prune`. Workspaces are then created from the
+    mirror instead of the network:
+
+    - full (default): `git clone --reference <mirror>`, objects are shared via alternates
+    - shallow: `git clone --depth N file://<mirror>`
+    - partial: `git clone --filter=blob:none file://<mirror>` (blobs fetched on demand from
+      the mirror, which stays the promisor remote under the name `mirror`)
+    - worktree: `git worktree add` on the mirror itself, for read-only scanning
+    """
+
+    _locks: Dict[str, threading.Lock] = {}
+    _locks_guard = threading.Lock()
+
+    def __init__(self, cache_dir: Optional[str] = None):
+        self.cache_dir = cache_dir or default_cache_dir()
+
+    def mirror_path(self, repo_url: str) -> str:
+        """Directory of the mirror for `repo_url`: readable repo name plus a URL hash."""
+        name = re.sub(r"[^A-Za-z0-9._-]", "_", repo_url.rstrip("/").split("/")[-1])
+        name = name[:-4] if name.endswith(".git") else name
+        digest = hashlib.sha256(repo_url.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"{name}-{digest}.git")
+
+    def _lock(self, path: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(path, threading.Lock())
+
+    def update(self, repo_url: str) -> Repo:
+        """Create the mirror for `repo_url` or fetch the changes since the last update."""
+        path = self.mirror_path(repo_url)
+        with self._lock(path):
+            if os.path.isdir(path):
+                logger.info(f"Updating mirror {path} from {repo_url}")
+                mirror = Repo(path)
+                mirror.git.remote("update", "--prune")
+            else:
+                logger.info(f"Creating mirror of {repo_url} at {path}")
+                os.makedirs(self.cache_dir, exist_ok=True)
+                mirror = Repo.clone_from(repo_url, path, mirror=True)
+                # Allow partial clones (--filter) to be served from the mirror
+                mirror.git.config("uploadpack.allowFilter", "true")
+            return mirror
+
+    def checkout(self, repo_url: str, local_path: str, depth: Optional[int] = None,
+                 partial: bool = False, worktree: bool = False) -> Repo:
+        """
+        Create a workspace for `repo_url` at `local_path` from the (updated) mirror.
+        `depth` and `partial` are meant for scanners that do not need the history.
+        """
+        mirror = self.update(repo_url)
+        mirror_path = mirror.git_dir
+
+        if os.path.exists(local_path):
+            logger.info(f"Removing existing directory at {local_path}")
+            shutil.rmtree(local_path)
+
+        if worktree:
+            with self._lock(self.mirror_path(repo_url)):
+                mirror.git.worktree("prune")
+                mirror.git.worktree("add", "--detach", local_path, "HEAD")
+            return Repo(local_path)
+
+        options = {}
+        if depth:
+            options.update(depth=depth, no_single_branch=True)
+        if partial:
+            options["filter"] = "blob:none"
+        if not options:
+            options["reference"] = mirror_path
+        if partial:
+            # Missing blobs are fetched from the promisor remote, so it has to stay the local
+            # mirror; origin is added next to it for fetches and pushes
+            repo = Repo.clone_from(_file_url(mirror_path), local_path, origin="mirror", **options)
+            repo.create_remote("origin", repo_url)
+            return repo
+        repo = Repo.clone_from(_file_url(mirror_path), local_path, **options)
+
+        # Point origin back at the real remote so later fetches and pushes go there
+        repo.remote("origin").set_url(repo_url)
+        return repo
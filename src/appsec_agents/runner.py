@@ -0,0 +1,283 @@
+import codecs
+import io
+import logging
+import os
+import queue
+import selectors
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional, Sequence, Tuple, Union
+
+from appsec_agents.tracing import Tracer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SPILL_THRESHOLD = 8 * 1024 * 1024  # 8 MB of text kept in memory per stream
+DEFAULT_GRACE_PERIOD = 5.0
+READ_CHUNK = 64 * 1024
+POLL_INTERVAL = 0.05
+
+Command = Union[str, Sequence[str]]
+LineCallback = Callable[[str, str], None]
+
+
+def timeout_for(tool: str, default: Optional[float]) -> Optional[float]:
+    """Per-tool timeout in seconds from `<TOOL>_TIMEOUT` (e.g. PMD_TIMEOUT); 0 disables it."""
+    value = os.getenv(f"{tool.upper()}_TIMEOUT")
+    if value is None or value == "":
+        return default
+    return float(value) or None
+
+
+class _StreamCapture:
+    """Decodes one output stream, hands complete lines to a callback and spills to disk when large."""
+
+    def __init__(self, name: str, on_line: Optional[LineCallback], spill_threshold: int, encoding: str):
+        self.name = name
+        self.on_line = on_line
+        self.spill_threshold = spill_threshold
+        self.encoding = encoding
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        self._buffer = io.StringIO()
+        self._partial = ""
+        self.size = 0
+        self.spill_path: Optional[str] = None
+        self._spill = None
+
+    def feed(self, data: bytes, final: bool = False) -> None:
+        text = self._decoder.decode(data, final=final)
+        if text:
+            self._write(text)
+        if self.on_line is not None:
+            lines = (self._partial + text).split("\n")
+            self._partial = "" if final else lines.pop()
+            for line in lines:
+                if line or not final:
+                    self.on_line(self.name, line)
+
+    def _write(self, text: str) -> None:
+        self.size += len(text)
+        if self._spill is not None:
+            self._spill.write(text)
+            return
+        self._buffer.write(text)
+        if self.size > self.spill_threshold:
+            self._spill = tempfile.NamedTemporaryFile(
+                "w", encoding=self.encoding, prefix=f"{self.name}-", suffix=".log", delete=False)
+            self.spill_path = self._spill.name
+            self._spill.write(self._buffer.getvalue())
+            self._buffer = io.StringIO()
+
+    def close(self) -> None:
+        self.feed(b"", final=True)
+        if self._spill is not None:
+            self._spill.close()
+
+    def value(self) -> str:
+        return self._buffer.getvalue()
+
+
+@dataclass
+class CommandResult:
+    """Outcome of one `run_command` invocation."""
+    command: Command
+    returncode: Optional[int]
+    duration: float
+    peak_rss: Optional[int] = None  # bytes, when the platform reports it
+    timed_out: bool = False
+    stdout_path: Optional[str] = None  # set when stdout was spilled to disk
+    stderr_path: Optional[str] = None
+    _stdout: str = field(default="", repr=False)
+    _stderr: str = field(default="", repr=False)
+
+    @staticmethod
+    def _read(text: str, path: Optional[str]) -> str:
+        if path is None:
+            return text
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            return f.read()
+
+    @property
+    def stdout(self) -> str:
+        """Full stdout; loaded from the spill file if the output was large."""
+        return self._read(self._stdout, self.stdout_path)
+
+    @property
+    def stderr(self) -> str:
+        return self._read(self._stderr, self.stderr_path)
+
+    def open_stdout(self):
+        """Text stream over stdout without loading a spilled file into memory."""
+        if self.stdout_path is not None:
+            return open(self.stdout_path, "r", encoding="utf-8", errors="replace")
+        return io.StringIO(self._stdout)
+
+    def cleanup(self) -> None:
+        """Remove spill files once the output is no longer needed."""
+        for path in (self.stdout_path, self.stderr_path):
+            if path and os.path.exists(path):
+                os.remove(path)
+        self.stdout_path = self.stderr_path = None
+
+
+def _signal(proc: subprocess.Popen, sig: int) -> None:
+    try:
+        if os.name == "posix":
+            # The child runs in its own session, so this also reaches processes spawned by a shell
+            os.killpg(proc.pid, sig)
+        elif sig == signal.SIGTERM:
+            proc.terminate()
+        else:
+            proc.kill()
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def _try_reap(proc: subprocess.Popen) -> Tuple[bool, Optional[int]]:
+    """Reap the child without blocking; returns (exited, peak RSS in bytes if known)."""
+    if os.name != "posix":
+        return proc.poll() is not None, None
+    pid, status, rusage = os.wait4(proc.pid, os.WNOHANG)
+    if pid == 0:
+        return False, None
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return True, rusage.ru_maxrss if sys.platform == "darwin" else rusage.ru_maxrss * 1024
+
+
+def _pump_selectors(proc: subprocess.Popen, captures: Dict[int, _StreamCapture], tick: Callable[[], bool]) -> None:
+    with selectors.DefaultSelector() as selector:
+        for fd in captures:
+            os.set_blocking(fd, False)
+            selector.register(fd, selectors.EVENT_READ)
+        while selector.get_map():
+            if not tick():
+                break
+            for key, _ in selector.select(timeout=POLL_INTERVAL * 10):
+                try:
+                    data = os.read(key.fd, READ_CHUNK)
+                except BlockingIOError:
+                    continue
+                if data:
+                    captures[key.fd].feed(data)
+                else:
+                    selector.unregister(key.fd)
+
+
+def _pump_threads(proc: subprocess.Popen, captures: Dict[int, _StreamCapture], tick: Callable[[], bool]) -> None:
+    # Pipes cannot be selected on Windows; read each one on its own thread instead
+    chunks: "queue.Queue" = queue.Queue()
+
+    def reader(fd: int) -> None:
+        while True:
+            data = os.read(fd, READ_CHUNK)
+            chunks.put((fd, data))
+            if not data:
+                return
+
+    for fd in captures:
+        threading.Thread(target=reader, args=(fd,), daemon=True).start()
+    open_streams = len(captures)
+    while open_streams and tick():
+        try:
+            fd, data = chunks.get(timeout=POLL_INTERVAL * 10)
+        except queue.Empty:
+            continue
+        if data:
+            captures[fd].feed(data)
+        else:
+            open_streams -= 1
+
+
+def _program(command: Command) -> str:
+    program = command.split(" ", 1)[0] if isinstance(command, str) else command[0]
+    return os.path.basename(str(program))
+
+
+def run_command(command: Command, cwd: Optional[str] = None, env: Optional[Dict[str, str]] = None,
+                timeout: Optional[float] = None, on_line: Optional[LineCallback] = None,
+                spill_threshold: int = DEFAULT_SPILL_THRESHOLD, grace_period: float = DEFAULT_GRACE_PERIOD,
+                shell: bool = False, check: bool = False, encoding: str = "utf-8") -> CommandResult:
+    """
+    Run `command`, reading stdout and stderr concurrently so neither pipe can fill up and block
+    the child. Complete lines are passed to `on_line(stream, line)` as they arrive, and each
+    stream moves from memory to a temporary file once it exceeds `spill_threshold` characters.
+
+    On timeout the process group gets SIGTERM, then SIGKILL after `grace_period` seconds.
+    With `check=True` a non-zero exit raises subprocess.CalledProcessError, like subprocess.run.
+    """
+    start = time.monotonic()
+    started_at = time.time()
+    proc = subprocess.Popen(
+        command, cwd=cwd, env=env, shell=shell,
+        stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        start_new_session=(os.name == "posix"),
+    )
+    captures = {
+        proc.stdout.fileno(): _StreamCapture("stdout", on_line, spill_threshold, encoding),
+        proc.stderr.fileno(): _StreamCapture("stderr", on_line, spill_threshold, encoding),
+    }
+    state = {"timed_out": False, "term_at": None, "killed_at": None}
+
+    def tick() -> bool:
+        """Enforce the timeout; returns False once output should no longer be awaited."""
+        if timeout is None:
+            return True
+        now = time.monotonic()
+        if not state["timed_out"] and now - start > timeout:
+            logger.warning(f"Command timed out after {timeout:.0f}s, terminating: {command}")
+            state["timed_out"] = True
+            state["term_at"] = now
+            _signal(proc, signal.SIGTERM)
+        if state["timed_out"] and state["killed_at"] is None and now - state["term_at"] > grace_period:
+            _signal(proc, getattr(signal, "SIGKILL", signal.SIGTERM))
+            state["killed_at"] = now
+        # Stop draining pipes that are held open by orphaned grandchildren
+        return state["killed_at"] is None or now - state["killed_at"] < grace_period
+
+    try:
+        if os.name == "posix":
+            _pump_selectors(proc, captures, tick)
+        else:
+            _pump_threads(proc, captures, tick)
+
+        exited, peak_rss = _try_reap(proc)
+        while not exited:
+            if not tick():
+                _signal(proc, getattr(signal, "SIGKILL", signal.SIGTERM))
+            time.sleep(POLL_INTERVAL)
+            exited, peak_rss = _try_reap(proc)
+    finally:
+        for capture in captures.values():
+            capture.close()
+        proc.stdout.close()
+        proc.stderr.close()
+
+    stdout_capture, stderr_capture = captures.values()
+    result = CommandResult(
+        command=command,
+        returncode=proc.returncode,
+        duration=time.monotonic() - start,
+        peak_rss=peak_rss,
+        timed_out=state["timed_out"],
+        stdout_path=stdout_capture.spill_path,
+        stderr_path=stderr_capture.spill_path,
+        _stdout=stdout_capture.value(),
+        _stderr=stderr_capture.value(),
+    )
+    rss = f"{result.peak_rss / (1024 * 1024):.1f} MB" if result.peak_rss else "n/a"
+    logger.info(f"Command {command!r} exited with {result.returncode} in {result.duration:.2f}s (peak RSS {rss})")
+    Tracer.default().record(_program(command), "subprocess", started_at, result.duration,
+                            returncode=result.returncode, timed_out=result.timed_out, peak_rss=result.peak_rss,
+                            output_bytes=stdout_capture.size + stderr_capture.size)
+
+    if check and result.returncode != 0:
+        stdout, stderr = result.stdout, result.stderr
+        result.cleanup()  # The caller never sees the result, so its spill files go now
+        raise subprocess.CalledProcessError(result.returncode, command, stdout, stderr)
+    return result
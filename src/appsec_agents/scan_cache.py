@@ -0,0 +1,174 @@
+import functools
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from git import InvalidGitRepositoryError, NoSuchPathError, Repo
+
+from appsec_agents.fileio import atomic_write
+from appsec_agents.runner import run_command
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "appsec_agents", "scans")
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024  # 512 MB
+REPO_PLACEHOLDER = "<repo>"
+
+
+def cache_disabled() -> bool:
+    """True when SCAN_CACHE_DISABLED is set, which makes every tool rescan."""
+    return os.getenv("SCAN_CACHE_DISABLED", "").lower() in ("1", "true", "yes")
+
+
+class DiskLRUCache:
+    """
+    Small on-disk key/value store with one JSON file per entry.
+    The file mtime doubles as the last-access time; once the directory grows past
+    `max_bytes`, the least recently used entries are removed. Entries older than `ttl`
+    seconds (if given) are treated as missing and deleted when read.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = DEFAULT_MAX_BYTES, ttl: Optional[float] = None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[Any]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            if self.ttl is not None and time.time() - entry["created"] > self.ttl:
+                os.remove(path)
+                raise KeyError(key)
+            value = entry["value"]
+            os.utime(path)  # Mark as recently used
+        except (OSError, ValueError, KeyError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def put(self, key: str, value: Any) -> None:
+        path = self._path(key)
+        atomic_write(path, json.dumps({"created": time.time(), "value": value}))
+        self.evict()
+
+    def _entries(self):
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".json"):
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    yield path, st.st_size, st.st_mtime
+
+    def evict(self) -> int:
+        """Remove least recently used entries until the cache fits in `max_bytes`."""
+        with self._lock:
+            entries = sorted(self._entries(), key=lambda entry: entry[2])
+            total = sum(size for _, size, _ in entries)
+            removed = 0
+            for path, size, _ in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                removed += 1
+            if removed:
+                logger.info(f"Evicted {removed} entries from {self.cache_dir}")
+            return removed
+
+    def stats(self) -> Dict[str, int]:
+        entries = list(self._entries())
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+        }
+
+
+@functools.lru_cache(maxsize=None)
+def tool_version(binary: str) -> str:
+    """First line printed by `<binary> --version`, or 'unknown' if it cannot be run."""
+    try:
+        result = run_command([binary, "--version"], timeout=60)
+        try:
+            lines = (result.stdout.strip() or result.stderr.strip()).splitlines()
+        finally:
+            result.cleanup()
+        return lines[0].strip() if lines else "unknown"
+    except Exception:
+        return "unknown"
+
+
+def tree_sha(local_path: str) -> Optional[str]:
+    """
+    SHA of the tree checked out at `local_path`, or None when the path is not a git
+    repository or has local modifications (the result would not be reproducible).
+    """
+    try:
+        repo = Repo(local_path)
+        if repo.is_dirty(untracked_files=True):
+            return None
+        return repo.head.commit.tree.hexsha
+    except (InvalidGitRepositoryError, NoSuchPathError, ValueError):
+        return None
+
+
+class ScanResultCache(DiskLRUCache):
+    """Scanner results keyed by (tree SHA, scanner binary version, scanner arguments)."""
+
+    _default: Optional["ScanResultCache"] = None
+    _default_lock = threading.Lock()
+
+    @classmethod
+    def default(cls) -> "ScanResultCache":
+        """Process-wide cache configured from SCAN_CACHE_DIR and SCAN_CACHE_MAX_BYTES."""
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls(
+                    os.getenv("SCAN_CACHE_DIR") or DEFAULT_CACHE_DIR,
+                    int(os.getenv("SCAN_CACHE_MAX_BYTES") or DEFAULT_MAX_BYTES),
+                )
+            return cls._default
+
+    def key(self, tool: str, local_path: str, binary: str, args: Any) -> Optional[str]:
+        """Cache key for running `binary` with `args` on `local_path`, or None if uncacheable."""
+        sha = tree_sha(local_path)
+        if sha is None:
+            return None
+        # Workspaces live at per-run paths, so keep the checkout location out of the key
+        args = json.dumps(args, sort_keys=True).replace(json.dumps(local_path)[1:-1], REPO_PLACEHOLDER)
+        material = json.dumps([tool, sha, tool_version(binary), args])
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def get_result(self, key: Optional[str], local_path: str) -> Optional[str]:
+        """Cached tool output for `key` with paths rewritten to the current checkout."""
+        if key is None:
+            return None
+        value = self.get(key)
+        return value.replace(REPO_PLACEHOLDER, local_path) if value is not None else None
+
+    def put_result(self, key: Optional[str], output: str, local_path: str) -> None:
+        """Store tool output with the checkout location replaced by a placeholder."""
+        if key is not None:
+            self.put(key, output.replace(local_path, REPO_PLACEHOLDER))
@@ -0,0 +1,172 @@
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional
+
+from appsec_agents.tracing import Tracer
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class TaskTiming:
+    """Wall-clock start and end of a single scheduled task."""
+    name: str
+    started_at: float
+    finished_at: float
+
+    @property
+    def duration(self) -> float:
+        return self.finished_at - self.started_at
+
+
+@dataclass
+class ScheduleResult:
+    """Outputs and timings of a scheduler run, keyed by task name."""
+    outputs: Dict[str, Any] = field(default_factory=dict)
+    timings: List[TaskTiming] = field(default_factory=list)
+    order: List[str] = field(default_factory=list)
+
+    @property
+    def final_output(self) -> Any:
+        """Output of the last task in topological order."""
+        return self.outputs[self.order[-1]] if self.order else None
+
+    def format_timings(self) -> str:
+        """Render the task timings as a small text table relative to the first start."""
+        if not self.timings:
+            return "No tasks were executed."
+        origin = min(t.started_at for t in self.timings)
+        lines = [f"{'task':<32} {'start':>8} {'end':>8} {'duration':>9}"]
+        for t in sorted(self.timings, key=lambda t: t.started_at):
+            lines.append(
+                f"{t.name:<32} {t.started_at - origin:>7.2f}s {t.finished_at - origin:>7.2f}s {t.duration:>8.2f}s"
+            )
+        return "\n".join(lines)
+
+
+class TaskGraph:
+    """Directed acyclic graph of task names and the tasks they depend on."""
+
+    def __init__(self, dependencies: Mapping[str, Iterable[str]]):
+        self.dependencies: Dict[str, List[str]] = {
+            name: list(deps) for name, deps in dependencies.items()
+        }
+        for name, deps in self.dependencies.items():
+            for dep in deps:
+                if dep not in self.dependencies:
+                    raise ValueError(f"Task '{name}' depends on unknown task '{dep}'.")
+        self.order = self._topological_order()
+
+    @classmethod
+    def from_config(cls, tasks_config: Mapping[str, Mapping[str, Any]], names: Iterable[str]) -> "TaskGraph":
+        """
+        Build the graph from the `depends_on` entries of tasks.yaml.
+        `depends_on` may be a single task name or a list of names.
+        """
+        dependencies = {}
+        for name in names:
+            depends_on = tasks_config.get(name, {}).get("depends_on") or []
+            if isinstance(depends_on, str):
+                depends_on = [depends_on]
+            dependencies[name] = depends_on
+        return cls(dependencies)
+
+    def _topological_order(self) -> List[str]:
+        order: List[str] = []
+        state: Dict[str, str] = {}
+
+        def visit(name: str, path: List[str]) -> None:
+            if state.get(name) == "done":
+                return
+            if state.get(name) == "visiting":
+                cycle = " -> ".join(path[path.index(name):] + [name])
+                raise ValueError(f"Dependency cycle detected: {cycle}")
+            state[name] = "visiting"
+            for dep in self.dependencies[name]:
+                visit(dep, path + [name])
+            state[name] = "done"
+            order.append(name)
+
+        # Iterate in declaration order so independent tasks keep their yaml order
+        for name in self.dependencies:
+            visit(name, [])
+        return order
+
+    def ready(self, done: Iterable[str], started: Iterable[str]) -> List[str]:
+        """Tasks whose dependencies are all done and that have not been started yet."""
+        done, started = set(done), set(started)
+        return [
+            name for name in self.order
+            if name not in started and all(dep in done for dep in self.dependencies[name])
+        ]
+
+
+class DagScheduler:
+    """
+    Runs the tasks of a TaskGraph on a thread pool, starting each task as soon as
+    all of its dependencies have finished.
+    """
+
+    def __init__(self, graph: TaskGraph, max_workers: Optional[int] = None):
+        self.graph = graph
+        self.max_workers = max(1, max_workers or len(graph.order) or 1)
+
+    def run(self, execute: Callable[[str, Dict[str, Any]], Any], completed: Optional[Mapping[str, Any]] = None,
+            on_done: Optional[Callable[[str, Any], None]] = None) -> ScheduleResult:
+        """
+        Execute every task with `execute(name, upstream_outputs)`.
+        Tasks in `completed` (name -> output, e.g. from a checkpoint) are not run again; their
+        outputs are handed to the tasks that depend on them. `on_done(name, output)` is called
+        from the scheduling thread as each task finishes.
+        If a task raises, no new tasks are started and the first error is re-raised
+        once the running tasks have finished.
+        """
+        result = ScheduleResult(order=list(self.graph.order))
+        completed = {name: output for name, output in (completed or {}).items() if name in self.graph.dependencies}
+        result.outputs.update(completed)
+        done = set(completed)
+        started = set(completed)
+        if completed:
+            logger.info(f"Skipping {len(completed)} completed tasks: {', '.join(sorted(completed))}")
+        error: Optional[BaseException] = None
+
+        def timed(name: str, upstream: Dict[str, Any]) -> Any:
+            started_at = time.time()
+            logger.info(f"Task '{name}' started")
+            try:
+                return execute(name, upstream)
+            finally:
+                finished_at = time.time()
+                result.timings.append(TaskTiming(name, started_at, finished_at))
+                Tracer.default().record(name, "task", started_at, finished_at - started_at)
+                logger.info(f"Task '{name}' finished in {finished_at - started_at:.2f}s")
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="crew-task") as pool:
+            running = {}
+            while True:
+                if error is None:
+                    for name in self.graph.ready(done, started):
+                        if len(running) >= self.max_workers:
+                            break
+                        upstream = {dep: result.outputs[dep] for dep in self.graph.dependencies[name]}
+                        running[pool.submit(timed, name, upstream)] = name
+                        started.add(name)
+                if not running:
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    try:
+                        result.outputs[name] = future.result()
+                        done.add(name)
+                        if on_done is not None:
+                            on_done(name, result.outputs[name])
+                    except Exception as e:
+                        logger.error(f"Task '{name}' failed: {e}")
+                        error = error or e
+
+        if error is not None:
+            raise error
+        return result
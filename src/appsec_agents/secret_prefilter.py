@@ -0,0 +1,162 @@
+import math
+import mmap
+import os
+import re
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Iterable, List, Optional, Sequence
+
+from appsec_agents.pattern_engine import (BINARY_SNIFF_BYTES, FILES_PER_BATCH, PROCESS_POOL_THRESHOLD, is_binary,
+                                          iter_files)
+
+# Part of the scan cache and watermark keys, so results computed with other rules are not reused
+PREFILTER_VERSION = 1
+
+VENDORED_DIRS = {"node_modules", "vendor", "third_party", "third-party", "bower_components", "site-packages",
+                 ".venv", "venv", "Pods", "__pycache__"}
+LOCK_FILES = {"package-lock.json", "yarn.lock", "pnpm-lock.yaml", "npm-shrinkwrap.json", "poetry.lock", "Pipfile.lock",
+              "Cargo.lock", "Gemfile.lock", "composer.lock", "go.sum", "gradle.lockfile", "packages.lock.json"}
+BINARY_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif", ".bmp", ".ico", ".webp", ".svgz", ".pdf", ".zip", ".gz",
+                     ".tgz", ".bz2", ".xz", ".7z", ".jar", ".war", ".class", ".so", ".dll", ".dylib", ".exe", ".o",
+                     ".a", ".pyc", ".woff", ".woff2", ".ttf", ".otf", ".eot", ".mp3", ".mp4", ".mov", ".avi")
+# Files larger than this are not read and always handed to the scanner
+DEFAULT_MAX_FILE_SIZE = 16 * 1024 * 1024
+
+KEY_PREFIXES = (
+    rb"A[KS]IA[0-9A-Z]{16}",  # AWS access key id
+    rb"gh[pousr]_[A-Za-z0-9]{30,}", rb"github_pat_[A-Za-z0-9_]{30,}",
+    rb"xox[abposr]-[A-Za-z0-9-]{10,}",  # Slack
+    rb"-----BEGIN[A-Z ]*PRIVATE KEY",
+    rb"[sr]k_live_[A-Za-z0-9]{16,}", rb"AIza[0-9A-Za-z_-]{35}", rb"glpat-[A-Za-z0-9_-]{20}",
+    rb"SG\.[A-Za-z0-9_-]{16,}\.[A-Za-z0-9_-]{16,}", rb"://[^/\s:@]+:[^/\s:@]+@",
+)
+# A credential-like name assigned a literal (not a call) of at least six characters
+CREDENTIAL_NAMES = (rb"(?i:password|passwd|pwd|secret|token|api[_-]?key|access[_-]?key|private[_-]?key|"
+                    rb"client[_-]?secret|auth[_-]?token|credentials?)[\"']?\s*(?:[:=]|=>|:=)\s*"
+                    rb"[\"']?[^\s\"'();]{6,}(?![(\w])")
+_INDICATORS = re.compile(b"|".join(KEY_PREFIXES) + b"|" + CREDENTIAL_NAMES)
+# Literals (lower case) that every indicator contains; a substring search for them is much
+# faster than the regular expression, which only runs on files that have one
+_ANCHORS = (b"akia", b"asia", b"ghp_", b"gho_", b"ghu_", b"ghs_", b"ghr_", b"github_pat_", b"xox", b"-----begin",
+            b"k_live_", b"aiza", b"glpat-", b"sg.", b"://", b"pass", b"pwd", b"secret", b"token", b"key", b"credential")
+# The anchor search lowers this many bytes at a time, so a mmap is never copied whole
+ANCHOR_WINDOW = 1024 * 1024
+_ANCHOR_OVERLAP = max(len(anchor) for anchor in _ANCHORS) - 1
+_TOKENS = re.compile(rb"[A-Za-z0-9+/_=-]{20,}")
+_HEX = re.compile(rb"[0-9a-fA-F]+")
+_DIGIT = re.compile(rb"[0-9]")
+_LETTER = re.compile(rb"[A-Za-z]")
+# Share of the highest entropy a token of its length can have; random keys come close to 1
+ENTROPY_RATIO = 0.85
+HEX_ENTROPY_RATIO = 0.8
+
+
+def shannon_entropy(token: bytes) -> float:
+    counts = Counter(token)
+    return -sum(n / len(token) * math.log2(n / len(token)) for n in counts.values())
+
+
+def _high_entropy(data) -> bool:
+    for match in _TOKENS.finditer(data):
+        token = match.group(0)
+        # Keys mix letters and digits; long identifiers and words rarely do
+        if not (_DIGIT.search(token) and _LETTER.search(token)):
+            continue
+        hex_token = _HEX.fullmatch(token) is not None
+        ratio, alphabet = (HEX_ENTROPY_RATIO, 16) if hex_token else (ENTROPY_RATIO, 64)
+        if shannon_entropy(token) >= ratio * math.log2(min(len(token), alphabet)):
+            return True
+    return False
+
+
+def skipped(rel_path: str) -> bool:
+    """True for vendored, lock and binary-by-extension files, which are never scanned for secrets."""
+    parts = rel_path.split("/")
+    return bool(VENDORED_DIRS.intersection(parts[:-1])) or parts[-1] in LOCK_FILES or \
+        parts[-1].lower().endswith(BINARY_EXTENSIONS)
+
+
+def is_candidate(path: str, max_file_size: int = DEFAULT_MAX_FILE_SIZE) -> bool:
+    """
+    Whether the file may contain a secret: a known key prefix, a credential-like assignment
+    or a high-entropy token. Binary files are not; unreadable or oversized files are kept.
+    """
+    try:
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return False
+            if size > max_file_size:
+                return True
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return may_contain_secret(data)
+    except (OSError, ValueError):
+        return True
+
+
+def _has_anchor(data) -> bool:
+    # Windows overlap so an anchor across a window boundary is still found
+    for start in range(0, len(data), ANCHOR_WINDOW):
+        window = data[max(0, start - _ANCHOR_OVERLAP):start + ANCHOR_WINDOW].lower()
+        if any(anchor in window for anchor in _ANCHORS):
+            return True
+    return False
+
+
+def may_contain_secret(data) -> bool:
+    """Content check of `is_candidate` for bytes or a mmap."""
+    if is_binary(data[:BINARY_SNIFF_BYTES]):
+        return False
+    if _has_anchor(data) and _INDICATORS.search(data) is not None:
+        return True
+    return _high_entropy(data)
+
+
+def _check_batch(root: str, rel_paths: Sequence[str], max_file_size: int) -> List[str]:
+    return [rel for rel in rel_paths if is_candidate(os.path.join(root, rel), max_file_size)]
+
+
+@dataclass
+class PrefilterResult:
+    candidates: List[str] = field(default_factory=list)  # absolute paths, in walk order
+    files: int = 0  # files looked at
+    skipped: int = 0  # vendored, lock or binary by name
+
+
+def prefilter(root: str, paths: Optional[Iterable[str]] = None, max_file_size: int = DEFAULT_MAX_FILE_SIZE,
+              workers: Optional[int] = None) -> PrefilterResult:
+    """
+    Walk `root` once (or only `paths` inside it) and keep the files worth handing to a
+    secret scanner. Large trees are checked on a process pool, since the regular
+    expressions hold the GIL.
+    """
+    root = os.path.abspath(root)
+    if paths is None:
+        files = list(iter_files(root, sys.maxsize))
+    else:
+        files = [os.path.relpath(os.path.join(root, p), root).replace(os.sep, "/") for p in paths]
+    result = PrefilterResult(files=len(files))
+    kept = [rel for rel in files if not skipped(rel)]
+    result.skipped = len(files) - len(kept)
+
+    workers = workers or os.cpu_count() or 1
+    if len(kept) < PROCESS_POOL_THRESHOLD or workers == 1:
+        candidates = _check_batch(root, kept, max_file_size)
+    else:
+        batches = [kept[i:i + FILES_PER_BATCH] for i in range(0, len(kept), FILES_PER_BATCH)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            candidates = [rel for batch in pool.map(_check_batch, [root] * len(batches), batches,
+                                                     [max_file_size] * len(batches)) for rel in batch]
+    result.candidates = [os.path.join(root, rel) for rel in candidates]
+    return result
+
+
+def prefilter_enabled() -> bool:
+    """
+    True when SECRET_PREFILTER is set, which hands only the candidate files to the secret
+    scanners. Off by default: a file the prefilter drops is never seen by the scanner, and
+    formats it has no indicator for (e.g. a password passed without a keyword) are missed.
+    """
+    return os.getenv("SECRET_PREFILTER", "").lower() in ("1", "true", "yes")
@@ -0,0 +1,282 @@
+import hashlib
+import logging
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from appsec_agents.findings import Finding, secret_hash
+from appsec_agents.patch_engine import BackupStore, LineEdit, PatchError, apply_patch, atomic_write
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WINDOW = 5  # lines of context on each side of a finding sent to the LLM
+
+# File extension -> template of the expression that reads an environment variable
+ENV_LOOKUPS = {
+    ".py": 'os.environ.get("{name}")',
+    ".js": "process.env.{name}", ".mjs": "process.env.{name}", ".cjs": "process.env.{name}",
+    ".jsx": "process.env.{name}", ".ts": "process.env.{name}", ".tsx": "process.env.{name}",
+    ".java": 'System.getenv("{name}")', ".kt": 'System.getenv("{name}")', ".scala": 'sys.env("{name}")',
+    ".go": 'os.Getenv("{name}")',
+    ".rb": 'ENV["{name}"]',
+    ".php": "getenv('{name}')",
+    ".cs": 'Environment.GetEnvironmentVariable("{name}")',
+    ".sh": '"${{{name}}}"', ".bash": '"${{{name}}}"',
+}
+# Configuration files get a placeholder that Spring, docker-compose and most loaders expand
+PLACEHOLDER_FILES = {".yml", ".yaml", ".properties", ".json", ".toml", ".ini", ".cfg", ".conf", ".xml", ".env"}
+
+_ASSIGNMENT = re.compile(r"""([A-Za-z_][\w.\-]*)["']?\s*(?::=|=>|=|:)\s*(?:[\w.]+\(\s*)?$""")
+_CAMEL = re.compile(r"(?<=[a-z0-9])(?=[A-Z])")
+_PYTHON_OS_IMPORT = re.compile(r"^\s*(?:import\s+(?:[\w.]+\s*,\s*)*os\b|from\s+os\s+import\b)", re.M)
+_GO_OS_IMPORT = re.compile(r'^\s*(?:import\s+)?"os"\s*$', re.M)
+
+
+@dataclass
+class Fix:
+    """A secret replaced without the LLM."""
+    file: str
+    line: int
+    rule: str
+    env_var: str
+
+
+@dataclass
+class Window:
+    """Lines around a secret that need the LLM, identified by the hash of their current text."""
+    file: str
+    start: int  # 1-based, inclusive
+    end: int
+    line: int
+    rule: str
+    reason: str
+    text: str
+    id: str = ""
+
+    def __post_init__(self):
+        if not self.id:
+            self.id = window_id(self.file, self.start, self.end, self.text)
+
+    def format(self) -> str:
+        numbered = "\n".join(f"{self.start + i}| {line}" for i, line in enumerate(self.text.split("\n")))
+        return (f"Window {self.id}: {self.file} lines {self.start}-{self.end} "
+                f"({self.rule} secret on line {self.line}, {self.reason})\n{numbered}")
+
+
+@dataclass
+class FileRemediation:
+    path: str
+    fixes: List[Fix] = field(default_factory=list)
+    windows: List[Window] = field(default_factory=list)
+    written: bool = False
+
+
+def window_id(file: str, start: int, end: int, text: str) -> str:
+    return hashlib.sha256(f"{file}:{start}:{end}:{text}".encode("utf-8")).hexdigest()[:12]
+
+
+def env_var_name(prefix: str, rule: str) -> str:
+    """Environment variable named after the assigned identifier, or after the detector."""
+    match = _ASSIGNMENT.search(prefix)
+    name = match.group(1).split(".")[-1] if match else f"{rule}_secret"
+    name = _CAMEL.sub("_", name)
+    return re.sub(r"[^A-Za-z0-9]+", "_", name).strip("_").upper() or "SECRET"
+
+
+def _split_lines(content: str) -> Tuple[List[str], str]:
+    newline = "\r\n" if "\r\n" in content else "\n"
+    return content.split(newline), newline
+
+
+def _locate(lines: List[str], raw: str, line: Optional[int]) -> Optional[int]:
+    """0-based index of the line holding `raw`, preferring the reported line."""
+    if line and 0 < line <= len(lines) and raw in lines[line - 1]:
+        return line - 1
+    for index, text in enumerate(lines):
+        if raw in text:
+            return index
+    return None
+
+
+def _secret_of(finding: Finding, lines: List[str]) -> str:
+    """
+    The raw secret of a finding. Findings restored from a cache or checkpoint do not hold
+    it, so it is looked up again on the reported line by its hash and length.
+    """
+    raw = finding.extra.get("raw")
+    if raw:
+        return raw
+    digest, length, line = finding.extra.get("secret_hash"), finding.extra.get("secret_length"), finding.line
+    if not digest or not length or not line or not 0 < line <= len(lines):
+        return ""
+    text = lines[line - 1]
+    for start in range(len(text) - length + 1):
+        if secret_hash(text[start:start + length]) == digest:
+            return text[start:start + length]
+    return ""
+
+
+def _replace_literal(text: str, raw: str, replacement: str, placeholder: bool) -> Optional[str]:
+    """
+    Replace the string literal that consists of exactly `raw` with `replacement`.
+    Returns None if the secret is only part of a larger string (e.g. a connection URL).
+    """
+    start = text.find(raw)
+    end = start + len(raw)
+    before, after = text[:start], text[end:]
+    quote = before[-1:] if before[-1:] in ("'", '"', "`") else ""
+    if quote and after.startswith(quote):
+        if placeholder:
+            return before + replacement + after
+        return before[:-1] + replacement + after[1:]
+    if not quote and placeholder and re.search(r"[=:]\s*$", before) and not after.strip(" ,;"):
+        # Unquoted configuration value, e.g. `password: hunter2`
+        return before + replacement + after
+    return None
+
+
+def _python_import_line(lines: List[str]) -> int:
+    """Index at which `import os` can be inserted: after shebang, comments, docstring and __future__."""
+    index = 0
+    while index < len(lines) and (lines[index].startswith("#") or not lines[index].strip()):
+        index += 1
+    if index < len(lines) and lines[index].lstrip().startswith(('"""', "'''")):
+        quote = lines[index].lstrip()[:3]
+        if lines[index].count(quote) < 2:
+            index += 1
+            while index < len(lines) and quote not in lines[index]:
+                index += 1
+        index += 1
+    while index < len(lines) and lines[index].startswith("from __future__"):
+        index += 1
+    return index
+
+
+def remediate_file(local_path: str, rel_path: str, findings: Iterable[Finding],
+                   window: int = DEFAULT_WINDOW, backup: Optional[BackupStore] = None) -> FileRemediation:
+    """
+    Fix every secret of one file in memory and write the file once. Literals that hold
+    exactly the secret are replaced with an environment variable lookup for the file's
+    language; everything else becomes a small window of lines for the LLM.
+    """
+    path = os.path.join(local_path, rel_path)
+    result = FileRemediation(rel_path)
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        content = f.read()
+    lines, newline = _split_lines(content)
+    extension = os.path.splitext(rel_path)[1].lower() or os.path.basename(rel_path).lower()
+    placeholder = extension in PLACEHOLDER_FILES
+    template = "${{{name}}}" if placeholder else ENV_LOOKUPS.get(extension)
+    used_names: Dict[str, str] = {}
+    pending: List[Tuple[Finding, str]] = []
+
+    for finding in sorted(findings, key=lambda f: f.line or 0):
+        raw = _secret_of(finding, lines)
+        if "\n" in raw:
+            pending.append((finding, "multi-line secret"))
+            continue
+        index = _locate(lines, raw, finding.line) if raw else None
+        if index is None:
+            pending.append((finding, "secret not found verbatim"))
+            continue
+        if template is None:
+            pending.append((finding, "no known environment lookup for this file type"))
+            continue
+        if extension == ".go" and not _GO_OS_IMPORT.search(content):
+            pending.append((finding, "needs an \"os\" import"))
+            continue
+        prefix = lines[index][:lines[index].find(raw)]
+        name = used_names.get(raw)
+        if name is None:
+            # The same secret reuses its variable; different secrets never share one
+            base = name = env_var_name(prefix.rstrip("\"'` "), finding.rule)
+            suffix = 2
+            while name in used_names.values():
+                name, suffix = f"{base}_{suffix}", suffix + 1
+        replaced = _replace_literal(lines[index], raw, template.format(name=name), placeholder)
+        if replaced is None:
+            pending.append((finding, "secret is part of a larger string"))
+            continue
+        lines[index] = replaced
+        used_names[raw] = name
+        result.fixes.append(Fix(rel_path, index + 1, finding.rule, name))
+
+    if result.fixes and extension == ".py" and not _PYTHON_OS_IMPORT.search(content):
+        insert_at = _python_import_line(lines)
+        lines.insert(insert_at, "import os")
+        for fix in result.fixes:
+            if fix.line > insert_at:
+                fix.line += 1
+
+    # Windows are cut from the updated text so their line numbers match the file on disk
+    for finding, reason in pending:
+        raw = _secret_of(finding, lines)
+        index = _locate(lines, raw.split("\n")[0], finding.line) if raw else None
+        if index is None:
+            index = min(max((finding.line or 1) - 1, 0), len(lines) - 1)
+        start, end = max(index - window, 0), min(index + window, len(lines) - 1)
+        result.windows.append(Window(rel_path, start + 1, end + 1, index + 1, finding.rule, reason,
+                                     "\n".join(lines[start:end + 1])))
+
+    if result.fixes:
+        if backup is not None:
+            backup.put(content.encode("utf-8"), path)
+        atomic_write(path, newline.join(lines))
+        result.written = True
+    return result
+
+
+@dataclass
+class WindowEdit:
+    file: str
+    start: int
+    end: int
+    window: str
+    replacement: str
+
+
+def apply_window_edits(local_path: str, edits: Iterable[WindowEdit],
+                       backup: Optional[BackupStore] = None) -> Dict[str, str]:
+    """
+    Apply LLM replacements for windows returned by `remediate_file`, one patch per file.
+    An edit is rejected when the window id no longer matches the current lines (the file
+    changed since the window was cut) or when it overlaps another edit.
+    Returns a status message per window id.
+    """
+    by_file: Dict[str, List[WindowEdit]] = {}
+    for edit in edits:
+        by_file.setdefault(edit.file, []).append(edit)
+
+    status: Dict[str, str] = {}
+    for rel_path, file_edits in by_file.items():
+        path = os.path.join(local_path, rel_path)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError as e:
+            for edit in file_edits:
+                status[edit.window] = f"rejected: {e}"
+            continue
+        lines, _ = _split_lines(data.decode("utf-8", errors="replace"))
+        accepted: List[WindowEdit] = []
+        for edit in sorted(file_edits, key=lambda e: e.start):
+            text = "\n".join(lines[edit.start - 1:edit.end])
+            if window_id(rel_path, edit.start, edit.end, text) != edit.window:
+                status[edit.window] = "rejected: the lines changed since the window was created"
+            elif accepted and edit.start <= accepted[-1].end:
+                status[edit.window] = "rejected: overlaps another edit"
+            else:
+                accepted.append(edit)
+        if not accepted:
+            continue
+        try:
+            apply_patch(path, [LineEdit(e.start, e.end, e.replacement.rstrip("\n")) for e in accepted],
+                        expected_sha256=hashlib.sha256(data).hexdigest(), backup=backup)
+        except PatchError as e:
+            for edit in accepted:
+                status[edit.window] = f"rejected: {e}"
+            continue
+        for edit in accepted:
+            status[edit.window] = "applied"
+    return status
@@ -0,0 +1,281 @@
+import itertools
+import json
+import logging
+import os
+import queue
+import shutil
+import socketserver
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from appsec_agents.batch import RepoOutcome, is_transient
+from appsec_agents.findings import FindingsStore
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 2
+DEFAULT_MAX_JOBS = 1000
+DEFAULT_RETRIES = 1
+MAX_WAIT = 300  # seconds a status request may block
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+
+@dataclass
+class Job:
+    """One scan request and, once it ran, its outcome."""
+    id: str
+    repo_url: str
+    commit: Optional[str]
+    priority: int = 0
+    status: str = QUEUED
+    requests: int = 1  # submissions coalesced into this job
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    attempts: int = 0
+    stages: Dict[str, float] = field(default_factory=dict)
+    output: str = ""
+    error: Optional[str] = None
+
+    @property
+    def key(self) -> Tuple[str, Optional[str]]:
+        return self.repo_url, self.commit
+
+    def to_json(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class ScanService:
+    """
+    Runs scan jobs on a fixed set of worker threads, highest priority first (FIFO within a
+    priority). A job for a repository and commit that is already queued or running is not
+    started twice: the request is attached to the existing job ("singleflight"). Requests
+    without a commit only join a job that has not started yet, because a running job may
+    already have cloned an older head.
+
+    `run(job, workspace, worker_state)` does the scan; `worker_state` is a dict private to
+    the worker thread, where the runner can keep a warm crew between jobs. With a
+    WorkspaceManager as `workspaces`, each attempt leases its checkout from it.
+    """
+
+    def __init__(self, run: Callable[[Job, str, Dict[str, Any]], RepoOutcome], workspace_root: str,
+                 workers: int = DEFAULT_WORKERS, retries: int = DEFAULT_RETRIES, max_jobs: int = DEFAULT_MAX_JOBS,
+                 keep_workspaces: bool = False, workspaces=None):
+        self.run = run
+        self.workspace_root = workspace_root
+        self.retries = retries
+        self.max_jobs = max_jobs
+        self.keep_workspaces = keep_workspaces
+        self.workspaces = workspaces
+        self.jobs: Dict[str, Job] = {}  # insertion ordered, oldest first
+        self._inflight: Dict[Tuple[str, Optional[str]], Job] = {}
+        self._queue: "queue.PriorityQueue[Tuple[int, int, Optional[Job]]]" = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._finished = threading.Condition(self._lock)
+        self._workers = [threading.Thread(target=self._work, name=f"scan-worker-{i}", daemon=True)
+                         for i in range(max(1, workers))]
+
+    def start(self) -> "ScanService":
+        for worker in self._workers:
+            worker.start()
+        return self
+
+    def stop(self) -> None:
+        """Let the running jobs finish, then stop the workers. Queued jobs stay queued."""
+        for _ in self._workers:
+            self._queue.put((-(2 ** 31), next(self._sequence), None))
+        for worker in self._workers:
+            worker.join()
+
+    def submit(self, repo_url: str, commit: Optional[str] = None, priority: int = 0) -> Tuple[Job, bool]:
+        """Queue a scan; returns the job and whether the request joined an existing one."""
+        with self._lock:
+            job = self._inflight.get((repo_url, commit))
+            if job is not None and (job.status == QUEUED or commit is not None):
+                job.requests += 1
+                if job.status == QUEUED and priority > job.priority:
+                    # The old queue entry is skipped once the job has run
+                    job.priority = priority
+                    self._queue.put((-priority, next(self._sequence), job))
+                logger.info(f"Coalesced request for {repo_url}@{commit or 'HEAD'} into job {job.id}")
+                return job, True
+            job = Job(uuid.uuid4().hex[:12], repo_url, commit, priority)
+            self.jobs[job.id] = job
+            self._inflight[job.key] = job
+            self._evict()
+        self._queue.put((-priority, next(self._sequence), job))
+        logger.info(f"Queued job {job.id} for {repo_url}@{commit or 'HEAD'} with priority {priority}")
+        return job, False
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def wait(self, job: Job, timeout: Optional[float] = None) -> bool:
+        """Block until `job` has finished; False if it is still queued or running after `timeout`."""
+        with self._finished:
+            return self._finished.wait_for(lambda: job.status in (SUCCEEDED, FAILED), timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts: Dict[str, Any] = {status: 0 for status in (QUEUED, RUNNING, SUCCEEDED, FAILED)}
+            for job in self.jobs.values():
+                counts[job.status] += 1
+            counts["coalesced"] = sum(job.requests - 1 for job in self.jobs.values())
+        if self.workspaces is not None:
+            counts["workspaces"] = self.workspaces.report()
+        return counts
+
+    def _evict(self) -> None:
+        finished = [job_id for job_id, job in self.jobs.items() if job.status in (SUCCEEDED, FAILED)]
+        for job_id in finished[:max(0, len(self.jobs) - self.max_jobs)]:
+            del self.jobs[job_id]
+
+    def _work(self) -> None:
+        state: Dict[str, Any] = {}
+        while True:
+            _, _, job = self._queue.get()
+            if job is None:
+                return
+            with self._lock:
+                if job.status != QUEUED:
+                    continue  # a stale entry of a job whose priority was raised
+                job.status, job.started_at = RUNNING, time.time()
+            self._execute(job, state)
+
+    def _execute(self, job: Job, state: Dict[str, Any]) -> None:
+        workspace = os.path.join(self.workspace_root, job.id)
+        status = FAILED
+        try:
+            while True:
+                job.attempts += 1
+                try:
+                    if self.workspaces is None:
+                        outcome = self.run(job, workspace, state)
+                    else:
+                        with self.workspaces.workspace(job.repo_url, job.id, ref=job.commit) as leased:
+                            outcome = self.run(job, leased.path, state)
+                    job.stages, job.output, status = outcome.stages, outcome.output, SUCCEEDED
+                    break
+                except Exception as e:
+                    if job.attempts > self.retries or not is_transient(e):
+                        logger.error(f"Job {job.id} for {job.repo_url} failed: {e}")
+                        job.error, status = f"{type(e).__name__}: {e}", FAILED
+                        break
+                    logger.warning(f"Job {job.id} attempt {job.attempts} failed, retrying: {e}")
+                    shutil.rmtree(workspace, ignore_errors=True)
+        finally:
+            if not self.keep_workspaces:
+                shutil.rmtree(workspace, ignore_errors=True)
+        with self._lock:
+            job.status, job.finished_at = status, time.time()
+            if self._inflight.get(job.key) is job:
+                del self._inflight[job.key]
+            self._finished.notify_all()
+        logger.info(f"Job {job.id} {status} in {job.finished_at - job.started_at:.1f}s "
+                    f"({job.requests} requests)")
+
+
+class ServiceRequestHandler(BaseHTTPRequestHandler):
+    """
+    JSON API:
+    POST /jobs {"repo_url": ..., "commit": ..., "priority": ...} -> 202 with the job (200 if coalesced)
+    GET /jobs/<id>[?wait=SECONDS] -> the job with its status, timings and output,
+        optionally waiting up to SECONDS for it to finish
+    GET /health -> job counts per status (and workspace disk usage and reuse)
+    """
+
+    service: ScanService  # set on the subclass created by `make_server`
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/jobs":
+            return self._send(404, {"error": "not found"})
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}")
+            repo_url = body["repo_url"]
+            priority = int(body.get("priority") or 0)
+        except (ValueError, KeyError, TypeError) as e:
+            return self._send(400, {"error": f"invalid request: {e}"})
+        job, coalesced = self.service.submit(repo_url, body.get("commit") or None, priority)
+        self._send(200 if coalesced else 202, dict(job.to_json(), coalesced=coalesced))
+
+    def do_GET(self):
+        if self.path == "/health":
+            return self._send(200, self.service.stats())
+        url = urlsplit(self.path)
+        if url.path.startswith("/jobs/"):
+            job = self.service.get(url.path[len("/jobs/"):])
+            if job is not None:
+                wait = parse_qs(url.query).get("wait")
+                if wait:
+                    try:
+                        timeout = float(wait[0])
+                        if not 0 <= timeout:  # also rejects nan
+                            raise ValueError(f"wait must not be negative: {wait[0]}")
+                    except ValueError as e:
+                        return self._send(400, {"error": f"invalid request: {e}"})
+                    self.service.wait(job, min(timeout, MAX_WAIT))
+                return self._send(200, job.to_json())
+        self._send(404, {"error": "not found"})
+
+    def _send(self, status: int, payload: Dict[str, Any]) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def address_string(self) -> str:
+        # Unix socket clients have no address
+        return self.client_address[0] if self.client_address else "unix"
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def server_bind(self):
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+        super().server_bind()
+        self.server_name, self.server_port = "localhost", 0
+
+
+def make_server(service: ScanService, host: str = "127.0.0.1", port: int = 8787,
+                socket_path: Optional[str] = None) -> socketserver.BaseServer:
+    """HTTP server for `service` on a TCP port, or on a Unix socket when `socket_path` is given."""
+    handler = type("BoundServiceRequestHandler", (ServiceRequestHandler,), {"service": service})
+    if socket_path:
+        return UnixHTTPServer(socket_path, handler)
+    return ThreadingHTTPServer((host, port), handler)
+
+
+class WarmCrewRunner:
+    """
+    Scan function for ScanService that builds the crew (configuration, agents and tools)
+    once per worker thread and reuses it for every job that worker runs.
+    """
+
+    def __init__(self, scan: Callable[..., RepoOutcome]):
+        self.scan = scan
+
+    def __call__(self, job: Job, workspace: str, state: Dict[str, Any]) -> RepoOutcome:
+        if "crew" not in state:
+            from appsec_agents.crew import AppsecAgents
+            state["crew"] = AppsecAgents()
+        try:
+            return self.scan(job.repo_url, workspace, commit=job.commit, crew=state["crew"])
+        finally:
+            FindingsStore.default().discard(workspace)
+
@@ -0,0 +1,182 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional, Sequence, Tuple, TypeVar
+
+from appsec_agents.dependencies import MANIFEST_TYPES
+from appsec_agents.findings import Finding, dedupe, fingerprint, rank
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+DEFAULT_MIN_BYTES = 64 * 1024 * 1024  # smaller checkouts are scanned in one run
+DEFAULT_MEMORY_PER_SHARD = 1024  # MB a scanner process may use
+# Files that make a top-level directory a project of its own
+PROJECT_FILES = {name for manifest, _, companions in MANIFEST_TYPES for name in (manifest, *companions)} | {
+    "build.gradle", "pyproject.toml", "setup.py", "Gemfile", "Cargo.toml", "composer.json",
+}
+SOURCE_EXTENSIONS = (".java", ".kt", ".scala", ".js", ".jsx", ".ts", ".tsx", ".py", ".go", ".rb", ".php", ".cs",
+                     ".c", ".cc", ".cpp", ".h", ".swift", ".vue")
+
+
+def shard_workers() -> int:
+    """
+    Scanner processes to run at once: SHARD_WORKERS, or the number of cores limited by the
+    available memory divided by SHARD_MEMORY_MB.
+    """
+    if os.getenv("SHARD_WORKERS"):
+        return max(1, int(os.getenv("SHARD_WORKERS")))
+    workers = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+    memory = _available_memory_mb()
+    if memory:
+        workers = min(workers, memory // int(os.getenv("SHARD_MEMORY_MB") or DEFAULT_MEMORY_PER_SHARD))
+    return max(1, workers)
+
+
+def _available_memory_mb() -> Optional[int]:
+    try:
+        with open("/proc/meminfo", "r") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) // 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+@dataclass
+class Shard:
+    """Paths (relative to the repository) scanned together by one scanner run."""
+    paths: List[str] = field(default_factory=list)
+    bytes: int = 0
+
+
+def _tree_size(path: str) -> int:
+    if not os.path.isdir(path) or os.path.islink(path):
+        return os.lstat(path).st_size
+    total = 0
+    for directory, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(directory, name)).st_size
+            except OSError:
+                continue
+    return total
+
+
+def _has_sources(path: str) -> bool:
+    return any(name.endswith(SOURCE_EXTENSIONS) for _, _, files in os.walk(path) for name in files)
+
+
+def _entries(local_path: str, rel: str) -> List[Tuple[str, int]]:
+    base = os.path.join(local_path, rel)
+    return [(os.path.join(rel, name) if rel else name, _tree_size(os.path.join(base, name)))
+            for name in sorted(os.listdir(base))]
+
+
+def size_shards(local_path: str, max_shards: int, min_bytes: Optional[int] = None) -> List[Shard]:
+    """
+    Split the whole checkout into at most `max_shards` groups of files and directories of
+    similar total size. Directories larger than a fair share are split into their entries,
+    so a single big module does not end up in one shard. Every file is in exactly one shard.
+    """
+    min_bytes = DEFAULT_MIN_BYTES if min_bytes is None else min_bytes
+    units = _entries(local_path, "")
+    total = sum(size for _, size in units)
+    count = max(1, min(max_shards, -(-total // min_bytes)) if min_bytes else max_shards)
+    if count == 1:
+        return [Shard(["."], total)]
+    share = total / count
+    while True:
+        large = [(rel, size) for rel, size in units if size > share and os.path.isdir(os.path.join(local_path, rel))
+                 and not os.path.islink(os.path.join(local_path, rel))]
+        if not large:
+            break
+        for rel, size in large:
+            units.remove((rel, size))
+            units.extend(_entries(local_path, rel))
+    shards = [Shard() for _ in range(count)]
+    for rel, size in sorted(units, key=lambda unit: (-unit[1], unit[0])):
+        shard = min(shards, key=lambda s: s.bytes)
+        shard.paths.append(rel)
+        shard.bytes += size
+    for shard in shards:
+        shard.paths.sort()
+    logger.debug(f"Size shards of {local_path}: {[shard.bytes for shard in shards]} bytes")
+    return [shard for shard in shards if shard.paths]
+
+
+def file_shards(local_path: str, paths: Sequence[str], max_shards: int,
+                min_bytes: Optional[int] = None) -> List[Shard]:
+    """
+    Split a list of files (e.g. the changed files or the secret prefilter's candidates)
+    into at most `max_shards` groups of similar total size, as `size_shards` does for the
+    whole checkout. Paths are kept as given.
+    """
+    min_bytes = DEFAULT_MIN_BYTES if min_bytes is None else min_bytes
+    units = []
+    for path in paths:
+        try:
+            units.append((path, _tree_size(os.path.join(local_path, path))))
+        except OSError:
+            units.append((path, 0))  # Deleted since; the scanner reports it
+    total = sum(size for _, size in units)
+    count = max(1, min(max_shards, -(-total // min_bytes)) if min_bytes else max_shards)
+    shards = [Shard() for _ in range(count)]
+    for path, size in sorted(units, key=lambda unit: (-unit[1], unit[0])):
+        shard = min(shards, key=lambda s: s.bytes)
+        shard.paths.append(path)
+        shard.bytes += size
+    return [shard for shard in shards if shard.paths]
+
+
+def project_shards(local_path: str, min_bytes: Optional[int] = None) -> Optional[List[Shard]]:
+    """
+    One shard per top-level project directory (one with a build or dependency manifest).
+    None when the repository root is a project itself or has source files outside those
+    directories, since analysing it in parts could miss flows between the parts.
+    """
+    projects = []
+    for name in sorted(os.listdir(local_path)):
+        path = os.path.join(local_path, name)
+        if name in PROJECT_FILES:
+            return None
+        if name.startswith("."):
+            continue
+        if os.path.isdir(path):
+            if PROJECT_FILES & set(os.listdir(path)):
+                projects.append(Shard([name], _tree_size(path)))
+            elif _has_sources(path):
+                return None
+        elif name.endswith(SOURCE_EXTENSIONS):
+            return None
+    min_bytes = DEFAULT_MIN_BYTES if min_bytes is None else min_bytes
+    if len(projects) < 2 or sum(shard.bytes for shard in projects) < min_bytes:
+        return None
+    return projects
+
+
+def rebase(findings: List[Finding], prefix: str) -> List[Finding]:
+    """Findings of a scan run inside the sub-directory `prefix`, made relative to the repository root."""
+    rebased = []
+    for f in findings:
+        file = f"{prefix.rstrip('/')}/{f.file}"
+        # Fingerprints derived from the location follow the file; scanner-specific ones are kept
+        derived = f.fingerprint == fingerprint(f.tool, f.rule, f.file, f.line)
+        rebased.append(Finding(**dict(f.to_dict(secrets=True), file=file, fingerprint="" if derived else f.fingerprint)))
+    return rebased
+
+
+def run_sharded(shards: Sequence[T], scan: Callable[[T], List[Finding]], workers: Optional[int] = None) -> List[Finding]:
+    """Run `scan` on every shard, at most `workers` at a time, and merge the results into one deduplicated list."""
+    workers = max(1, min(workers or shard_workers(), len(shards)))
+    if len(shards) > 1:
+        logger.info(f"Scanning {len(shards)} shards with {workers} workers")
+    findings: List[Finding] = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(scan, shard) for shard in shards]
+        for future in as_completed(futures):
+            findings.extend(future.result())
+    return rank(dedupe(findings))
@@ -1,8 +1,10 @@
 from crewai.tools import BaseTool
-from typing import Type
+from typing import List, Optional, Type
 from pydantic import BaseModel, Field
-import subprocess
-import os
+
+from appsec_agents.incremental import IncrementalScan, incremental_disabled, render
+from appsec_agents.pattern_engine import PatternEngine
+from appsec_agents.tracing import traced_tool
 
 
 class CodePatternMatcherInput(BaseModel):
@@ -10,6 +12,8 @@ class CodePatternMatcherInput(BaseModel):
                             description="Path to the locally cloned repository.")
     pattern: str = Field(...,
                          description="Regex pattern to search for in the codebase.")
+    patterns: Optional[List[str]] = Field(default=None,
+                                          description="Additional regex patterns searched in the same pass.")
 
 
 class CodePatternMatcherTool(BaseTool):
@@ -19,19 +23,35 @@ class CodePatternMatcherTool(BaseTool):
         "Useful for identifying insecure code practices."
     )
     args_schema: Type[BaseModel] = CodePatternMatcherInput
+    incremental: bool = not incremental_disabled()
+    max_results: int = 1000
 
-    def _run(self, local_path: str, pattern: str) -> str:
+    @traced_tool
+    def _run(self, local_path: str, pattern: str, patterns: Optional[List[str]] = None) -> str:
         try:
-            result = subprocess.run(
-                ["grep", "-r", pattern, local_path],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-
-            if result.returncode == 0:
-                return f"Pattern matching completed successfully:\n{result.stdout}"
-            else:
-                return f"No matches found for the pattern '{pattern}' or an error occurred:\n{result.stderr}"
+            all_patterns = [pattern, *(patterns or [])]
+            engine = PatternEngine(all_patterns)
+
+            # Only search the files changed since the last scan of this pattern batch
+            scan = IncrementalScan.for_repo(self.name, local_path, args=all_patterns) if self.incremental else None
+            paths = scan.changed_paths() if scan and not scan.full else None
+
+            results = {}
+            for match in engine.scan(local_path, paths=paths):
+                results.setdefault(match.file, []).append(match.format())
+            if scan:
+                results = scan.merge(results)
+                scan.save(results)
+
+            lines = render(results).splitlines()
+            if not lines:
+                return f"No matches found for the pattern '{pattern}' or an error occurred:\n"
+
+            header = ""
+            if len(all_patterns) > 1:
+                header = "".join(f"[{i}] {p}\n" for i, p in enumerate(all_patterns))
+            if len(lines) > self.max_results:
+                lines = lines[:self.max_results] + [f"... {len(lines) - self.max_results} more matches not shown"]
+            return f"Pattern matching completed successfully:\n{header}" + "\n".join(lines)
         except Exception as e:
             return f"Error running pattern matcher: {str(e)}"
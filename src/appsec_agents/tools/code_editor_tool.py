@@ -1,22 +1,45 @@
 from crewai.tools import BaseTool
-from typing import Type
+from typing import List, Optional, Type
 from pydantic import BaseModel, Field
 import os
 
+from appsec_agents.patch_engine import (BackupStore, ByteEdit, LineEdit, PatchError, apply_patch,
+                                        parse_unified_diff, replace_all, sha256_file)
+from appsec_agents.pull_requests import ChangeTracker
+from appsec_agents.tracing import traced_tool
+
+
+class EditSpec(BaseModel):
+    """One structured edit: a line range or a byte range and its replacement text."""
+    start_line: Optional[int] = Field(default=None, description="First line to replace (1-based).")
+    end_line: Optional[int] = Field(default=None, description="Last line to replace; start_line - 1 inserts before start_line.")
+    offset: Optional[int] = Field(default=None, description="Byte offset of the range to replace.")
+    length: Optional[int] = Field(default=None, description="Number of bytes to replace at offset.")
+    text: str = Field(default="", description="Replacement text; empty deletes the range.")
+
+
 class CodeEditorToolInput(BaseModel):
     """Input schema for CodeEditorTool."""
     file_path: str = Field(..., description="Path to the file that needs to be edited.")
-    edit_instructions: str = Field(..., description="Instructions for the changes to be made in the file.")
+    edit_instructions: str = Field(default="", description="Simple instruction of the form: Replace 'old' with 'new'.")
+    edits: Optional[List[EditSpec]] = Field(default=None, description="Line or byte range edits, applied together. "
+                                                                       "Positions refer to the file before any edit.")
+    diff: Optional[str] = Field(default=None, description="Unified diff hunks to apply to the file.")
+    expected_sha256: Optional[str] = Field(default=None, description="SHA-256 the file must have for the edits to apply.")
     backup_file: bool = Field(default=True, description="Whether to create a backup of the file before editing.")
 
+
 class CodeEditorTool(BaseTool):
     name: str = "Code Editor Tool"
     description: str = (
-        "Allows the agent to programmatically modify a source code file based on provided instructions."
+        "Allows the agent to programmatically modify a source code file, either with a batch of line/byte range "
+        "edits, a unified diff or a Replace 'old' with 'new' instruction. All edits are applied at once."
     )
     args_schema: Type[BaseModel] = CodeEditorToolInput
 
-    def _run(self, file_path: str, edit_instructions: str, backup_file: bool = True) -> str:
+    @traced_tool
+    def _run(self, file_path: str, edit_instructions: str = "", edits: Optional[List[EditSpec]] = None,
+             diff: Optional[str] = None, expected_sha256: Optional[str] = None, backup_file: bool = True) -> str:
         """
         Edits the specified file based on the given instructions.
         """
@@ -25,45 +48,47 @@ class CodeEditorTool(BaseTool):
             if not os.path.exists(file_path):
                 return f"Error: File not found at path {file_path}"
 
-            # Read the original file content
-            with open(file_path, 'r') as f:
-                original_content = f.read()
+            backup = BackupStore.default() if backup_file else None
+            batch = self._build_edits(edits or [], diff)
+            if batch:
+                result = apply_patch(file_path, batch, expected_sha256=expected_sha256, backup=backup)
+            elif edit_instructions.lower().startswith("replace"):
+                # Parse the "replace" instructions (e.g., "Replace 'foo' with 'bar'")
+                try:
+                    _, target, _, replacement = edit_instructions.split("'")
+                except ValueError:
+                    return "Error while editing the file: Invalid replace instruction format. Use: Replace 'old' with 'new'."
+                result = replace_all(file_path, target, replacement, expected_sha256=expected_sha256, backup=backup)
+                if result is None:
+                    return f"No changes made: '{target}' was not found in {file_path}."
+            else:
+                return ("Error while editing the file: provide `edits`, a unified `diff` or an instruction "
+                        "of the form Replace 'old' with 'new'.")
 
-            # Optionally back up the original file
-            if backup_file:
-                backup_path = file_path + ".bak"
-                with open(backup_path, 'w') as backup:
-                    backup.write(original_content)
-                backup_status = f"Backup created at {backup_path}."
+            ChangeTracker.default().record([file_path], f"Edit {os.path.basename(file_path)}")
+            if result.backup:
+                backup_status = f"Backup stored as {result.backup} in {backup.root}."
             else:
                 backup_status = "No backup was created."
+            return (f"File successfully modified: {file_path}. {result.edits} edits applied, "
+                    f"new SHA-256 {result.new_sha256}. {backup_status}")
 
-            # Process the edit instructions (example using a simple pattern replacement)
-            # In real scenarios, this might involve LLM APIs or custom parsers to modify code
-            modified_content = self._apply_edits(original_content, edit_instructions)
-
-            # Write the modified content back to the file
-            with open(file_path, 'w') as f:
-                f.write(modified_content)
-
-            return f"File successfully modified: {file_path}. {backup_status}"
-
+        except PatchError as e:
+            return f"Error while editing the file: {e} Current SHA-256: {sha256_file(file_path)}"
         except Exception as e:
             return f"Error while editing the file: {e}"
 
-    def _apply_edits(self, content: str, instructions: str) -> str:
-        """
-        Simulates applying edits to the content based on instructions.
-        You can replace this with advanced parsing logic or integrate LLM-based processing.
-        """
-        # Example: Simple string replacement for demonstration purposes
-        if "replace" in instructions.lower():
-            # Parse the "replace" instructions (e.g., "Replace 'foo' with 'bar'")
-            try:
-                _, target, _, replacement = instructions.split("'")
-                return content.replace(target, replacement)
-            except ValueError:
-                raise ValueError("Invalid replace instruction format. Use: Replace 'old' with 'new'.")
-        else:
-            # Handle other types of instructions
-            return f"# TODO: Apply edits based on these instructions: {instructions}\n" + content
+    @staticmethod
+    def _build_edits(edits: List[EditSpec], diff: Optional[str]) -> list:
+        batch = []
+        for edit in edits:
+            if edit.start_line is not None:
+                end_line = edit.end_line if edit.end_line is not None else edit.start_line
+                batch.append(LineEdit(edit.start_line, end_line, edit.text))
+            elif edit.offset is not None:
+                batch.append(ByteEdit(edit.offset, edit.length or 0, edit.text))
+            else:
+                raise PatchError("Each edit needs start_line or offset.")
+        if diff:
+            batch.extend(parse_unified_diff(diff))
+        return batch
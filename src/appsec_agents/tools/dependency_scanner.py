@@ -2,12 +2,12 @@ import os
 from crewai.tools import BaseTool
 from typing import Type
 from pydantic import BaseModel, Field
-import subprocess
-from dotenv import load_dotenv
 
-# Get the Snyk organization from the environment variable
-load_dotenv()
-snyk_org = os.getenv("SNYK_ORG")
+from appsec_agents.dependencies import DEFAULT_WORKERS, ManifestScanner, get_backend
+from appsec_agents.digest import digest
+from appsec_agents.findings import FindingsStore
+from appsec_agents.scan_cache import ScanResultCache, cache_disabled
+from appsec_agents.tracing import traced_tool
 
 
 class DependencyVulnScanInput(BaseModel):
@@ -18,34 +18,35 @@ class DependencyVulnScanInput(BaseModel):
 class DependencyVulnScanTool(BaseTool):
     name: str = "Dependency Vulnerability Scanner"
     description: str = (
-        "Scans the dependencies in a cloned repository for known vulnerabilities using Snyk."
+        "Scans the dependencies in a cloned repository for known vulnerabilities using Snyk or an offline OSV database."
     )
     args_schema: Type[BaseModel] = DependencyVulnScanInput
+    use_cache: bool = not cache_disabled()
+    workers: int = int(os.getenv("DEPENDENCY_SCAN_WORKERS") or DEFAULT_WORKERS)
 
+    @traced_tool
     def _run(self, local_path: str) -> str:
         """
-        Run the Snyk CLI tool to scan the repository for vulnerabilities.
+        Scan each dependency manifest of the repository, reusing cached results for
+        manifests whose content was already scanned (in this or any other repository).
         """
         try:
-            # Change to the repository directory
-            command = ["snyk", "test",
-                       f"--org={snyk_org}", "--all-projects", "--json"]
-            result = subprocess.run(
-                command,
-                cwd=local_path,  # Set working directory to the repo path
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
+            scanner = ManifestScanner(
+                get_backend(), cache=ScanResultCache.default() if self.use_cache else None, workers=self.workers)
+            result = scanner.scan(local_path)
+            if not result.manifests:
+                return "Dependency scan completed successfully:\nNo dependency manifests found."
 
-            if result.returncode == 0:
-                return f"Snyk scan completed successfully:\n{result.stdout}"
-            else:
-                return f"Snyk scan failed with errors:\n{result.stderr}"
+            FindingsStore.default().add(local_path, result.findings)
+            output = f"Dependency scan completed successfully:\n{digest(result.findings, 'dependencies', root=local_path)}"
+            if result.errors:
+                output += "\nManifests that could not be scanned:\n" + "\n".join(
+                    f"- {path}: {error}" for path, error in sorted(result.errors.items()))
+            return output
         except FileNotFoundError:
             return (
                 "Snyk CLI tool not found. Ensure it is installed and added to the system PATH. "
                 "Refer to https://snyk.io/ for installation instructions."
             )
         except Exception as e:
-            return f"Error running Snyk scanner: {str(e)}"
+            return f"Error running dependency scanner: {str(e)}"
@@ -1,11 +1,15 @@
 from crewai.tools import BaseTool
-from typing import Type
+from typing import Optional, Type
 from pydantic import BaseModel, Field
 from git import Repo, GitCommandError
 import os
 import shutil
 import logging
 
+from appsec_agents.repo_cache import RepoMirrorCache
+from appsec_agents.tracing import traced_tool
+from appsec_agents.workspaces import WorkspaceManager
+
 # Set up logging
 logger = logging.getLogger(__name__)
 
@@ -16,6 +20,12 @@ class CloneGitHubRepoInput(BaseModel):
                           description="The URL of the GitHub repository to clone.")
     local_path: str = Field(...,
                             description="The local directory to clone the repository into.")
+    depth: Optional[int] = Field(default=None,
+                                 description="Create a shallow clone with this many commits. Leave empty to keep the full history.")
+    partial_clone: bool = Field(default=False,
+                                description="Create a blobless partial clone; file contents are fetched on demand.")
+    ref: Optional[str] = Field(default=None,
+                               description="Commit, branch or tag to check out after cloning. Leave empty for the default branch.")
 
 
 class CloneGitHubRepoTool(BaseTool):
@@ -25,9 +35,29 @@ class CloneGitHubRepoTool(BaseTool):
         "Provide the repository URL and the local_path folder."
     )
     args_schema: Type[BaseModel] = CloneGitHubRepoInput
+    use_cache: bool = os.getenv("REPO_CACHE_DISABLED", "").lower() not in ("1", "true", "yes")
+    cache_dir: Optional[str] = None
 
-    def _run(self, repo_url: str, local_path: str) -> str:
+    @traced_tool
+    def _run(self, repo_url: str, local_path: str, depth: Optional[int] = None,
+             partial_clone: bool = False, ref: Optional[str] = None) -> str:
         try:
+            workspace = WorkspaceManager.managed(local_path)
+            if workspace is not None and workspace.repo_url == repo_url:
+                # Already checked out from the shared mirror by the workspace manager; never delete it
+                self._checkout_ref(Repo(local_path), ref, depth)
+                logger.info(f"Using managed workspace {local_path} for {repo_url}")
+                return f"Repository successfully cloned to {local_path}."
+
+            if self.use_cache:
+                # Update the local mirror incrementally and clone the workspace from it
+                logger.info(f"Cloning repository from {repo_url} to {local_path} via mirror cache")
+                repo = RepoMirrorCache(self.cache_dir).checkout(
+                    repo_url, local_path, depth=depth, partial=partial_clone)
+                self._checkout_ref(repo, ref, depth)
+                logger.info(f"Repository successfully cloned to {local_path}")
+                return f"Repository successfully cloned to {local_path}."
+
             # Check if the directory exists and remove it if necessary
             if os.path.exists(local_path):
                 logger.info(f"Removing existing directory at {local_path}")
@@ -35,7 +65,13 @@ class CloneGitHubRepoTool(BaseTool):
 
             # Clone the repository
             logger.info(f"Cloning repository from {repo_url} to {local_path}")
-            Repo.clone_from(repo_url, local_path)
+            options = {}
+            if depth:
+                options.update(depth=depth, no_single_branch=True)
+            if partial_clone:
+                options["filter"] = "blob:none"
+            repo = Repo.clone_from(repo_url, local_path, **options)
+            self._checkout_ref(repo, ref, depth)
             logger.info(f"Repository successfully cloned to {local_path}")
             return f"Repository successfully cloned to {local_path}."
         except GitCommandError as e:
@@ -45,6 +81,18 @@ class CloneGitHubRepoTool(BaseTool):
             logger.error(f"An unexpected error occurred: {e}")
             return f"An error occurred while cloning the repository: {e}"
 
+    @staticmethod
+    def _checkout_ref(repo: Repo, ref: Optional[str], depth: Optional[int]) -> None:
+        if not ref or ref == "HEAD":
+            return
+        try:
+            repo.git.checkout(ref)
+        except GitCommandError:
+            # A shallow clone may not contain the commit yet
+            repo.git.fetch("origin", ref, **({"depth": depth} if depth else {}))
+            repo.git.checkout("FETCH_HEAD")
+        logger.info(f"Checked out {ref} in {repo.working_tree_dir}")
+
 
 # Example usage
 if __name__ == "__main__":
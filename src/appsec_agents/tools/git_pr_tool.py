@@ -1,8 +1,10 @@
 from crewai.tools import BaseTool
-from typing import Type
+from typing import List, Optional, Type
 from pydantic import BaseModel, Field
 import subprocess
-import os
+
+from appsec_agents.pull_requests import PullRequestPublisher
+from appsec_agents.tracing import traced_tool
 
 class GitPRToolInput(BaseModel):
     """Input schema for creating a pull request."""
@@ -11,44 +13,27 @@ class GitPRToolInput(BaseModel):
     commit_message: str = Field(..., description="Commit message for the changes.")
     pr_title: str = Field(..., description="Title for the pull request.")
     pr_description: str = Field(..., description="Description of the pull request.")
+    paths: Optional[List[str]] = Field(
+        default=None,
+        description="Repository-relative files to commit in addition to those changed by the remediation tools.")
 
 class GitPRTool(BaseTool):
     name: str = "Git Pull Request Tool"
     description: str = (
-        "Creates a new Git branch, commits changes, pushes the branch, and creates a pull request."
+        "Commits the files changed by the remediation tools to a new branch, pushes it and creates a pull request. "
+        "Calling it again with the same branch adds the new fixes to the existing pull request."
     )
     args_schema: Type[BaseModel] = GitPRToolInput
 
-    def _run(self, repository_path: str, branch_name: str, commit_message: str, pr_title: str, pr_description: str) -> str:
+    @traced_tool
+    def _run(self, repository_path: str, branch_name: str, commit_message: str, pr_title: str, pr_description: str,
+             paths: Optional[List[str]] = None) -> str:
         try:
-            # Navigate to the repository path
-            os.chdir(repository_path)
-            
-            # Create and checkout a new branch
-            subprocess.run(["git", "checkout", "-b", branch_name], check=True)
-
-            # Stage all changes
-            subprocess.run(["git", "add", "."], check=True)
-
-            # Commit the changes
-            subprocess.run(["git", "commit", "-m", commit_message], check=True)
-
-            # Push the branch
-            subprocess.run(["git", "push", "--set-upstream", "origin", branch_name], check=True)
-
-            # Assuming a GitHub CLI (gh) is installed to create a pull request
-            pr_output = subprocess.run(
-                [
-                    "gh", "pr", "create",
-                    "--title", pr_title,
-                    "--body", pr_description
-                ],
-                check=True,
-                capture_output=True,
-                text=True
-            )
-
-            return pr_output.stdout.strip()  # Returns the PR URL
+            # Returns the PR URL
+            return PullRequestPublisher.default().publish(
+                repository_path, branch_name, commit_message, pr_title, pr_description, paths or [])
 
         except subprocess.CalledProcessError as e:
             return f"Error while creating pull request: {e}"
+        except ValueError as e:
+            return f"Error while creating pull request: {e}"
@@ -1,9 +1,46 @@
 from crewai.tools import BaseTool
-from typing import Type
+from typing import List, Optional, Type
 from pydantic import BaseModel, Field
-import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import hashlib
+import logging
+import tempfile
 import os
 
+from appsec_agents.digest import digest
+from appsec_agents.findings import (Finding, FindingsStore, ScanError, findings_from_json, findings_to_json,
+                                    group_by_file, parse_sarif_file, ungroup)
+from appsec_agents.incremental import IncrementalScan, incremental_disabled, repo_key
+from appsec_agents.java_sources import SourceRoot, discover_source_roots, plan_shards
+from appsec_agents.runner import run_command, timeout_for
+from appsec_agents.scan_cache import ScanResultCache, cache_disabled
+from appsec_agents.tracing import traced_tool
+
+logger = logging.getLogger(__name__)
+
+PMD_RULESETS = (
+    "category/java/errorprone.xml,category/java/bestpractices.xml,"
+    "category/java/security.xml,category/java/performance.xml"
+)
+DEFAULT_PMD_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "appsec_agents", "pmd")
+
+
+def pmd_command(sources: List[str], cache_file: Optional[str] = None) -> List[str]:
+    """`pmd check` with the project rulesets and SARIF output for the given source arguments."""
+    command = ["pmd", "check", "-f", "sarif", "-R", PMD_RULESETS, *sources]
+    return command + (["--cache", cache_file] if cache_file else ["--no-cache"])
+
+
+def pmd_cache_file(local_path: str, shard: int) -> str:
+    """
+    PMD's own incremental analysis cache for one shard of a repository. It lives outside
+    the workspace, keyed by the repository remote, so it survives re-cloning.
+    """
+    cache_dir = os.getenv("PMD_CACHE_DIR") or DEFAULT_PMD_CACHE_DIR
+    digest = hashlib.sha256(repo_key(local_path).encode("utf-8")).hexdigest()[:16]
+    os.makedirs(os.path.join(cache_dir, digest), exist_ok=True)
+    return os.path.join(cache_dir, digest, f"shard-{shard}.cache")
+
 
 class PMDStaticCodeAnalysisInput(BaseModel):
     local_path: str = Field(...,
@@ -16,32 +53,95 @@ class PMDStaticCodeAnalysisTool(BaseTool):
         "Runs a static analysis of the code using PMD and provides input on best practices, security, error prone code and performance."
     )
     args_schema: Type[BaseModel] = PMDStaticCodeAnalysisInput
+    use_cache: bool = not cache_disabled()
+    incremental: bool = not incremental_disabled()
+    max_shards: int = int(os.getenv("PMD_SHARDS") or min(4, os.cpu_count() or 1))
+    files_per_shard: Optional[int] = int(os.getenv("PMD_FILES_PER_SHARD") or 0) or None
 
+    @traced_tool
     def _run(self, local_path: str) -> str:
         try:
-            command = f"pmd check -f text -R category/java/errorprone.xml,category/java/bestpractices.xml,category/java/security.xml,category/java/performance.xml  -d {
-                local_path}/src/main/java -r report.txt --no-cache"
+            roots = discover_source_roots(local_path)
+            if not roots:
+                return "Static analysis completed successfully:\nNo Java sources found."
+            logger.info(f"PMD source roots: {', '.join(f'{r.path} ({r.files} files)' for r in roots)}")
+
+            cache = ScanResultCache.default()
+            cache_key = cache.key(self.name, local_path, "pmd", pmd_command([r.path for r in roots])) \
+                if self.use_cache else None
+            cached = cache.get_result(cache_key, local_path)
+            if cached is not None:
+                findings = findings_from_json(cached)
+            else:
+                findings = self._analyse(local_path, roots)
+                cache.put_result(cache_key, findings_to_json(findings), local_path)
 
-            result = subprocess.run(command, cwd=local_path, stdout=subprocess.PIPE,
-                                    stderr=subprocess.PIPE, text=True, shell=True)
+            FindingsStore.default().add(local_path, findings)
+            return f"Static analysis completed successfully:\n{digest(findings, 'pmd', root=local_path)}"
+        except ScanError as e:
+            return str(e)
+        except Exception as e:
+            return f"Error running static code analysis: {str(e)}"
 
-            # Read the report file content
+    def _analyse(self, local_path: str, roots: List[SourceRoot]) -> List[Finding]:
+        # Only analyse the Java sources changed since the last scanned commit
+        scan = IncrementalScan.for_repo(self.name, local_path, args=[PMD_RULESETS, "sarif"]) if self.incremental else None
+        if scan and not scan.full:
+            prefixes = tuple("" if r.path == "." else r.path + "/" for r in roots)
+            targets = [path for path in scan.changed_paths(suffixes=(".java",))
+                       if scan.relative(path).startswith(prefixes)]
+            if not targets:
+                results = scan.merge({})
+                scan.save(results)
+                return ungroup(results)
+            with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as f:
+                f.write("\n".join(targets))
+                file_list = f.name
             try:
-                with open(os.path.join(local_path, "report.txt"), "r") as report_file:
-                    report_content = report_file.read()
+                findings = self._run_pmd(local_path, pmd_command(["--file-list", file_list]))
+            finally:
+                os.remove(file_list)
+        else:
+            findings = self._run_shards(local_path, roots)
 
-                # Delete the report file
-                os.remove(os.path.join(local_path, "report.txt"))
+        if scan:
+            results = scan.merge(group_by_file(findings))
+            scan.save(results)
+            findings = ungroup(results)
+        return findings
 
-                # Add report content to result stdout
-                result.stdout = report_content
-            except FileNotFoundError:
-                # If report file wasn't created, continue without modification
-                pass
+    def _run_shards(self, local_path: str, roots: List[SourceRoot]) -> List[Finding]:
+        """Analyse the modules in parallel PMD runs, merging each report as soon as it is written."""
+        shards = plan_shards(roots, self.max_shards, self.files_per_shard)
+        commands = [
+            pmd_command(["-d", ",".join(r.path for r in shard.roots)],
+                        pmd_cache_file(local_path, index) if self.use_cache else None)
+            for index, shard in enumerate(shards)
+        ]
+        if len(shards) > 1:
+            logger.info(f"Running PMD in {len(shards)} shards: {[shard.files for shard in shards]} files")
+        findings: List[Finding] = []
+        with ThreadPoolExecutor(max_workers=len(commands)) as pool:
+            futures = [pool.submit(self._run_pmd, local_path, command) for command in commands]
+            for future in as_completed(futures):
+                findings.extend(future.result())
+        return findings
 
-            if result.stderr == '':  # result.returncode is returning as 4 but the command is running fine
-                return f"Static analysis completed successfully:\n{result.stdout}"
-            else:
-                return f"Static analysis failed:\n{result.stderr}"
-        except Exception as e:
-            return f"Error running static code analysis: {str(e)}"
+    def _run_pmd(self, local_path: str, command: List[str]) -> List[Finding]:
+        # Keep the report outside the checkout so it never shows up as a change
+        fd, report_path = tempfile.mkstemp(suffix=".sarif")
+        os.close(fd)
+        try:
+            # Source paths are relative to the checkout so the analysis cache stays valid for new clones
+            result = run_command(command + ["-r", report_path], cwd=local_path, timeout=timeout_for("pmd", 1800))
+            try:
+                if result.timed_out:
+                    raise ScanError(f"Static analysis timed out after {result.duration:.0f} seconds.")
+                # PMD exits with 4 when violations were found, which is still a successful run
+                if result.returncode not in (0, 4):
+                    raise ScanError(f"Static analysis failed:\n{result.stderr}")
+            finally:
+                result.cleanup()
+            return parse_sarif_file(report_path, "pmd", root=local_path)
+        finally:
+            os.remove(report_path)
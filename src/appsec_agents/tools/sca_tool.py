@@ -1,13 +1,15 @@
 from crewai.tools import BaseTool
-from typing import Type
+from typing import List, Type
 from pydantic import BaseModel, Field
-import subprocess
 import os
-from dotenv import load_dotenv
 
-# Get the Snyk organization from the environment variable
-load_dotenv()
-snyk_org = os.getenv("SNYK_ORG")
+from appsec_agents.digest import digest
+from appsec_agents.findings import (Finding, FindingsStore, ScanError, findings_from_json, findings_to_json,
+                                    parse_sarif)
+from appsec_agents.runner import run_command, timeout_for
+from appsec_agents.scan_cache import ScanResultCache, cache_disabled
+from appsec_agents.sharding import DEFAULT_MIN_BYTES, project_shards, rebase, run_sharded
+from appsec_agents.tracing import traced_tool
 
 
 class StaticCodeAnalysisInput(BaseModel):
@@ -22,18 +24,47 @@ class StaticCodeAnalysisTool(BaseTool):
         "potential security vulnerabilities in the codebase."
     )
     args_schema: Type[BaseModel] = StaticCodeAnalysisInput
+    use_cache: bool = not cache_disabled()
+    shard_min_bytes: int = int(os.getenv("SHARD_MIN_BYTES") or DEFAULT_MIN_BYTES)
 
+    @traced_tool
     def _run(self, local_path: str) -> str:
         try:
             # Use Snyk for SCA
-            command = f"snyk code test --org={snyk_org} --all-projects"
+            command = ["snyk", "code", "test", f"--org={os.getenv('SNYK_ORG')}", "--all-projects", "--json"]
 
-            result = subprocess.run(command, cwd=local_path, stdout=subprocess.PIPE,
-                                    stderr=subprocess.PIPE, text=True, shell=True)
-
-            if result.stderr == '':  # result.returncode is returning as 1 but the command is running fine
-                return f"Static analysis completed successfully:\n{result.stdout}"
+            cache = ScanResultCache.default()
+            cache_key = cache.key(self.name, local_path, "snyk", command) if self.use_cache else None
+            cached = cache.get_result(cache_key, local_path)
+            if cached is not None:
+                findings = findings_from_json(cached)
             else:
-                return f"Static analysis failed:\n{result.stderr}"
+                # Independent top-level projects of a large monorepo are analysed in parallel
+                shards = project_shards(local_path, self.shard_min_bytes)
+                if shards:
+                    findings = run_sharded(shards, lambda shard: rebase(
+                        self._analyse(os.path.join(local_path, shard.paths[0]), command), shard.paths[0]))
+                else:
+                    findings = self._analyse(local_path, command)
+                cache.put_result(cache_key, findings_to_json(findings), local_path)
+
+            FindingsStore.default().add(local_path, findings)
+            return f"Static analysis completed successfully:\n{digest(findings, 'snyk-code', root=local_path)}"
+        except ScanError as e:
+            return str(e)
         except Exception as e:
             return f"Error running static code analysis: {str(e)}"
+
+    def _analyse(self, path: str, command: List[str]) -> List[Finding]:
+        """Findings of `command` run in `path`, with files relative to `path`."""
+        result = run_command(command, cwd=path, timeout=timeout_for("snyk", 1800))
+        try:
+            if result.timed_out:
+                raise ScanError(f"Static analysis timed out after {result.duration:.0f} seconds.")
+            # Snyk exits with 1 when issues were found, which is still a successful run
+            if result.returncode not in (0, 1):
+                raise ScanError(f"Static analysis failed:\n{result.stderr}")
+            with result.open_stdout() as output:
+                return parse_sarif(output, "snyk-code", root=path)
+        finally:
+            result.cleanup()
@@ -0,0 +1,99 @@
+import logging
+import os
+from collections import defaultdict
+from crewai.tools import BaseTool
+from typing import List, Optional, Type
+from pydantic import BaseModel, Field
+
+from appsec_agents.findings import FindingsStore
+from appsec_agents.patch_engine import BackupStore
+from appsec_agents.pull_requests import ChangeTracker
+from appsec_agents.secret_remediation import DEFAULT_WINDOW, WindowEdit, apply_window_edits, remediate_file
+from appsec_agents.tracing import traced_tool
+
+logger = logging.getLogger(__name__)
+
+
+class WindowReplacement(BaseModel):
+    file: str = Field(..., description="File of the window, exactly as returned by this tool.")
+    start: int = Field(..., description="First line of the window.")
+    end: int = Field(..., description="Last line of the window.")
+    window: str = Field(..., description="Window id returned by this tool.")
+    replacement: str = Field(..., description="New text for lines start to end, without line numbers.")
+
+
+class SecretRemediationInput(BaseModel):
+    local_path: str = Field(...,
+                            description="Path to the locally cloned repository.")
+    edits: Optional[List[WindowReplacement]] = Field(
+        default=None,
+        description="Replacements for the windows returned by a previous call. Leave empty on the first call.")
+
+
+class SecretRemediationTool(BaseTool):
+    name: str = "Secret Remediation Tool"
+    description: str = (
+        "Remediates the hardcoded secrets found by the secret detection task. Common cases are fixed directly by "
+        "replacing the secret with an environment variable lookup; the remaining ones are returned as small "
+        "numbered line windows. Call it again with `edits` holding the replacement text for those windows."
+    )
+    args_schema: Type[BaseModel] = SecretRemediationInput
+    window: int = int(os.getenv("REMEDIATION_WINDOW") or DEFAULT_WINDOW)
+
+    @traced_tool
+    def _run(self, local_path: str, edits: Optional[List[WindowReplacement]] = None) -> str:
+        try:
+            if edits:
+                return self._apply(local_path, edits)
+            return self._remediate(local_path)
+        except Exception as e:
+            return f"Error while remediating secrets: {e}"
+
+    def _remediate(self, local_path: str) -> str:
+        by_file = defaultdict(list)
+        for finding in FindingsStore.default().get(local_path, category="secret"):
+            by_file[finding.file].append(finding)
+        if not by_file:
+            return "No secret findings to remediate."
+
+        fixes, windows, errors = [], [], []
+        for rel_path, findings in sorted(by_file.items()):
+            try:
+                result = remediate_file(local_path, rel_path, findings, window=self.window,
+                                        backup=BackupStore.default())
+            except (OSError, UnicodeDecodeError) as e:
+                errors.append(f"- {rel_path}: {e}")
+                continue
+            fixes.extend(result.fixes)
+            windows.extend(result.windows)
+            if result.written:
+                ChangeTracker.default().record([os.path.join(local_path, rel_path)],
+                                               f"Read {len(result.fixes)} secrets of {rel_path} from the environment")
+
+        window_chars = sum(len(w.text) for w in windows)
+        logger.info(f"Secret remediation of {local_path}: {len(by_file)} files, {len(fixes)} fixed directly, "
+                    f"{len(windows)} windows ({window_chars} characters) for review")
+
+        sections = []
+        if fixes:
+            sections.append(f"Fixed {len(fixes)} secrets by reading them from environment variables:\n" + "\n".join(
+                f"- {os.path.join(local_path, fix.file)}:{fix.line} ({fix.rule}) -> {fix.env_var}" for fix in fixes))
+            sections.append("Environment variables to provision: " + ", ".join(sorted({f.env_var for f in fixes})))
+        if windows:
+            sections.append(
+                f"{len(windows)} secrets need a manual fix. For each window below, rewrite the lines so the secret is "
+                "read from an environment variable or configuration instead of the literal, keeping everything else "
+                "unchanged. Then call this tool once with all replacements in `edits`.\n\n"
+                + "\n\n".join(window.format() for window in windows))
+        if errors:
+            sections.append("Files that could not be remediated:\n" + "\n".join(errors))
+        return "\n\n".join(sections)
+
+    def _apply(self, local_path: str, edits: List[WindowReplacement]) -> str:
+        status = apply_window_edits(local_path, [
+            WindowEdit(e.file, e.start, e.end, e.window, e.replacement) for e in edits
+        ], backup=BackupStore.default())
+        applied = {e.file for e in edits if status.get(e.window) == "applied"}
+        for rel_path in sorted(applied):
+            ChangeTracker.default().record([os.path.join(local_path, rel_path)], f"Remediate secrets in {rel_path}")
+        return "Window edits:\n" + "\n".join(f"- {window}: {message}" for window, message in status.items())
@@ -1,8 +1,24 @@
+import logging
+import os
 from crewai.tools import BaseTool
-from typing import Type
+from typing import List, Type
 from pydantic import BaseModel, Field
-import subprocess
-import os
+
+from appsec_agents.digest import digest
+from appsec_agents.findings import (Finding, FindingsStore, ScanError, findings_from_json, findings_to_json,
+                                    group_by_file, parse_trufflehog, ungroup)
+from appsec_agents.history_scan import HistorySecretScan, history_scan_enabled
+from appsec_agents.incremental import IncrementalScan, incremental_disabled
+from appsec_agents.runner import run_command, timeout_for
+from appsec_agents.scan_cache import ScanResultCache, cache_disabled
+from appsec_agents.secret_prefilter import PREFILTER_VERSION, prefilter, prefilter_enabled
+from appsec_agents.sharding import DEFAULT_MIN_BYTES, file_shards, run_sharded, shard_workers, size_shards
+from appsec_agents.tracing import traced_tool
+
+logger = logging.getLogger(__name__)
+
+# Number of changed files handed to a single trufflehog invocation
+FILES_PER_INVOCATION = 200
 
 
 class SecretDetectionInput(BaseModel):
@@ -17,21 +33,84 @@ class SecretDetectionTool(BaseTool):
         "using tools like truffleHog or git-secrets."
     )
     args_schema: Type[BaseModel] = SecretDetectionInput
+    use_cache: bool = not cache_disabled()
+    incremental: bool = not incremental_disabled()
+    shard_min_bytes: int = int(os.getenv("SHARD_MIN_BYTES") or DEFAULT_MIN_BYTES)
+    use_prefilter: bool = prefilter_enabled()
+    history: bool = history_scan_enabled()
 
+    @traced_tool
     def _run(self, local_path: str) -> str:
         try:
-            # Example: Using truffleHog
-            result = subprocess.run(
-                ["trufflehog", "filesystem", local_path],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                encoding="utf-8"
-            )
-
-            if result.returncode == 0:
-                return f"Secret detection completed successfully:\n{result.stdout}"
+            command = ["trufflehog", "filesystem", local_path, "--json"]
+
+            cache = ScanResultCache.default()
+            key_args = [command, PREFILTER_VERSION] if self.use_prefilter else command
+            cache_key = cache.key(self.name, local_path, "trufflehog", key_args) if self.use_cache else None
+            cached = cache.get_result(cache_key, local_path)
+            if cached is not None:
+                findings = findings_from_json(cached)
             else:
-                return f"Secret detection failed:\n{result.stderr}"
+                findings = self._scan(local_path, command)
+                cache.put_result(cache_key, findings_to_json(findings), local_path)
+            if self.history:
+                # Kept outside the result cache, the history scan remembers the blobs it has seen itself
+                findings = findings + HistorySecretScan(local_path, use_prefilter=self.use_prefilter).run()
+
+            FindingsStore.default().add(local_path, findings)
+            return f"Secret detection completed successfully:\n{digest(findings, 'trufflehog', root=local_path)}"
+        except ScanError as e:
+            return str(e)
         except Exception as e:
             return f"Error running secret detection: {str(e)}"
+
+    def _scan(self, local_path: str, command: List[str]) -> List[Finding]:
+        # Only hand the files changed since the last scanned commit to trufflehog
+        args = ["json", PREFILTER_VERSION] if self.use_prefilter else "json"
+        scan = IncrementalScan.for_repo(self.name, local_path, args=args) if self.incremental else None
+        if scan and not scan.full:
+            targets = scan.changed_paths()
+            if self.use_prefilter:
+                targets = prefilter(local_path, targets).candidates
+            commands = self._file_commands(local_path, targets)
+        elif self.use_prefilter:
+            # Only the files that look like they could hold a secret go to trufflehog
+            result = prefilter(local_path)
+            logger.info(f"Secret prefilter of {local_path}: {len(result.candidates)} candidates out of "
+                        f"{result.files} files ({result.skipped} vendored, lock or binary files skipped)")
+            commands = self._file_commands(local_path, result.candidates)
+        else:
+            # Large checkouts are split into parts of similar size that are scanned in parallel
+            shards = size_shards(local_path, shard_workers(), self.shard_min_bytes)
+            commands = [command] if len(shards) == 1 else [
+                ["trufflehog", "filesystem", *(os.path.join(local_path, p) for p in shard.paths), "--json"]
+                for shard in shards
+            ]
+
+        findings = run_sharded(commands, lambda command: self._run_trufflehog(local_path, command))
+        if scan:
+            results = scan.merge(group_by_file(findings))
+            scan.save(results)
+            findings = ungroup(results)
+        return findings
+
+    def _file_commands(self, local_path: str, paths: List[str]) -> List[List[str]]:
+        # Like the whole checkout, large file lists are split into parts of similar size
+        shards = file_shards(local_path, paths, shard_workers(), self.shard_min_bytes)
+        return [
+            ["trufflehog", "filesystem", *shard.paths[i:i + FILES_PER_INVOCATION], "--json"]
+            for shard in shards for i in range(0, len(shard.paths), FILES_PER_INVOCATION)
+        ]
+
+    @staticmethod
+    def _run_trufflehog(local_path: str, command: List[str]) -> List[Finding]:
+        result = run_command(command, timeout=timeout_for("trufflehog", 1800))
+        try:
+            if result.timed_out:
+                raise ScanError(f"Secret detection timed out after {result.duration:.0f} seconds.")
+            if result.returncode != 0:
+                raise ScanError(f"Secret detection failed:\n{result.stderr}")
+            with result.open_stdout() as output:
+                return parse_trufflehog(output, root=local_path)
+        finally:
+            result.cleanup()
@@ -1,11 +1,21 @@
 from crewai.tools import BaseTool
 from typing import Type
 from pydantic import BaseModel, Field
-import subprocess
 from pathlib import Path
+import logging
 import sys
 import os
-import time
+
+from appsec_agents.digest import digest
+from appsec_agents.findings import FindingsStore, parse_ggshield
+from appsec_agents.runner import run_command, timeout_for
+from appsec_agents.secret_prefilter import prefilter, prefilter_enabled
+from appsec_agents.tracing import traced_tool
+
+logger = logging.getLogger(__name__)
+
+# Number of candidate files handed to a single ggshield invocation
+FILES_PER_INVOCATION = 200
 
 class GgShieldInput(BaseModel):
     local_path: str = Field(..., description="Path to the locally cloned Git repository.")
@@ -17,7 +27,9 @@ class GgShieldTool(BaseTool):
         "using the GitGuardian CLI tool (ggshield)."
     )
     args_schema: Type[BaseModel] = GgShieldInput
+    use_prefilter: bool = prefilter_enabled()
 
+    @traced_tool
     def _run(self, local_path: str) -> str:
         """Runs ggshield to scan for secrets in the specified Git repository."""
         path = Path(local_path).resolve()
@@ -31,57 +43,38 @@ class GgShieldTool(BaseTool):
         try:
             # Get the path to the virtual environment's Scripts directory
             venv_scripts_path = os.path.join(os.path.dirname(sys.executable), 'Scripts')
-            os.environ['PATH'] = venv_scripts_path + os.pathsep + os.environ['PATH']
+            env = dict(os.environ)
+            env['PATH'] = venv_scripts_path + os.pathsep + env['PATH']
 
             # Run ggshield secret scan command with --yes flag to bypass prompts
-            command = ["ggshield", "secret", "scan", "path", str(path), "--recursive", "--yes"]
-            print(f"Executing command: {' '.join(command)}")  # Print the command being executed
-
-            # Start the command in a separate process
-            process = subprocess.Popen(
-                command,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-
-            # Read and print output incrementally
-            stdout_lines = []
-            stderr_lines = []
-            start_time = time.time()
-            while process.poll() is None:
-                if time.time() - start_time > 30:
-                    process.terminate()
-                    return "Error: The command timed out after 30 seconds."
-
-                # Read stdout and stderr incrementally
-                stdout_line = process.stdout.readline()
-                stderr_line = process.stderr.readline()
-
-                if stdout_line:
-                    print(stdout_line, end='')
-                    stdout_lines.append(stdout_line)
-                if stderr_line:
-                    print(stderr_line, end='')
-                    stderr_lines.append(stderr_line)
-
-                time.sleep(0.1)
+            if self.use_prefilter:
+                # Only the files that look like they could hold a secret are uploaded and scanned
+                candidates = prefilter(str(path)).candidates
+                commands = [["ggshield", "secret", "scan", "path", *candidates[i:i + FILES_PER_INVOCATION],
+                             "--yes", "--json"] for i in range(0, len(candidates), FILES_PER_INVOCATION)]
+            else:
+                commands = [["ggshield", "secret", "scan", "path", str(path), "--recursive", "--yes", "--json"]]
 
-            # Read any remaining output
-            stdout, stderr = process.communicate()
-            if stdout:
-                print(stdout, end='')
-                stdout_lines.append(stdout)
-            if stderr:
-                print(stderr, end='')
-                stderr_lines.append(stderr)
+            findings = []
+            timeout = timeout_for("ggshield", 600)
+            for command in commands:
+                logger.info(f"Executing command: {' '.join(command)}")
 
-            if process.returncode == 0:
-                return f"Secret detection completed successfully:\n{''.join(stdout_lines)}"
-            else:
-                return f"Secret detection failed:\n{''.join(stderr_lines)}"
-        except subprocess.TimeoutExpired:
-            return "Error: The command timed out after 30 seconds."
+                # Log progress live as ggshield produces it
+                result = run_command(command, env=env, timeout=timeout,
+                                     on_line=lambda stream, line: logger.info(line) if stream == "stderr" else None)
+                try:
+                    if result.timed_out:
+                        return f"Error: The command timed out after {timeout:.0f} seconds."
+                    # ggshield exits with 1 when secrets were found
+                    if result.returncode not in (0, 1):
+                        return f"Secret detection failed:\n{result.stderr}"
+                    with result.open_stdout() as output:
+                        findings.extend(parse_ggshield(output, root=str(path)))
+                finally:
+                    result.cleanup()
+            FindingsStore.default().add(str(path), findings)
+            return f"Secret detection completed successfully:\n{digest(findings, 'ggshield', root=str(path))}"
         except FileNotFoundError:
             return "Error: The tool 'ggshield' is not installed or not in the system PATH."
         except Exception as e:
@@ -91,4 +84,4 @@ class GgShieldTool(BaseTool):
 if __name__ == "__main__":
     tool = GgShieldTool()
     result = tool._run("/temp/appsec_sample_code")
-    print(result)
\ No newline at end of file
+    print(result)
@@ -0,0 +1,236 @@
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from appsec_agents.fileio import atomic_write
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_SPANS = 200_000
+# Upper bounds in seconds of the duration histogram buckets
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+
+@dataclass
+class Span:
+    """One timed operation: a crew task, a tool run, a subprocess or an LLM call."""
+    name: str
+    category: str
+    start: float  # epoch seconds
+    duration: float = 0.0
+    thread: int = 0
+    attrs: Dict[str, Any] = field(default_factory=dict)
+
+    def set(self, key: str, value: Any) -> None:
+        self.attrs[key] = value
+
+    def to_chrome(self, pid: int) -> Dict[str, Any]:
+        return {"name": self.name, "cat": self.category, "ph": "X", "pid": pid, "tid": self.thread,
+                "ts": round(self.start * 1e6), "dur": round(self.duration * 1e6), "args": self.attrs}
+
+
+class _NoopSpan:
+    """Returned by a disabled tracer so instrumented code pays only for an attribute check."""
+
+    def set(self, key: str, value: Any) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+@dataclass
+class _Stat:
+    count: int = 0
+    total: float = 0.0
+    errors: int = 0
+    output_bytes: int = 0
+    buckets: List[int] = field(default_factory=lambda: [0] * len(DURATION_BUCKETS))
+
+
+class Tracer:
+    """
+    Collects spans in memory and exports them as a Chrome trace (chrome://tracing, Perfetto)
+    and as Prometheus text-format metrics. Per-span metrics are aggregated as spans end, so
+    only the trace keeps individual spans, up to `max_spans`.
+
+    Enabled when TRACE_OUTPUT or METRICS_OUTPUT is set; otherwise `span` and `record`
+    return immediately.
+    """
+
+    _default: Optional["Tracer"] = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, enabled: bool = True, trace_path: Optional[str] = None, metrics_path: Optional[str] = None,
+                 max_spans: int = DEFAULT_MAX_SPANS):
+        self.enabled = enabled
+        self.trace_path = trace_path
+        self.metrics_path = metrics_path
+        self.max_spans = max_spans
+        self.spans: List[Span] = []
+        self.dropped = 0
+        self._stats: Dict[Tuple[str, str], _Stat] = {}
+        self._tokens: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def default(cls) -> "Tracer":
+        with cls._default_lock:
+            if cls._default is None:
+                trace_path, metrics_path = os.getenv("TRACE_OUTPUT"), os.getenv("METRICS_OUTPUT")
+                cls._default = cls(bool(trace_path or metrics_path), trace_path, metrics_path,
+                                   int(os.getenv("TRACE_MAX_SPANS") or DEFAULT_MAX_SPANS))
+                if cls._default.enabled:
+                    install_llm_hook(cls._default)
+            return cls._default
+
+    @contextmanager
+    def span(self, name: str, category: str, **attrs: Any) -> Iterator[Any]:
+        """Time the enclosed block; the yielded span takes extra attributes with `set`."""
+        if not self.enabled:
+            yield _NOOP_SPAN
+            return
+        span = Span(name, category, time.time(), thread=threading.get_ident(), attrs=attrs)
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.set("error", type(e).__name__)
+            raise
+        finally:
+            span.duration = time.perf_counter() - started
+            self._finish(span)
+
+    def record(self, name: str, category: str, start: float, duration: float, **attrs: Any) -> None:
+        """Add a span that was timed elsewhere (scheduler timings, LLM callbacks)."""
+        if self.enabled:
+            self._finish(Span(name, category, start, duration, threading.get_ident(), attrs))
+
+    def _finish(self, span: Span) -> None:
+        with self._lock:
+            if len(self.spans) < self.max_spans:
+                self.spans.append(span)
+            else:
+                self.dropped += 1
+            stat = self._stats.setdefault((span.category, span.name), _Stat())
+            stat.count += 1
+            stat.total += span.duration
+            stat.errors += "error" in span.attrs
+            stat.output_bytes += span.attrs.get("output_bytes", 0)
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if span.duration <= bound:
+                    stat.buckets[i] += 1
+                    break
+            for kind in ("prompt_tokens", "completion_tokens"):
+                if span.attrs.get(kind):
+                    key = (span.attrs.get("model", span.name), kind.split("_")[0])
+                    self._tokens[key] = self._tokens.get(key, 0) + span.attrs[kind]
+
+    def chrome_trace(self) -> Dict[str, Any]:
+        pid = os.getpid()
+        with self._lock:
+            events = [span.to_chrome(pid) for span in self.spans]
+            dropped = self.dropped
+        return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"dropped_spans": dropped}}
+
+    def prometheus(self) -> str:
+        lines = [
+            "# HELP appsec_span_duration_seconds Duration of crew tasks, tools, subprocesses and LLM calls.",
+            "# TYPE appsec_span_duration_seconds histogram",
+        ]
+        with self._lock:
+            stats = sorted(self._stats.items())
+            tokens = sorted(self._tokens.items())
+        for (category, name), stat in stats:
+            labels = f'category="{_escape(category)}",name="{_escape(name)}"'
+            cumulative = 0
+            for bound, count in zip(DURATION_BUCKETS, stat.buckets):
+                cumulative += count
+                lines.append(f'appsec_span_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'appsec_span_duration_seconds_bucket{{{labels},le="+Inf"}} {stat.count}')
+            lines.append(f"appsec_span_duration_seconds_sum{{{labels}}} {stat.total:.6f}")
+            lines.append(f"appsec_span_duration_seconds_count{{{labels}}} {stat.count}")
+        for metric, help_text, attr in (
+                ("appsec_span_errors_total", "Spans that ended with an exception.", "errors"),
+                ("appsec_span_output_bytes_total", "Bytes of output returned by tools and subprocesses.",
+                 "output_bytes")):
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+            for (category, name), stat in stats:
+                lines.append(f'{metric}{{category="{_escape(category)}",name="{_escape(name)}"}} {getattr(stat, attr)}')
+        lines += ["# HELP appsec_llm_tokens_total Tokens used by LLM calls.", "# TYPE appsec_llm_tokens_total counter"]
+        for (model, kind), count in tokens:
+            lines.append(f'appsec_llm_tokens_total{{model="{_escape(model)}",type="{kind}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+    def export(self) -> None:
+        """Write the trace and metrics files that are configured."""
+        if not self.enabled:
+            return
+        if self.trace_path:
+            atomic_write(self.trace_path, json.dumps(self.chrome_trace()))
+            logger.info(f"Trace with {len(self.spans)} spans written to {self.trace_path}")
+        if self.metrics_path:
+            atomic_write(self.metrics_path, self.prometheus())
+            logger.info(f"Metrics written to {self.metrics_path}")
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def traced_tool(run):
+    """Decorator for `BaseTool._run`: one "tool" span per call with the size of the returned text."""
+
+    @functools.wraps(run)
+    def wrapper(self, *args, **kwargs):
+        tracer = Tracer.default()
+        if not tracer.enabled:
+            return run(self, *args, **kwargs)
+        with tracer.span(self.name, "tool") as span:
+            output = run(self, *args, **kwargs)
+            if isinstance(output, str):
+                span.set("output_bytes", len(output.encode("utf-8")))
+            return output
+
+    return wrapper
+
+
+def install_llm_hook(tracer: Tracer) -> bool:
+    """Record an "llm" span with token counts for every litellm completion made by the crew."""
+    try:
+        import litellm
+        from litellm.integrations.custom_logger import CustomLogger
+    except ImportError:
+        logger.debug("litellm is not installed, LLM calls will not be traced")
+        return False
+
+    class LlmSpans(CustomLogger):
+        def log_success_event(self, kwargs, response_obj, start_time, end_time):
+            usage = getattr(response_obj, "usage", None) or {}
+            get = usage.get if isinstance(usage, dict) else lambda key: getattr(usage, key, None)
+            self._record(kwargs, start_time, end_time, prompt_tokens=get("prompt_tokens") or 0,
+                         completion_tokens=get("completion_tokens") or 0)
+
+        def log_failure_event(self, kwargs, response_obj, start_time, end_time):
+            self._record(kwargs, start_time, end_time, error=type(kwargs.get("exception")).__name__)
+
+        async def async_log_success_event(self, kwargs, response_obj, start_time, end_time):
+            self.log_success_event(kwargs, response_obj, start_time, end_time)
+
+        async def async_log_failure_event(self, kwargs, response_obj, start_time, end_time):
+            self.log_failure_event(kwargs, response_obj, start_time, end_time)
+
+        @staticmethod
+        def _record(kwargs, start_time, end_time, **attrs):
+            model = kwargs.get("model") or "unknown"
+            tracer.record(model, "llm", start_time.timestamp(), (end_time - start_time).total_seconds(),
+                          model=model, **attrs)
+
+    litellm.callbacks.append(LlmSpans())
+    return True
@@ -0,0 +1,354 @@
+import atexit
+import fcntl
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+from appsec_agents.fileio import atomic_write
+from appsec_agents.repo_cache import RepoMirrorCache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ROOT = os.path.join(tempfile.gettempdir(), "appsec_workspaces")
+DEFAULT_QUOTA_MB = 20 * 1024
+
+
+def disk_usage(path: str) -> int:
+    """Bytes allocated on disk for everything under `path` (0 if it does not exist)."""
+    total = 0
+    for directory, _, files in os.walk(path):
+        for name in files:
+            try:
+                stat = os.lstat(os.path.join(directory, name))
+            except OSError:
+                continue
+            total += stat.st_blocks * 512 if hasattr(stat, "st_blocks") else stat.st_size
+    return total
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+@dataclass
+class Workspace:
+    """A checkout leased to one run; its objects live in the repository's shared mirror."""
+    run_id: str
+    repo_url: str
+    path: str
+    mirror: str
+    pid: int = field(default_factory=os.getpid)
+    created: float = field(default_factory=time.time)
+    bytes: int = 0
+    kept: bool = False  # left checked out by a failed run, for `resume`
+
+
+@dataclass
+class WorkspaceStats:
+    acquired: int = 0
+    mirror_reuses: int = 0  # the repository's mirror was already on disk
+    shared: int = 0  # another run of the same repository was using the mirror at the time
+    evicted: int = 0
+    evicted_bytes: int = 0
+    reaped: int = 0  # workspaces left behind by runs that crashed
+
+    @property
+    def reuse_rate(self) -> float:
+        return self.mirror_reuses / self.acquired if self.acquired else 0.0
+
+
+class WorkspaceManager:
+    """
+    Hands out per-run checkouts under WORKSPACE_DIR and keeps the disk they use within
+    WORKSPACE_QUOTA_MB.
+
+    Each repository has one bare mirror (see RepoMirrorCache) that is fetched incrementally,
+    and every run gets a `--reference` clone of it, so concurrent and later runs of the same
+    repository share one object store and only pay for their working tree. A lease file per
+    run protects its mirror from eviction. When a new run would exceed the quota, the least
+    recently used mirrors without a lease are deleted. Workspaces are removed when the run
+    releases them, at interpreter exit, or, after a crash, by the next manager that starts.
+    A failed run can keep its workspace and lease instead, so it is resumed on the same
+    checkout, without cloning again; it stays until a later acquire of the same run id
+    succeeds and releases it, or until it is discarded.
+    Leases, usage.json and evictions are updated under an flock on the root's lock file,
+    so managers in several processes can share one root.
+    """
+
+    _default: Optional["WorkspaceManager"] = None
+    _default_lock = threading.Lock()
+    # path -> workspace, for every workspace leased in this process
+    _registry: Dict[str, Workspace] = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, root: str, quota_bytes: int, mirrors: Optional[RepoMirrorCache] = None):
+        self.root = os.path.abspath(root)
+        self.quota_bytes = quota_bytes
+        self.runs_dir = os.path.join(self.root, "runs")
+        self.leases_dir = os.path.join(self.root, "leases")
+        self.usage_path = os.path.join(self.root, "usage.json")
+        self.lock_path = os.path.join(self.root, ".lock")
+        self.mirrors = mirrors or RepoMirrorCache(os.path.join(self.root, "mirrors"))
+        self.stats = WorkspaceStats()
+        self._active: Dict[str, Workspace] = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.runs_dir, exist_ok=True)
+        os.makedirs(self.leases_dir, exist_ok=True)
+        self.reap()
+        atexit.register(self.close)
+
+    @classmethod
+    def default(cls) -> "WorkspaceManager":
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls(os.getenv("WORKSPACE_DIR") or DEFAULT_ROOT,
+                                   int(os.getenv("WORKSPACE_QUOTA_MB") or DEFAULT_QUOTA_MB) * 1024 * 1024)
+            return cls._default
+
+    @classmethod
+    def managed(cls, local_path: str) -> Optional[Workspace]:
+        """The workspace at `local_path` if a manager in this process has it checked out."""
+        with cls._registry_lock:
+            return cls._registry.get(os.path.abspath(local_path))
+
+    def path_for(self, run_id: str) -> str:
+        """Where the workspace of `run_id` is checked out."""
+        return os.path.join(self.runs_dir, run_id)
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        """Exclusive access to the leases and usage.json, for this process's threads and for other processes."""
+        with self._lock:
+            with open(self.lock_path, "a") as f:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _lease_path(self, run_id: str) -> str:
+        return os.path.join(self.leases_dir, f"{run_id}.json")
+
+    def _write_json(self, path: str, data: Any) -> None:
+        atomic_write(path, json.dumps(data))
+
+    def leases(self) -> List[Workspace]:
+        """Workspaces leased by any process using this root."""
+        leases = []
+        for name in os.listdir(self.leases_dir):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.leases_dir, name), "r", encoding="utf-8") as f:
+                    leases.append(Workspace(**json.load(f)))
+            except (OSError, ValueError, TypeError):
+                continue
+        return leases
+
+    def _load_usage(self) -> Dict[str, Dict[str, float]]:
+        """Mirror path -> last use, mirror size and size of its last workspace."""
+        try:
+            with open(self.usage_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def usage(self) -> int:
+        """Bytes used by the mirrors and the leased workspaces."""
+        mirrors = sum(entry.get("bytes", 0) for path, entry in self._load_usage().items() if os.path.isdir(path))
+        return mirrors + sum(lease.bytes for lease in self.leases())
+
+    def _load_lease(self, run_id: str) -> Optional[Workspace]:
+        try:
+            with open(self._lease_path(run_id), "r", encoding="utf-8") as f:
+                return Workspace(**json.load(f))
+        except (OSError, ValueError, TypeError):
+            return None
+
+    def _reclaim(self, repo_url: str, run_id: str) -> Optional[Workspace]:
+        """Take over the workspace a failed run of `run_id` kept, if it is still there. Call locked."""
+        workspace = self._load_lease(run_id)
+        if workspace is None or not workspace.kept:
+            return None
+        if workspace.repo_url != repo_url or not os.path.isdir(workspace.path):
+            logger.info(f"Dropping the kept workspace {workspace.path}, it cannot be reused")
+            shutil.rmtree(workspace.path, ignore_errors=True)
+            os.remove(self._lease_path(run_id))
+            return None
+        workspace.kept, workspace.pid = False, os.getpid()
+        self._write_json(self._lease_path(run_id), asdict(workspace))
+        self._active[run_id] = workspace
+        return workspace
+
+    def acquire(self, repo_url: str, run_id: str, ref: Optional[str] = None) -> Workspace:
+        """
+        Check out `repo_url` (at `ref`, default branch otherwise) into a fresh workspace for `run_id`.
+        The workspace a failed run of `run_id` kept is handed back as it is instead.
+        """
+        mirror = self.mirrors.mirror_path(repo_url)
+        workspace = Workspace(run_id, repo_url, self.path_for(run_id), mirror)
+        with self._locked():
+            kept = self._reclaim(repo_url, run_id)
+            if kept is not None:
+                self.stats.acquired += 1
+                self.stats.mirror_reuses += 1
+        if kept is not None:
+            with self._registry_lock:
+                self._registry[kept.path] = kept
+            logger.info(f"Reusing the workspace {kept.path} kept by a failed run")
+            return kept
+        with self._locked():
+            if os.path.exists(self._lease_path(run_id)):
+                raise ValueError(f"Workspace {run_id} is already leased.")
+            reused = os.path.isdir(mirror)
+            self.stats.acquired += 1
+            self.stats.mirror_reuses += reused
+            self.stats.shared += any(lease.mirror == mirror for lease in self.leases())
+            # The lease is written first, so the mirror is not evicted while it is being cloned
+            self._write_json(self._lease_path(run_id), asdict(workspace))
+            self._active[run_id] = workspace
+            usage = self._load_usage()
+            entry = usage.setdefault(mirror, {"bytes": 0, "workspace_bytes": 0})
+            entry["last_used"] = time.time()
+            self._write_json(self.usage_path, usage)
+            self._make_room(entry["workspace_bytes"] + (0 if reused else entry["bytes"]))
+
+        try:
+            shutil.rmtree(workspace.path, ignore_errors=True)
+            repo = self.mirrors.checkout(repo_url, workspace.path)
+            if ref and ref != "HEAD":
+                repo.git.checkout(ref)
+        except Exception:
+            self.release(workspace)
+            raise
+
+        workspace.bytes = disk_usage(workspace.path)
+        with self._locked():
+            self._write_json(self._lease_path(run_id), asdict(workspace))
+            usage = self._load_usage()
+            usage.setdefault(mirror, {})["bytes"] = disk_usage(mirror)
+            usage[mirror].update(workspace_bytes=workspace.bytes, last_used=time.time())
+            self._write_json(self.usage_path, usage)
+            # The size of a first checkout is only known now
+            self._make_room(0)
+        with self._registry_lock:
+            self._registry[workspace.path] = workspace
+        logger.info(f"Workspace {workspace.path} for {repo_url}: {workspace.bytes / 2 ** 20:.1f} MB, "
+                    f"mirror {'reused' if reused else 'created'}")
+        return workspace
+
+    def release(self, workspace: Workspace) -> None:
+        """Delete the workspace and its lease; the mirror stays for later runs."""
+        with self._registry_lock:
+            self._registry.pop(workspace.path, None)
+        shutil.rmtree(workspace.path, ignore_errors=True)
+        with self._locked():
+            self._active.pop(workspace.run_id, None)
+            try:
+                os.remove(self._lease_path(workspace.run_id))
+            except FileNotFoundError:
+                pass
+            self._make_room(0)
+        logger.debug(f"Released workspace {workspace.path}")
+
+    def keep(self, workspace: Workspace) -> None:
+        """Leave the workspace and its lease in place after a failed run, until it is acquired again or discarded."""
+        with self._registry_lock:
+            self._registry.pop(workspace.path, None)
+        with self._locked():
+            self._active.pop(workspace.run_id, None)
+            workspace.kept = True
+            self._write_json(self._lease_path(workspace.run_id), asdict(workspace))
+        logger.info(f"Kept workspace {workspace.path} of failed run {workspace.run_id}")
+
+    def discard(self, run_id: str) -> None:
+        """Release the workspace a failed run of `run_id` kept, if any."""
+        workspace = self._load_lease(run_id)
+        if workspace is not None and workspace.kept:
+            self.release(workspace)
+
+    @contextmanager
+    def workspace(self, repo_url: str, run_id: str, ref: Optional[str] = None,
+                  keep_on_error: bool = False) -> Iterator[Workspace]:
+        workspace = self.acquire(repo_url, run_id, ref)
+        try:
+            yield workspace
+        except BaseException:
+            if keep_on_error:
+                self.keep(workspace)
+            else:
+                self.release(workspace)
+            raise
+        self.release(workspace)
+
+    def _make_room(self, incoming: int) -> None:
+        """Evict idle mirrors, least recently used first, until `incoming` more bytes fit the quota. Call locked."""
+        usage = self._load_usage()
+        over = self.usage() + incoming - self.quota_bytes
+        if over <= 0:
+            return
+        busy = {lease.mirror for lease in self.leases()}
+        for mirror, entry in sorted(usage.items(), key=lambda item: item[1].get("last_used", 0)):
+            if over <= 0:
+                break
+            if mirror in busy:
+                continue
+            size = entry.get("bytes", 0) if os.path.isdir(mirror) else 0
+            shutil.rmtree(mirror, ignore_errors=True)
+            del usage[mirror]
+            over -= size
+            self.stats.evicted += 1
+            self.stats.evicted_bytes += size
+            logger.info(f"Evicted mirror {mirror} ({size / 2 ** 20:.1f} MB) to stay within the workspace quota")
+        self._write_json(self.usage_path, usage)
+        if over > 0:
+            logger.warning(f"Workspaces in use exceed the quota of {self.quota_bytes / 2 ** 20:.0f} MB "
+                           f"by {over / 2 ** 20:.1f} MB")
+
+    def reap(self) -> int:
+        """Remove the workspaces of processes that exited without releasing them."""
+        reaped = 0
+        with self._locked():
+            leased = set()
+            for lease in self.leases():
+                if lease.kept or lease.pid == os.getpid() or _alive(lease.pid):
+                    leased.add(lease.run_id)
+                    continue
+                logger.info(f"Removing workspace {lease.path} left behind by process {lease.pid}")
+                shutil.rmtree(lease.path, ignore_errors=True)
+                try:
+                    os.remove(self._lease_path(lease.run_id))
+                except FileNotFoundError:
+                    pass
+                reaped += 1
+            # A lease is written before its directory, so a directory without one is not in use
+            for name in os.listdir(self.runs_dir):
+                if name not in leased and not os.path.exists(self._lease_path(name)):
+                    shutil.rmtree(os.path.join(self.runs_dir, name), ignore_errors=True)
+                    reaped += 1
+            self.stats.reaped += reaped
+        return reaped
+
+    def close(self) -> None:
+        """Release every workspace this manager still has leased."""
+        for workspace in list(self._active.values()):
+            self.release(workspace)
+
+    def report(self) -> Dict[str, Any]:
+        """Disk usage against the quota and how often runs reused a mirror."""
+        return dict(asdict(self.stats), usage_bytes=self.usage(), quota_bytes=self.quota_bytes,
+                    mirrors=sum(1 for path in self._load_usage() if os.path.isdir(path)),
+                    leased=len(self.leases()), reuse_rate=round(self.stats.reuse_rate, 3))
@@ -0,0 +1,104 @@
+import io
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import unittest
+from git import GitCommandError
+from src.appsec_agents import batch
+from src.appsec_agents.batch import BatchRunner, RepoOutcome, is_transient, percentile, read_repo_list
+from src.appsec_agents.findings import Finding
+
+
+class TestBatchRunner(unittest.TestCase):
+
+    def setUp(self):
+        self.workspace = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.workspace, ignore_errors=True)
+
+    def test_read_repo_list(self):
+        stream = io.StringIO("# repos\nhttps://example.com/a.git\n\n{\"repo_url\": \"https://example.com/b\"}\n")
+        self.assertEqual(read_repo_list(stream), ["https://example.com/a.git", "https://example.com/b"])
+
+    def test_runs_repos_concurrently_in_isolated_workspaces(self):
+        paths = []
+        lock = threading.Lock()
+
+        def run_repo(repo_url, local_path):
+            os.makedirs(local_path)
+            with lock:
+                paths.append(local_path)
+            return RepoOutcome(stages={"clone": 1.0, "scan": 2.0}, output=repo_url)
+
+        output = io.StringIO()
+        repos = [f"https://example.com/org/repo{i}.git" for i in range(8)]
+        summary = BatchRunner(run_repo, self.workspace, workers=4).run(repos, output=output)
+
+        self.assertEqual(summary.succeeded, 8)
+        self.assertEqual(len(set(paths)), 8)
+        self.assertEqual(os.listdir(self.workspace), [])
+        records = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual(sorted(r["repo_url"] for r in records), sorted(repos))
+        self.assertEqual(summary.stage_latencies()["scan"]["p95"], 2.0)
+
+    def test_retries_transient_failures_only(self):
+        calls = {"flaky": 0, "broken": 0}
+
+        def run_repo(repo_url, local_path):
+            name = repo_url.rsplit("/", 1)[-1]
+            calls[name] += 1
+            if name == "flaky" and calls[name] < 3:
+                raise ConnectionError("connection reset")
+            if name == "broken":
+                raise ValueError("bad config")
+            return RepoOutcome()
+
+        summary = BatchRunner(run_repo, self.workspace, workers=2, retries=2, backoff=0).run(
+            ["https://example.com/flaky", "https://example.com/broken"])
+
+        results = {r.repo_url.rsplit("/", 1)[-1]: r for r in summary.results}
+        self.assertEqual((results["flaky"].status, results["flaky"].attempts), ("ok", 3))
+        self.assertEqual((results["broken"].status, results["broken"].attempts), ("failed", 1))
+        self.assertIn("bad config", results["broken"].error)
+
+    def test_findings_are_discarded_after_each_attempt(self):
+        store = batch.FindingsStore.default()
+        seen = []
+
+        def run_repo(repo_url, local_path):
+            seen.append(len(store.get(local_path)))
+            store.add(local_path, [Finding("trufflehog", "AWS", "high", "a.py", 1, "secret", "secret")])
+            if len(seen) == 1:
+                raise ConnectionError("connection reset")
+            return RepoOutcome()
+
+        summary = BatchRunner(run_repo, self.workspace, workers=1, retries=1, backoff=0).run(
+            ["https://example.com/app"])
+        self.assertEqual(summary.succeeded, 1)
+        self.assertEqual(seen, [0, 0])
+        self.assertEqual(store.get(summary.results[0].local_path), [])
+
+    def test_git_errors_are_classified_by_stderr(self):
+        def clone_error(stderr):
+            return GitCommandError(["git", "clone", "https://example.com/org/app"], 128, stderr)
+
+        self.assertTrue(is_transient(clone_error("fatal: unable to access: Could not resolve host: example.com")))
+        self.assertTrue(is_transient(clone_error("ssh: connect to host example.com port 22: Connection timed out")))
+        self.assertFalse(is_transient(clone_error("remote: Repository not found.")))
+        self.assertFalse(is_transient(clone_error("fatal: Authentication failed for 'https://example.com/org/app'")))
+        self.assertTrue(is_transient(subprocess.CalledProcessError(
+            128, ["git", "fetch"], stderr=b"error: RPC failed; curl 56 Connection reset by peer")))
+        self.assertFalse(is_transient(subprocess.CalledProcessError(1, ["git", "checkout", "main"], stderr="")))
+
+    def test_percentile(self):
+        self.assertEqual(percentile([], 50), 0.0)
+        self.assertEqual(percentile([3, 1, 2], 50), 2)
+        self.assertAlmostEqual(percentile(list(range(1, 101)), 95), 95.05)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import os
+import shutil
+import stat
+import tempfile
+import unittest
+from src.appsec_agents.checkpoints import CheckpointStore
+
+
+class TestCheckpointStore(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.store = CheckpointStore(self.root)
+        self.inputs = {"repo_url": "https://example.com/org/app", "local_path": "/tmp/run_1", "scan_depth": 3}
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def lines(self):
+        with open(os.path.join(self.root, "run1.jsonl")) as f:
+            return f.readlines()
+
+    def test_completed_tasks_and_findings_survive_a_torn_record(self):
+        digest = self.store.begin("run1", self.inputs, head="abc123")
+        self.store.record_task("run1", digest, "clone", {"raw": "cloned"})
+        self.store.record_findings("run1", digest, [{"file": "a.py"}])
+        self.store.record_task("run1", digest, "scan", {"raw": "3 findings"})
+        self.store.record_findings("run1", digest, [{"file": "a.py"}, {"file": "b.py"}])
+        with open(os.path.join(self.root, "run1.jsonl"), "a") as f:
+            f.write('{"type": "task", "input_ha')  # crashed in the middle of a write
+
+        self.assertEqual(self.store.run("run1")["head"], "abc123")
+        self.assertEqual(self.store.completed("run1", digest), {"clone": {"raw": "cloned"}, "scan": {"raw": "3 findings"}})
+        self.assertEqual(len(self.store.findings("run1", digest)), 2)
+        self.assertEqual(stat.S_IMODE(os.stat(os.path.join(self.root, "run1.jsonl")).st_mode), 0o600)
+
+    def test_compaction_keeps_only_the_records_of_the_latest_inputs(self):
+        old = self.store.begin("run1", self.inputs)
+        self.store.record_task("run1", old, "clone", {"raw": "old"})
+        digest = self.store.begin("run1", dict(self.inputs, scan_depth=1))
+        for i in range(3):
+            self.store.record_task("run1", digest, "clone", {"raw": f"attempt {i}"})
+            self.store.record_findings("run1", digest, [{"file": f"{i}.py"}])
+
+        self.store.compact("run1")
+        self.assertEqual(len(self.lines()), 3)  # run, last clone output, last snapshot
+        self.assertEqual(self.store.completed("run1", digest), {"clone": {"raw": "attempt 2"}})
+        self.assertEqual(self.store.completed("run1", old), {})
+        self.assertEqual(self.store.findings("run1", digest), [{"file": "2.py"}])
+
+        # Nothing is rewritten while few records are superseded
+        self.store.record_task("run1", digest, "scan", {"raw": "done"})
+        self.store.compact("run1")
+        self.assertEqual(len(self.lines()), 4)
+
+        self.store.discard("run1")
+        self.assertIsNone(self.store.run("run1"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from src.appsec_agents.dependencies import (DependencyBackend, ManifestScanner, ScanError, Vulnerability,
+                                            discover_manifests)
+from src.appsec_agents.scan_cache import DiskLRUCache
+
+
+class FakeBackend(DependencyBackend):
+    name = "fake"
+
+    def __init__(self):
+        self.scanned = []
+
+    def version(self):
+        return "1@2024-01-01"
+
+    def scan(self, local_path, manifest):
+        self.scanned.append(os.path.join(local_path, manifest.path))
+        with open(os.path.join(local_path, manifest.path)) as f:
+            if "broken" in f.read():
+                raise ScanError("could not resolve")
+        return [Vulnerability("VULN-1", "high", "lodash", "4.17.15", "Prototype Pollution", ["4.17.21"])]
+
+
+class BlockingBackend(FakeBackend):
+    """Holds every scan until `release` is set."""
+
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+
+    def scan(self, local_path, manifest):
+        self.release.wait(5)
+        return super().scan(local_path, manifest)
+
+
+class TestManifestScanner(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.cache = DiskLRUCache(os.path.join(self.root, "cache"))
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def write(self, rel_path, content):
+        path = os.path.join(self.root, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(content)
+
+    def test_discovers_manifests_with_companions_and_parents(self):
+        self.write("repo/pom.xml", "<project>parent</project>")
+        self.write("repo/api/pom.xml", "<project>api</project>")
+        self.write("repo/web/package.json", "{}")
+        self.write("repo/web/package-lock.json", "{}")
+        self.write("repo/web/yarn.lock", "")
+        self.write("repo/web/node_modules/left-pad/package-lock.json", "{}")
+
+        manifests = {m.path: m for m in discover_manifests(os.path.join(self.root, "repo"))}
+
+        self.assertEqual(sorted(manifests), ["api/pom.xml", "pom.xml", "web/package-lock.json"])
+        self.assertEqual(manifests["api/pom.xml"].files, ["api/pom.xml", "pom.xml"])
+        self.assertEqual(manifests["web/package-lock.json"].files, ["web/package-lock.json", "web/package.json"])
+
+    def test_identical_lockfiles_are_scanned_once(self):
+        for repo in ("one", "two"):
+            self.write(f"{repo}/package.json", '{"name": "app"}')
+            self.write(f"{repo}/package-lock.json", '{"lockfileVersion": 3}')
+        self.write("two/tools/requirements.txt", "broken==1.0\n")
+        backend = FakeBackend()
+        scanner = ManifestScanner(backend, cache=self.cache)
+
+        first = scanner.scan(os.path.join(self.root, "one"))
+        second = scanner.scan(os.path.join(self.root, "two"))
+
+        self.assertEqual((first.scanned, first.cached), (1, 0))
+        self.assertEqual((second.scanned, second.cached), (0, 1))
+        self.assertEqual(len(backend.scanned), 2)
+        self.assertEqual([f.file for f in second.findings], ["package-lock.json"])
+        self.assertIn("fixed in 4.17.21", second.findings[0].message)
+        self.assertEqual(list(second.errors), ["tools/requirements.txt"])
+
+    def test_concurrent_scanners_wait_for_the_scan_in_progress(self):
+        self.write("one/requirements.txt", "requests==2.0\n")
+        self.write("two/requirements.txt", "requests==2.0\n")
+        backend = BlockingBackend()
+        results = {}
+
+        def scan(repo):
+            # A scanner per call, as DependencyVulnScanTool creates them
+            results[repo] = ManifestScanner(backend, cache=self.cache).scan(os.path.join(self.root, repo))
+
+        threads = [threading.Thread(target=scan, args=(repo,)) for repo in ("one", "two")]
+        for thread in threads:
+            thread.start()
+            time.sleep(0.1)
+        backend.release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(backend.scanned), 1)
+        self.assertEqual(sorted((r.scanned, r.cached) for r in results.values()), [(0, 1), (1, 0)])
+
+    def test_changed_lockfile_is_rescanned(self):
+        self.write("one/requirements.txt", "requests==2.0\n")
+        backend = FakeBackend()
+        scanner = ManifestScanner(backend, cache=self.cache)
+        scanner.scan(os.path.join(self.root, "one"))
+        self.write("one/requirements.txt", "requests==2.31\n")
+
+        result = scanner.scan(os.path.join(self.root, "one"))
+
+        self.assertEqual((result.scanned, result.cached), (1, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import os
+import shutil
+import stat
+import tempfile
+import time
+import unittest
+from src.appsec_agents.digest import ArtifactStore, digest
+from src.appsec_agents.findings import Finding
+
+
+def finding(rule, severity, file, line, extra=None):
+    return Finding(tool="pmd", rule=rule, severity=severity, file=file, line=line,
+                   message=f"{rule} violated", category="code", extra=extra or {})
+
+
+class TestDigest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.artifacts = ArtifactStore(os.path.join(self.root, "artifacts"))
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_small_results_are_listed_individually(self):
+        findings = [finding("SystemPrintln", "low", "A.java", 3)]
+        text = digest(findings, "pmd", root="/repo", token_budget=500, artifacts=self.artifacts)
+        self.assertIn("Location: /repo/A.java:3", text)
+        self.assertFalse(os.path.exists(self.artifacts.artifact_dir))
+
+    def test_large_results_are_grouped_ranked_and_kept_by_reference(self):
+        findings = [finding("UnusedLocalVariable", "low", f"src/F{i % 40}.java", i) for i in range(2000)]
+        findings += [finding("HardCodedCryptoKey", "high", f"src/K{i}.java", 1, extra={"raw": "key"}) for i in range(3)]
+        text = digest(findings, "pmd", root="/repo", token_budget=300, artifacts=self.artifacts)
+        lines = text.splitlines()
+        self.assertLessEqual(len(text), 300 * 4)
+        self.assertTrue(lines[0].startswith("2003 findings (3 high, 2000 low) in 43 files"))
+        self.assertTrue(lines[1].startswith("[HIGH] HardCodedCryptoKey (pmd) x3 in 3 files, e.g. /repo/src/K0.java:1"))
+        self.assertTrue(lines[2].startswith("[LOW] UnusedLocalVariable (pmd) x2000 in 40 files"))
+
+        path = lines[-1].split(": ", 1)[1]
+        stored = ArtifactStore.load(path)
+        self.assertEqual(len(stored), 2003)
+        self.assertTrue(all(not f.extra for f in stored))
+        self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o600)
+        self.assertEqual(stat.S_IMODE(os.stat(self.artifacts.artifact_dir).st_mode), 0o700)
+
+    def test_old_artifacts_are_removed(self):
+        artifacts = ArtifactStore(self.artifacts.artifact_dir, max_age=3600)
+        old = artifacts.put("pmd", [finding("R", "low", "A.java", 1)])
+        os.utime(old, (time.time() - 7200, time.time() - 7200))
+        new = artifacts.put("pmd", [finding("R", "low", "B.java", 1)])
+        self.assertEqual((os.path.exists(old), os.path.exists(new)), (False, True))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import io
+import os
+import shutil
+import stat
+import tempfile
+import unittest
+from src.appsec_agents.fileio import atomic_write
+
+
+class TestAtomicWrite(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_replaces_content_and_keeps_permissions(self):
+        path = os.path.join(self.root, "sub", "file.txt")
+        atomic_write(path, "first")
+        self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o600)
+        os.chmod(path, 0o644)
+        atomic_write(path, io.BytesIO(b"second"))
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), b"second")
+        self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o644)
+
+    def test_failed_write_leaves_no_temp_file(self):
+        path = os.path.join(self.root, "file.txt")
+        atomic_write(path, "kept")
+
+        class Broken(io.RawIOBase):
+            def readinto(self, buffer):
+                raise OSError("read failed")
+
+        with self.assertRaises(OSError):
+            atomic_write(path, Broken())
+        self.assertEqual(os.listdir(self.root), ["file.txt"])
+        with open(path) as f:
+            self.assertEqual(f.read(), "kept")
+
+
+if __name__ == '__main__':
+    unittest.main()
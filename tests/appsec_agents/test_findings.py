@@ -0,0 +1,124 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+from src.appsec_agents.findings import (Finding, ScanError, dedupe, findings_from_json, findings_to_json,
+                                        group_by_file, parse_ggshield, parse_sarif, parse_sarif_file,
+                                        parse_trufflehog, snyk_vulnerabilities, summarize, to_sarif)
+
+ROOT = "/tmp/repo"
+
+SNYK_OUTPUT = json.dumps([{
+    "displayTargetFile": "pom.xml",
+    "vulnerabilities": [
+        {"id": "SNYK-JAVA-LOG4J-1", "title": "RCE", "severity": "critical",
+         "packageName": "log4j-core", "version": "2.14.1", "fixedIn": ["2.17.1"]},
+        # Same advisory reached through a second dependency path
+        {"id": "SNYK-JAVA-LOG4J-1", "title": "RCE", "severity": "critical",
+         "packageName": "log4j-core", "version": "2.14.1", "fixedIn": ["2.17.1"]},
+    ],
+}, {
+    "displayTargetFile": "web/package-lock.json",
+    "vulnerabilities": [
+        {"id": "SNYK-JS-LODASH-2", "title": "Prototype Pollution", "severity": "medium",
+         "packageName": "lodash", "version": "4.17.15"},
+    ],
+}])
+
+SARIF_OUTPUT = json.dumps({"runs": [{"results": [{
+    "ruleId": "HardCodedCryptoKey", "level": "warning",
+    "message": {"text": "Do not use hard coded encryption keys"},
+    "locations": [{"physicalLocation": {
+        "artifactLocation": {"uri": "file:///tmp/repo/src/main/java/App.java"},
+        "region": {"startLine": 12}}}],
+}]}]})
+
+TRUFFLEHOG_OUTPUT = "\n".join([
+    json.dumps({"DetectorName": "AWS", "Verified": True, "Raw": "AKIAEXAMPLE",
+                "SourceMetadata": {"Data": {"Filesystem": {"file": "/tmp/repo/config.py", "line": 3}}}}),
+    '{"level":"info-0","msg":"finished scanning"}',
+])
+
+GGSHIELD_OUTPUT = json.dumps({"entities_with_incidents": [{
+    "filename": "/tmp/repo/config.py",
+    "incidents": [{"type": "AWS Keys", "validity": "unknown",
+                   "occurrences": [{"match": "AKIAEXAMPLE", "line_start": 3}]}],
+}]})
+
+
+class TestParsers(unittest.TestCase):
+
+    def test_snyk_vulnerabilities(self):
+        pairs = list(snyk_vulnerabilities(json.loads(SNYK_OUTPUT), root=ROOT))
+        self.assertEqual([manifest for manifest, _ in pairs], ["pom.xml", "pom.xml", "web/package-lock.json"])
+        self.assertEqual(pairs[0][1]["fixedIn"], ["2.17.1"])
+
+    def test_parse_sarif(self):
+        [finding] = parse_sarif(SARIF_OUTPUT, "pmd", root=ROOT)
+        self.assertEqual(finding.file, "src/main/java/App.java")
+        self.assertEqual(finding.line, 12)
+        self.assertEqual(finding.severity, "medium")
+        self.assertEqual(finding.category, "code")
+
+    def test_parsers_read_streams(self):
+        findings = parse_trufflehog(io.StringIO(TRUFFLEHOG_OUTPUT), root=ROOT)
+        self.assertEqual([(f.file, f.line) for f in findings], [("config.py", 3)])
+        pretty = json.dumps(json.loads(SARIF_OUTPUT), indent=2)
+        self.assertEqual(parse_sarif(io.StringIO(pretty), "pmd", root=ROOT), parse_sarif(SARIF_OUTPUT, "pmd", root=ROOT))
+        self.assertEqual(parse_trufflehog(io.StringIO("starting scan\n" + TRUFFLEHOG_OUTPUT), root=ROOT), findings)
+
+    def test_parse_sarif_file_rejects_a_truncated_report(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".sarif", delete=False) as f:
+            f.write(SARIF_OUTPUT)
+        self.addCleanup(os.remove, f.name)
+        self.assertEqual(len(parse_sarif_file(f.name, "pmd", root=ROOT)), 1)
+
+        with open(f.name, "w") as report:
+            report.write(SARIF_OUTPUT[:len(SARIF_OUTPUT) // 2])
+        with self.assertRaises(ScanError):
+            parse_sarif_file(f.name, "pmd", root=ROOT)
+
+    def test_secrets_from_both_tools_are_deduplicated(self):
+        findings = parse_trufflehog(TRUFFLEHOG_OUTPUT, root=ROOT) + parse_ggshield(GGSHIELD_OUTPUT, root=ROOT)
+        self.assertEqual(len(findings), 2)
+        [merged] = dedupe(findings)
+        self.assertEqual(merged.tool, "ggshield,trufflehog")
+        self.assertEqual(merged.severity, "critical")
+        self.assertEqual(merged.extra["raw"], "AKIAEXAMPLE")
+
+    def test_raw_secrets_are_never_serialized(self):
+        findings = parse_trufflehog(TRUFFLEHOG_OUTPUT, root=ROOT)
+        self.assertNotIn("AKIAEXAMPLE", findings_to_json(findings))
+        self.assertNotIn("AKIAEXAMPLE", json.dumps(group_by_file(findings)))
+        [restored] = findings_from_json(findings_to_json(findings))
+        self.assertNotIn("raw", restored.extra)
+        self.assertEqual(restored.extra["secret_length"], len("AKIAEXAMPLE"))
+
+
+class TestSummaryAndExport(unittest.TestCase):
+
+    def setUp(self):
+        self.findings = [
+            Finding("pmd", f"Rule{i}", "low", f"src/File{i}.java", i, "minor issue", "code") for i in range(50)
+        ] + [Finding("snyk", "SNYK-1", "critical", "pom.xml", None, "log4j-core@2.14.1: RCE", "dependency")]
+
+    def test_summary_is_ranked_and_bounded(self):
+        summary = summarize(self.findings, token_budget=100, root=ROOT)
+        lines = summary.splitlines()
+        self.assertEqual(lines[0], "51 findings (1 critical, 50 low)")
+        self.assertTrue(lines[1].startswith("[CRITICAL] SNYK-1 (snyk) Location: /tmp/repo/pom.xml"))
+        self.assertRegex(lines[-1], r"^\.\.\. \d+ more findings not shown \(\d+ low\)$")
+        self.assertLessEqual(len(summary), 100 * 4 + len(lines[-1]) + 1)
+
+    def test_to_sarif(self):
+        sarif = to_sarif(self.findings)
+        self.assertEqual(sarif["version"], "2.1.0")
+        runs = {run["tool"]["driver"]["name"]: run for run in sarif["runs"]}
+        self.assertEqual(len(runs["pmd"]["results"]), 50)
+        self.assertEqual(runs["snyk"]["results"][0]["level"], "error")
+        self.assertNotIn("region", runs["snyk"]["results"][0]["locations"][0]["physicalLocation"])
+
+
+if __name__ == '__main__':
+    unittest.main()
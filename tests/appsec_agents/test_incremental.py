@@ -0,0 +1,115 @@
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+from unittest import mock
+from src.appsec_agents.incremental import IncrementalScan
+
+GIT_IDENTITY = {"GIT_AUTHOR_NAME": "test", "GIT_AUTHOR_EMAIL": "test@example.com",
+                "GIT_COMMITTER_NAME": "test", "GIT_COMMITTER_EMAIL": "test@example.com"}
+
+
+def git(*args):
+    return subprocess.run(["git", *args], check=True, capture_output=True, text=True).stdout.strip()
+
+
+class TestIncrementalScan(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        env = mock.patch.dict(os.environ, GIT_IDENTITY)
+        env.start()
+        self.addCleanup(env.stop)
+        self.repo = os.path.join(self.root, "repo")
+        self.state_dir = os.path.join(self.root, "state")
+        git("init", "-q", self.repo)
+        self.commit({"a.py": "a = 1\n", "b.py": "b = 1\n", "docs/c.md": "c\n"}, "initial")
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def write(self, files):
+        for name, content in files.items():
+            path = os.path.join(self.repo, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as f:
+                f.write(content)
+
+    def commit(self, files, message):
+        self.write(files)
+        git("-C", self.repo, "add", "-A")
+        git("-C", self.repo, "commit", "-q", "-m", message)
+
+    def scan(self):
+        return IncrementalScan.for_repo("tool", self.repo, args=["--json"], state_dir=self.state_dir)
+
+    def results(self):
+        return {name: [f"{os.path.join(self.repo, name)}:1 issue"] for name in ("a.py", "b.py", "docs/c.md")}
+
+    def test_watermark_advances_on_a_clean_tree(self):
+        first = self.scan()
+        self.assertTrue(first.full)
+        first.save(self.results())
+
+        with open(first.state_path) as f:
+            state = json.load(f)
+        self.assertEqual(state["commit"], git("-C", self.repo, "rev-parse", "HEAD"))
+        self.assertNotIn(self.repo, json.dumps(state))  # Stored relative to the checkout
+
+        second = self.scan()
+        self.assertFalse(second.full)
+        self.assertEqual(second.changed, set())
+        self.assertEqual(second.merge({}), self.results())
+
+    def test_dirty_tree_is_never_saved(self):
+        self.scan().save(self.results())
+        self.commit({"a.py": "a = 2\n"}, "change a")
+        self.write({"untracked.py": "x = 1\n"})
+
+        scan = self.scan()
+        self.assertFalse(scan.clean)
+        self.assertEqual(scan.changed, {"a.py", "untracked.py"})
+        scan.save({})
+
+        with open(scan.state_path) as f:
+            self.assertEqual(json.load(f)["commit"], git("-C", self.repo, "rev-parse", "HEAD~1"))
+
+    def test_unreachable_watermark_falls_back_to_a_full_scan(self):
+        self.commit({"a.py": "a = 2\n"}, "pushed")
+        self.scan().save(self.results())
+
+        # Force push: the watermark commit is rewritten and garbage collected
+        git("-C", self.repo, "reset", "-q", "--hard", "HEAD~1")
+        self.commit({"a.py": "a = 3\n"}, "rewritten")
+        git("-C", self.repo, "reflog", "expire", "--expire=now", "--all")
+        git("-C", self.repo, "gc", "-q", "--prune=now")
+
+        scan = self.scan()
+        self.assertTrue(scan.full)
+        self.assertEqual(scan.merge({"a.py": ["fresh"]}), {"a.py": ["fresh"]})
+
+    def test_merge_drops_deleted_and_changed_files(self):
+        self.scan().save(self.results())
+        os.remove(os.path.join(self.repo, "b.py"))
+        self.commit({"a.py": "a = 2\n"}, "change a, delete b")
+
+        scan = self.scan()
+        self.assertEqual(scan.changed, {"a.py", "b.py"})
+        merged = scan.merge({"a.py": ["a.py:1 fresh"]})
+        self.assertEqual(merged, {"a.py": ["a.py:1 fresh"], "docs/c.md": self.results()["docs/c.md"]})
+
+    def test_changed_paths_are_filtered_and_exclude_deleted_files(self):
+        self.scan().save(self.results())
+        os.remove(os.path.join(self.repo, "b.py"))
+        self.commit({"a.py": "a = 2\n", "docs/c.md": "c2\n", "docs/d.py": "d = 1\n"}, "changes")
+
+        scan = self.scan()
+        self.assertEqual(scan.changed_paths(), [os.path.join(self.repo, p) for p in ("a.py", "docs/c.md", "docs/d.py")])
+        self.assertEqual(scan.changed_paths(suffixes=[".py"]), [os.path.join(self.repo, p) for p in ("a.py", "docs/d.py")])
+        self.assertEqual(scan.changed_paths(suffixes=[".py"], prefix="docs/"), [os.path.join(self.repo, "docs/d.py")])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import os
+import shutil
+import tempfile
+import unittest
+from src.appsec_agents.java_sources import SourceRoot, discover_source_roots, plan_shards
+
+
+class TestJavaSources(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def write(self, rel_path, count=1):
+        directory = os.path.join(self.root, rel_path)
+        os.makedirs(directory, exist_ok=True)
+        for i in range(count):
+            with open(os.path.join(directory, f"C{i}.java"), "w") as f:
+                f.write("class C {}\n")
+
+    def test_discovers_every_module(self):
+        self.write("src/main/java/com/example", 2)
+        self.write("services/api/src/main/java/com/example", 3)
+        self.write("services/api/src/test/java/com/example", 5)
+        self.write("services/api/target/generated-sources/src/main/java")
+        self.write("libs/empty/src/main/resources")
+
+        roots = discover_source_roots(self.root)
+
+        self.assertEqual([(r.path, r.files) for r in roots],
+                         [("services/api/src/main/java", 3), ("src/main/java", 2)])
+
+    def test_falls_back_to_repository_root(self):
+        self.write("app", 2)
+        self.assertEqual([(r.path, r.files) for r in discover_source_roots(self.root)], [(".", 2)])
+        self.assertEqual(discover_source_roots(tempfile.mkdtemp(dir=self.root)), [])
+
+    def test_plan_shards_balances_files(self):
+        roots = [SourceRoot(f"m{i}/src/main/java", files) for i, files in enumerate([900, 500, 400, 300, 100])]
+
+        shards = plan_shards(roots, max_shards=2, files_per_shard=500)
+
+        self.assertEqual(sorted(shard.files for shard in shards), [1000, 1200])
+        self.assertEqual(len(plan_shards(roots, max_shards=8, files_per_shard=10000)), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
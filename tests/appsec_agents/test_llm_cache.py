@@ -0,0 +1,70 @@
+import os
+import shutil
+import tempfile
+import unittest
+from src.appsec_agents.llm_cache import LLMCacheMiss, LLMResponseCache, placeholders
+
+
+class TestLLMResponseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.cache = LLMResponseCache(os.path.join(self.root, "llm"))
+        self.calls = []
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def call(self, response):
+        def run():
+            self.calls.append(response)
+            return response
+        return run
+
+    def messages(self, path):
+        return [{"role": "system", "content": "You are a static analyzer.  \n"},
+                {"role": "user", "content": f"Explain UnusedLocalVariable in {path}/src/Main.java"}]
+
+    def test_repeated_prompt_is_served_from_disk(self):
+        first = self.cache.complete("static_analyzer", "gpt-4o-mini", self.messages("/w/1"), self.call("answer"))
+        second = self.cache.complete("static_analyzer", "gpt-4o-mini", self.messages("/w/1"), self.call("other"))
+        self.assertEqual((first, second), ("answer", "answer"))
+        self.assertEqual(self.calls, ["answer"])
+        self.assertEqual(self.cache.agent_stats()["static_analyzer"], {"hits": 1, "misses": 1, "hit_rate": 0.5})
+
+    def test_key_ignores_workspace_and_whitespace_but_not_model_or_tools(self):
+        key = self.cache.key("m", self.messages("/w/run-1"), substitutions={"/w/run-1": "<local_path>"})
+        messages = self.messages("/w/run-2")
+        messages[0]["content"] = "  You are a static analyzer."
+        self.assertEqual(key, self.cache.key("m", messages, substitutions={"/w/run-2": "<local_path>"}))
+        self.assertNotEqual(key, self.cache.key("other", self.messages("/w/run-1"),
+                                                substitutions={"/w/run-1": "<local_path>"}))
+        self.assertNotEqual(key, self.cache.key("m", self.messages("/w/run-1"), tools=[{"name": "pmd"}],
+                                                substitutions={"/w/run-1": "<local_path>"}))
+
+    def test_response_paths_follow_the_current_checkout(self):
+        inputs = {"local_path": "/tmp/workspace-one", "commit": "HEAD"}
+        self.cache.complete("a", "m", self.messages(inputs["local_path"]),
+                            self.call("See /tmp/workspace-one/src/Main.java:3"), substitutions=placeholders(inputs))
+        other = placeholders({"local_path": "/tmp/workspace-two"})
+        response = self.cache.complete("a", "m", self.messages("/tmp/workspace-two"), self.call("miss"),
+                                       substitutions=other)
+        self.assertEqual(response, "See /tmp/workspace-two/src/Main.java:3")
+        self.assertNotIn("HEAD", placeholders(inputs))
+
+    def test_expired_entries_are_misses(self):
+        cache = LLMResponseCache(os.path.join(self.root, "ttl"), ttl=-1)
+        cache.complete("a", "m", "prompt", self.call("one"))
+        self.assertEqual(cache.complete("a", "m", "prompt", self.call("two")), "two")
+
+    def test_replay_mode_raises_on_miss_and_serves_hits(self):
+        self.cache.complete("a", "m", "recorded", self.call("answer"))
+        replay = LLMResponseCache(self.cache.cache_dir, mode="replay")
+        self.assertEqual(replay.complete("a", "m", "recorded", self.call("live")), "answer")
+        with self.assertRaises(LLMCacheMiss):
+            replay.complete("a", "m", "new prompt", self.call("live"))
+        self.assertEqual(self.calls, ["answer"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+import json
+import logging
+import sys
+import unittest
+from src.appsec_agents.logging_config import JsonFormatter
+
+
+class TestJsonFormatter(unittest.TestCase):
+
+    def record(self, **kwargs):
+        return logging.LogRecord("appsec_agents.batch", logging.WARNING, __file__, 1, "scanned %s", ("repo",),
+                                 **kwargs)
+
+    def test_formats_one_json_object_with_extra_fields(self):
+        record = self.record(exc_info=None)
+        record.repo = "https://example.com/repo.git"
+        entry = json.loads(JsonFormatter().format(record))
+
+        self.assertEqual(entry["message"], "scanned repo")
+        self.assertEqual((entry["level"], entry["logger"]), ("WARNING", "appsec_agents.batch"))
+        self.assertEqual(entry["repo"], "https://example.com/repo.git")
+        self.assertNotIn("args", entry)
+
+    def test_includes_the_traceback(self):
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            record = self.record(exc_info=sys.exc_info())
+        output = JsonFormatter().format(record)
+
+        self.assertEqual(len(output.splitlines()), 1)
+        self.assertIn("ValueError: boom", json.loads(output)["exception"])
+
+
+if __name__ == '__main__':
+    unittest.main()
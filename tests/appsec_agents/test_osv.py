@@ -0,0 +1,113 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from src.appsec_agents.lockfiles import parse_lockfile
+from src.appsec_agents.osv import OsvIndex, version_key
+
+
+def advisory(advisory_id, ecosystem, name, events, modified="2024-01-01T00:00:00Z", severity="HIGH", **extra):
+    return {
+        "id": advisory_id, "modified": modified, "summary": f"{advisory_id} summary",
+        "database_specific": {"severity": severity},
+        "affected": [{"package": {"ecosystem": ecosystem, "name": name},
+                      "ranges": [{"type": "ECOSYSTEM", "events": events}]}],
+        **extra,
+    }
+
+
+class TestVersionKey(unittest.TestCase):
+
+    def test_ordering(self):
+        ordered = ["1.0.0-alpha", "1.0.0-beta.2", "1.0.0rc1", "1.0", "1.0.0.post1", "1.0.1", "1.10", "v2.0.0"]
+        self.assertEqual(sorted(ordered, key=version_key), ordered)
+        self.assertEqual(version_key("1.0"), version_key("1.0.0"))
+        self.assertEqual(version_key("2.14.1-SNAPSHOT") < version_key("2.14.1"), True)
+
+
+class TestOsvIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.index = OsvIndex(os.path.join(self.root, "index.sqlite"))
+        self.dump = os.path.join(self.root, "dump")
+        os.makedirs(self.dump)
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def write_dump(self, name, advisories):
+        with open(os.path.join(self.dump, name), "w") as f:
+            json.dump(advisories, f)
+
+    def test_lookup_matches_precompiled_ranges(self):
+        self.write_dump("npm.json", [
+            advisory("GHSA-1", "npm", "lodash", [{"introduced": "0"}, {"fixed": "4.17.21"}]),
+            advisory("GHSA-2", "PyPI", "Django", [{"introduced": "4.0"}, {"last_affected": "4.1.2"}], severity="MODERATE"),
+        ])
+        self.assertEqual(self.index.ingest([self.dump]), 2)
+
+        npm = self.index.lookup("npm", [("lodash", "4.17.15"), ("lodash", "4.17.21"), ("express", "4.0.0")])
+        self.assertEqual(list(npm), [("lodash", "4.17.15")])
+        self.assertEqual(npm[("lodash", "4.17.15")][0].fixed, ["4.17.21"])
+
+        pypi = self.index.lookup("pypi", [("django", "4.1.2"), ("django", "4.1.3"), ("django", "3.2")])
+        self.assertEqual(list(pypi), [("django", "4.1.2")])
+        self.assertEqual(pypi[("django", "4.1.2")][0].severity, "medium")
+
+    def test_incremental_ingest(self):
+        self.write_dump("a.json", [advisory("GHSA-1", "npm", "lodash", [{"introduced": "0"}, {"fixed": "4.17.21"}])])
+        self.index.ingest([self.dump])
+        version = self.index.version()
+        self.assertEqual(self.index.ingest([self.dump]), 0)
+        self.assertEqual(self.index.version(), version)
+
+        # A newer revision narrows the range; a withdrawn advisory disappears
+        self.write_dump("b.json", [
+            advisory("GHSA-1", "npm", "lodash", [{"introduced": "4.0.0"}, {"fixed": "4.17.21"}],
+                     modified="2024-02-01T00:00:00Z"),
+            advisory("GHSA-3", "npm", "minimist", [{"introduced": "0"}], withdrawn="2024-02-01T00:00:00Z"),
+        ])
+        self.assertEqual(self.index.ingest([self.dump]), 2)
+        self.assertNotEqual(self.index.version(), version)
+        self.assertEqual(self.index.lookup("npm", [("lodash", "3.10.1"), ("minimist", "1.2.0")]), {})
+        self.assertEqual(len(self.index), 1)
+
+
+class TestLockfiles(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def parse(self, name, content):
+        path = os.path.join(self.root, name)
+        with open(path, "w") as f:
+            f.write(content)
+        return parse_lockfile(path)
+
+    def test_package_lock(self):
+        lock = {"lockfileVersion": 3, "packages": {
+            "": {"name": "app"},
+            "node_modules/lodash": {"version": "4.17.15"},
+            "node_modules/a/node_modules/@scope/b": {"version": "1.0.0"},
+        }}
+        self.assertEqual(self.parse("package-lock.json", json.dumps(lock)),
+                         [("@scope/b", "1.0.0"), ("lodash", "4.17.15")])
+
+    def test_requirements_and_pom(self):
+        self.assertEqual(self.parse("requirements.txt", "Django==4.1.2\nrequests>=2\nuvicorn[standard]==0.22.0 ; python_version>'3'\n"),
+                         [("Django", "4.1.2"), ("uvicorn", "0.22.0")])
+        pom = """<project><properties><log4j.version>2.14.1</log4j.version></properties><dependencies>
+            <dependency><groupId>org.apache.logging.log4j</groupId><artifactId>log4j-core</artifactId>
+            <version>${log4j.version}</version></dependency>
+            <dependency><groupId>junit</groupId><artifactId>junit</artifactId></dependency>
+        </dependencies></project>"""
+        self.assertEqual(self.parse("pom.xml", pom), [("org.apache.logging.log4j:log4j-core", "2.14.1")])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from src.appsec_agents import patch_engine
+from src.appsec_agents.patch_engine import (BackupStore, ByteEdit, LineEdit, PatchError, apply_patch,
+                                            parse_unified_diff, replace_all)
+
+
+class TestPatchEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.path = os.path.join(self.root, "App.java")
+        self.backups = BackupStore(os.path.join(self.root, "backups"))
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def write(self, content):
+        with open(self.path, "wb") as f:
+            f.write(content)
+
+    def read(self):
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    def test_line_byte_and_diff_edits_apply_in_one_pass(self):
+        original = b"one\r\ntwo\r\nthree\r\nfour\r\nfive\r\n"
+        self.write(original)
+        diff = "--- a/App.java\n+++ b/App.java\n@@ -4,1 +4,2 @@\n-four\n+FOUR\n+4\n"
+
+        result = apply_patch(self.path, [LineEdit(2, 2, "TWO"), ByteEdit(0, 3, "ONE")] + parse_unified_diff(diff),
+                             expected_sha256=hashlib.sha256(original).hexdigest(), backup=self.backups)
+
+        self.assertEqual(self.read(), b"ONE\r\nTWO\r\nthree\r\nFOUR\r\n4\r\nfive\r\n")
+        self.assertEqual(result.new_sha256, hashlib.sha256(self.read()).hexdigest())
+        self.assertEqual(result.edits, 3)
+        with open(self.backups.object_path(result.backup), "rb") as f:
+            self.assertEqual(f.read(), original)
+
+    def test_rejected_patches_leave_the_file_untouched(self):
+        self.write(b"a\nb\nc\n")
+        cases = [
+            ([LineEdit(1, 1, "x")], "0" * 64),
+            ([LineEdit(1, 2, "x"), LineEdit(2, 3, "y")], None),
+            (parse_unified_diff("@@ -2,1 +2,1 @@\n-z\n+y\n"), None),
+            ([LineEdit(5, 5, "x")], None),
+        ]
+        for edits, expected in cases:
+            with self.subTest(edits=edits):
+                with self.assertRaises(PatchError):
+                    apply_patch(self.path, edits, expected_sha256=expected, backup=self.backups)
+                self.assertEqual(self.read(), b"a\nb\nc\n")
+        self.assertEqual(os.listdir(os.path.join(self.backups.root, "tmp")), [])
+        self.assertEqual(sorted(os.listdir(self.root)), ["App.java", "backups"])
+
+    def test_backups_are_content_addressed(self):
+        self.write(b"same\n")
+        first = apply_patch(self.path, [LineEdit(1, 1, "changed")], backup=self.backups)
+        self.write(b"same\n")
+        second = apply_patch(self.path, [LineEdit(1, 0, "inserted")], backup=self.backups)
+
+        self.assertEqual(first.backup, second.backup)
+        self.assertEqual(sum(len(files) for _, _, files in os.walk(os.path.join(self.backups.root, "objects"))), 1)
+        self.backups.restore(self.path, first.backup)
+        self.assertEqual(self.read(), b"same\n")
+
+    def test_replace_all_finds_matches_across_chunks(self):
+        self.write(b"xxtoken-yyytoken-token")
+        with mock.patch.object(patch_engine, "CHUNK_SIZE", 4):
+            result = replace_all(self.path, "token", "T")
+
+        self.assertEqual(self.read(), b"xxT-yyyT-T")
+        self.assertEqual(result.edits, 3)
+        self.assertIsNone(replace_all(self.path, "token", "T"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import os
+import shutil
+import stat
+import subprocess
+import tempfile
+import unittest
+from unittest import mock
+from src.appsec_agents.pull_requests import ChangeTracker, PullRequestPublisher, PushQueue
+
+GIT_IDENTITY = {"GIT_AUTHOR_NAME": "test", "GIT_AUTHOR_EMAIL": "test@example.com",
+                "GIT_COMMITTER_NAME": "test", "GIT_COMMITTER_EMAIL": "test@example.com"}
+
+
+def git(*args):
+    return subprocess.run(["git", *args], check=True, capture_output=True, text=True).stdout.strip()
+
+
+class TestPullRequestPublisher(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        env = mock.patch.dict(os.environ, GIT_IDENTITY)
+        env.start()
+        self.addCleanup(env.stop)
+        self.remote = os.path.join(self.root, "remote.git")
+        self.repo = os.path.join(self.root, "repo")
+        git("init", "-q", "--bare", self.remote)
+        git("clone", "-q", self.remote, self.repo)
+        for name in ("app.py", "config.yml"):
+            self.write(name, "original\n")
+        git("-C", self.repo, "add", ".")
+        git("-C", self.repo, "commit", "-q", "-m", "initial")
+        git("-C", self.repo, "push", "-q", "origin", "HEAD")
+
+        # Stub gh: logs its arguments, lists the URLs in gh.prs and prints the URL of a created pull request
+        self.gh_log = os.path.join(self.root, "gh.log")
+        self.gh_prs = os.path.join(self.root, "gh.prs")
+        self.gh = os.path.join(self.root, "gh")
+        with open(self.gh, "w") as f:
+            f.write(f'#!/bin/sh\necho "$@" >> {self.gh_log}\n'
+                    f'if [ "$2" = list ]; then cat {self.gh_prs} 2>/dev/null; exit 0; fi\n'
+                    f'echo https://example.com/pr/1\n')
+        os.chmod(self.gh, os.stat(self.gh).st_mode | stat.S_IEXEC)
+
+        self.tracker = ChangeTracker()
+        self.publisher = PullRequestPublisher(self.tracker, PushQueue(workers=1), [self.gh])
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def write(self, name, content):
+        with open(os.path.join(self.repo, name), "w") as f:
+            f.write(content)
+
+    def test_batches_tracked_changes_into_one_commit_and_pr(self):
+        cwd = os.getcwd()
+        self.write("app.py", "fixed\n")
+        self.write("config.yml", "fixed\n")
+        self.write("scratch.txt", "not part of the fix\n")
+        self.tracker.record([os.path.join(self.repo, "app.py")], "Fix app.py")
+        self.tracker.record([os.path.join(self.repo, "config.yml")], "Fix config.yml")
+
+        url = self.publisher.publish(self.repo, "fix-secrets", "Remediate secrets", "Fix secrets", "body")
+
+        self.assertEqual(url, "https://example.com/pr/1")
+        self.assertEqual(os.getcwd(), cwd)
+        self.assertEqual(git("-C", self.remote, "log", "--format=%s", "fix-secrets"), "Remediate secrets\ninitial")
+        self.assertEqual(git("-C", self.remote, "show", "--name-only", "--format=%b", "fix-secrets").split(),
+                         ["-", "Fix", "app.py", "-", "Fix", "config.yml", "app.py", "config.yml"])
+        self.assertIn("?? scratch.txt", git("-C", self.repo, "status", "--porcelain"))
+
+        # A second batch on the same branch updates the existing pull request
+        self.write("app.py", "fixed again\n")
+        self.tracker.record([os.path.join(self.repo, "app.py")], "Fix app.py again")
+        self.assertEqual(self.publisher.publish(self.repo, "fix-secrets", "More fixes", "t", "b"), url)
+        self.assertEqual(git("-C", self.remote, "rev-list", "--count", "fix-secrets"), "3")
+        with open(self.gh_log) as f:
+            self.assertEqual([line.split()[:2] for line in f], [["pr", "list"], ["pr", "create"]])
+
+    def test_existing_branch_and_pull_request_of_an_earlier_run_are_reused(self):
+        self.write("app.py", "fixed\n")
+        self.publisher.publish(self.repo, "fix-secrets", "First run", "t", "b", paths=["app.py"])
+        git("-C", self.repo, "checkout", "-q", "-")
+        with open(self.gh_prs, "w") as f:
+            f.write("https://example.com/pr/7\n")
+
+        # A new process: nothing is known about the pull request opened before
+        publisher = PullRequestPublisher(ChangeTracker(), PushQueue(workers=1), [self.gh])
+        self.write("config.yml", "fixed\n")
+        url = publisher.publish(self.repo, "fix-secrets", "Second run", "t", "b", paths=["config.yml"])
+
+        self.assertEqual(url, "https://example.com/pr/7")
+        self.assertEqual(git("-C", self.remote, "log", "--format=%s", "fix-secrets"), "Second run\nFirst run\ninitial")
+        with open(self.gh_log) as f:
+            self.assertEqual([line.split()[1] for line in f], ["list", "create", "list"])
+
+    def test_nothing_to_commit_is_an_error(self):
+        with self.assertRaises(ValueError):
+            self.publisher.publish(self.repo, "fix", "msg", "title", "body")
+
+
+if __name__ == '__main__':
+    unittest.main()
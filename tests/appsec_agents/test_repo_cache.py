@@ -0,0 +1,90 @@
+import os
+import subprocess
+import tempfile
+import unittest
+from src.appsec_agents.repo_cache import RepoMirrorCache
+
+
+def git(cwd, *args):
+    return subprocess.run(["git", *args], cwd=cwd, check=True, stdout=subprocess.PIPE,
+                          stderr=subprocess.PIPE, text=True).stdout.strip()
+
+
+class TestRepoMirrorCache(unittest.TestCase):
+    """Runs entirely offline against a local upstream repository served over file://."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.upstream = os.path.join(self.tmp.name, "upstream")
+        os.makedirs(self.upstream)
+        git(self.upstream, "init", "-q", "-b", "main")
+        git(self.upstream, "config", "user.email", "test@example.com")
+        git(self.upstream, "config", "user.name", "Test")
+        for i in range(3):
+            self.commit(f"file{i}.txt", f"content {i}\n")
+        self.repo_url = "file://" + self.upstream
+        self.cache = RepoMirrorCache(os.path.join(self.tmp.name, "mirrors"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def commit(self, name, content):
+        with open(os.path.join(self.upstream, name), "w") as f:
+            f.write(content)
+        git(self.upstream, "add", name)
+        git(self.upstream, "commit", "-q", "-m", f"add {name}")
+
+    def workspace(self, name):
+        return os.path.join(self.tmp.name, name)
+
+    def test_full_checkout_shares_objects_with_mirror(self):
+        path = self.workspace("full")
+        self.cache.checkout(self.repo_url, path)
+        self.assertTrue(os.path.exists(os.path.join(path, "file2.txt")))
+        self.assertEqual(git(path, "rev-list", "--count", "HEAD"), "3")
+        self.assertEqual(git(path, "remote", "get-url", "origin"), self.repo_url)
+        alternates = os.path.join(path, ".git", "objects", "info", "alternates")
+        self.assertTrue(os.path.exists(alternates))
+
+    def test_incremental_fetch_picks_up_new_commits(self):
+        self.cache.checkout(self.repo_url, self.workspace("first"))
+        self.commit("new.txt", "new\n")
+        path = self.workspace("second")
+        self.cache.checkout(self.repo_url, path)
+        self.assertTrue(os.path.exists(os.path.join(path, "new.txt")))
+        self.assertEqual(git(self.cache.mirror_path(self.repo_url), "rev-parse", "main"),
+                         git(self.upstream, "rev-parse", "HEAD"))
+
+    def test_shallow_checkout(self):
+        path = self.workspace("shallow")
+        self.cache.checkout(self.repo_url, path, depth=1)
+        self.assertEqual(git(path, "rev-list", "--count", "HEAD"), "1")
+
+    def test_partial_checkout(self):
+        path = self.workspace("partial")
+        self.cache.checkout(self.repo_url, path, partial=True)
+        self.assertEqual(git(path, "config", "remote.mirror.partialclonefilter"), "blob:none")
+        self.assertEqual(git(path, "remote", "get-url", "origin"), self.repo_url)
+        self.assertTrue(os.path.exists(os.path.join(path, "file0.txt")))
+
+    def test_partial_checkout_fetches_blobs_from_the_mirror_offline(self):
+        self.commit("file0.txt", "changed\n")
+        path = self.workspace("partial")
+        self.cache.checkout(self.repo_url, path, partial=True)
+
+        # The upstream is gone; the old version of file0.txt was never fetched into the checkout
+        os.rename(self.upstream, self.upstream + "-offline")
+        self.assertEqual(git(path, "cat-file", "-p", "HEAD~1:file0.txt"), "content 0")
+
+    def test_worktree_checkout_replaces_existing_directory(self):
+        path = self.workspace("worktree")
+        os.makedirs(path)
+        with open(os.path.join(path, "stale.txt"), "w") as f:
+            f.write("stale")
+        self.cache.checkout(self.repo_url, path, worktree=True)
+        self.assertFalse(os.path.exists(os.path.join(path, "stale.txt")))
+        self.assertTrue(os.path.exists(os.path.join(path, "file1.txt")))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+from src.appsec_agents.runner import run_command
+
+
+def python(code):
+    return [sys.executable, "-c", code]
+
+
+class TestRunCommand(unittest.TestCase):
+
+    def test_streams_lines_from_both_pipes(self):
+        lines = []
+        result = run_command(
+            python("import sys\nprint('out')\nprint('err', file=sys.stderr)\nsys.stdout.write('tail')"),
+            on_line=lambda stream, line: lines.append((stream, line)))
+        self.assertEqual(result.returncode, 0)
+        self.assertEqual(result.stdout, "out\ntail")
+        self.assertEqual(result.stderr, "err\n")
+        self.assertIn(("stdout", "out"), lines)
+        self.assertIn(("stdout", "tail"), lines)
+        self.assertIn(("stderr", "err"), lines)
+
+    def test_large_output_on_both_pipes_does_not_deadlock(self):
+        result = run_command(python(
+            "import sys\nsys.stderr.write('e' * 2000000)\nsys.stdout.write('o' * 2000000)"))
+        self.assertEqual(len(result.stdout), 2000000)
+        self.assertEqual(len(result.stderr), 2000000)
+
+    def test_spills_to_disk_above_threshold(self):
+        result = run_command(python("print('x' * 10000)"), spill_threshold=1000)
+        self.assertIsNotNone(result.stdout_path)
+        with result.open_stdout() as f:
+            self.assertEqual(f.read(), "x" * 10000 + "\n")
+        result.cleanup()
+        self.assertIsNone(result.stdout_path)
+
+    def test_timeout_terminates_then_kills(self):
+        start = time.monotonic()
+        result = run_command(python(
+            "import signal, time\nsignal.signal(signal.SIGTERM, signal.SIG_IGN)\nprint('ready', flush=True)\ntime.sleep(30)"),
+            timeout=0.5, grace_period=0.5)
+        self.assertTrue(result.timed_out)
+        self.assertNotEqual(result.returncode, 0)
+        self.assertLess(time.monotonic() - start, 10)
+
+    def test_records_duration_and_peak_rss(self):
+        result = run_command(python("pass"))
+        self.assertGreater(result.duration, 0)
+        if sys.platform != "win32":
+            self.assertGreater(result.peak_rss, 0)
+
+    def test_check_raises_on_failure(self):
+        with self.assertRaises(subprocess.CalledProcessError):
+            run_command(python("import sys; sys.exit(3)"), check=True)
+
+    def test_check_removes_spill_files_of_a_failed_command(self):
+        with tempfile.TemporaryDirectory() as spill_dir, mock.patch.object(tempfile, "tempdir", spill_dir):
+            with self.assertRaises(subprocess.CalledProcessError) as raised:
+                run_command(python("import sys; print('x' * 10000); sys.exit(3)"), spill_threshold=1000, check=True)
+            self.assertEqual(len(raised.exception.stdout), 10001)
+            self.assertEqual(os.listdir(spill_dir), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import os
+import shutil
+import stat
+import subprocess
+import tempfile
+import time
+import unittest
+from unittest import mock
+from src.appsec_agents.scan_cache import DiskLRUCache, ScanResultCache, tool_version, tree_sha
+
+GIT_IDENTITY = {"GIT_AUTHOR_NAME": "test", "GIT_AUTHOR_EMAIL": "test@example.com",
+                "GIT_COMMITTER_NAME": "test", "GIT_COMMITTER_EMAIL": "test@example.com"}
+
+
+def git(*args):
+    return subprocess.run(["git", *args], check=True, capture_output=True, text=True).stdout.strip()
+
+
+class TestScanResultCache(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        env = mock.patch.dict(os.environ, GIT_IDENTITY)
+        env.start()
+        self.addCleanup(env.stop)
+        self.upstream = os.path.join(self.root, "upstream")
+        git("init", "-q", self.upstream)
+        with open(os.path.join(self.upstream, "app.py"), "w") as f:
+            f.write("print('hello')\n")
+        git("-C", self.upstream, "add", ".")
+        git("-C", self.upstream, "commit", "-q", "-m", "initial")
+        self.cache = ScanResultCache(os.path.join(self.root, "cache"))
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def clone(self, name):
+        path = os.path.join(self.root, name)
+        git("clone", "-q", self.upstream, path)
+        return path
+
+    def test_tree_sha_is_none_for_dirty_trees_and_non_repositories(self):
+        self.assertEqual(tree_sha(self.upstream), git("-C", self.upstream, "rev-parse", "HEAD^{tree}"))
+        with open(os.path.join(self.upstream, "new.py"), "w") as f:
+            f.write("x = 1\n")
+        self.assertIsNone(tree_sha(self.upstream))
+        os.remove(os.path.join(self.upstream, "new.py"))
+        with open(os.path.join(self.upstream, "app.py"), "a") as f:
+            f.write("x = 1\n")
+        self.assertIsNone(tree_sha(self.upstream))
+        self.assertIsNone(tree_sha(os.path.join(self.root, "missing")))
+
+    def test_results_are_shared_between_checkouts_of_the_same_tree(self):
+        first, second = self.clone("run1"), self.clone("run2")
+        key = self.cache.key("tool", first, "git", ["scan", first])
+        self.assertIsNotNone(key)
+        self.assertEqual(self.cache.key("tool", second, "git", ["scan", second]), key)
+        self.assertNotEqual(self.cache.key("tool", second, "git", ["scan", "--all", second]), key)
+
+        self.cache.put_result(key, f"{first}/app.py:1 issue", first)
+        self.assertEqual(self.cache.get_result(key, second), f"{second}/app.py:1 issue")
+        self.assertEqual(self.cache.stats()["hits"], 1)
+
+        with open(os.path.join(second, "app.py"), "a") as f:
+            f.write("x = 1\n")
+        self.assertIsNone(self.cache.key("tool", second, "git", ["scan", second]))
+        self.assertIsNone(self.cache.get_result(None, second))
+
+    def test_tool_version_is_the_first_line_of_version_output(self):
+        bin_dir = os.path.join(self.root, "bin")
+        os.makedirs(bin_dir)
+        path = os.path.join(bin_dir, "scanner-under-test")
+        with open(path, "w") as f:
+            f.write("#!/bin/sh\necho 'scanner 1.2.3'\necho 'build abc'\n")
+        os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR)
+        with mock.patch.dict(os.environ, {"PATH": bin_dir + os.pathsep + os.environ["PATH"]}):
+            self.assertEqual(tool_version("scanner-under-test"), "scanner 1.2.3")
+            self.assertEqual(tool_version("no-such-scanner-under-test"), "unknown")
+
+
+class TestDiskLRUCache(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def age(self, cache, key, seconds):
+        then = time.time() - seconds
+        os.utime(cache._path(key), (then, then))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = DiskLRUCache(self.root, max_bytes=10 ** 6)
+        for key in ("aa1", "bb2", "cc3"):
+            cache.put(key, "x" * 100)
+        self.age(cache, "aa1", 30)
+        self.age(cache, "bb2", 20)
+        self.age(cache, "cc3", 10)
+        self.assertEqual(cache.get("aa1"), "x" * 100)  # Touched, now the most recently used
+
+        # Room for two entries; sizes differ by a few bytes with the timestamp
+        cache.max_bytes = cache.stats()["bytes"] * 2 // 3 + 10
+        self.assertEqual(cache.evict(), 1)
+        self.assertEqual([os.path.exists(cache._path(k)) for k in ("aa1", "bb2", "cc3")], [True, False, True])
+
+        cache.put("dd4", "x" * 100)  # Over the limit again, the oldest entry goes
+        self.assertIsNone(cache.get("cc3"))
+        self.assertEqual(cache.stats()["entries"], 2)
+
+    def test_expired_entries_are_missing(self):
+        cache = DiskLRUCache(self.root, ttl=60)
+        cache.put("aa1", {"value": 1})
+        self.assertEqual(cache.get("aa1"), {"value": 1})
+        with open(cache._path("aa1"), "w") as f:
+            f.write('{"created": %f, "value": 1}' % (time.time() - 120))
+        self.assertIsNone(cache.get("aa1"))
+        self.assertFalse(os.path.exists(cache._path("aa1")))
+
+
+if __name__ == '__main__':
+    unittest.main()
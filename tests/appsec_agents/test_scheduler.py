@@ -0,0 +1,100 @@
+import threading
+import time
+import unittest
+from src.appsec_agents.scheduler import DagScheduler, TaskGraph
+
+
+class TestTaskGraph(unittest.TestCase):
+
+    def test_from_config_accepts_string_and_list(self):
+        tasks_config = {
+            'clone': {},
+            'scan_a': {'depends_on': 'clone'},
+            'scan_b': {'depends_on': 'clone'},
+            'fix': {'depends_on': ['scan_a', 'scan_b']},
+            'unused': {},
+        }
+        graph = TaskGraph.from_config(tasks_config, ['clone', 'scan_a', 'scan_b', 'fix'])
+        self.assertEqual(graph.order, ['clone', 'scan_a', 'scan_b', 'fix'])
+        self.assertEqual(graph.ready({'clone'}, {'clone'}), ['scan_a', 'scan_b'])
+
+    def test_cycle_is_rejected(self):
+        with self.assertRaises(ValueError):
+            TaskGraph({'a': ['b'], 'b': ['a']})
+
+    def test_unknown_dependency_is_rejected(self):
+        with self.assertRaises(ValueError):
+            TaskGraph({'a': ['missing']})
+
+
+class TestDagScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.graph = TaskGraph({
+            'clone': [],
+            'scan_a': ['clone'],
+            'scan_b': ['clone'],
+            'scan_c': ['clone'],
+            'fix': ['scan_a', 'scan_b', 'scan_c'],
+        })
+
+    def test_independent_tasks_run_concurrently(self):
+        barrier = threading.Barrier(3, timeout=5)
+
+        def execute(name, upstream):
+            if name.startswith('scan'):
+                barrier.wait()  # Only passes if all three scans run at the same time
+            return f"{name}({','.join(sorted(upstream))})"
+
+        result = DagScheduler(self.graph, max_workers=3).run(execute)
+        self.assertEqual(result.final_output, 'fix(scan_a,scan_b,scan_c)')
+        self.assertEqual(result.outputs['scan_b'], 'scan_b(clone)')
+        self.assertEqual(len(result.timings), 5)
+        timings = {t.name: t for t in result.timings}
+        self.assertGreaterEqual(timings['fix'].started_at, timings['scan_c'].finished_at)
+
+    def test_max_workers_bounds_concurrency(self):
+        lock = threading.Lock()
+        active = []
+        peak = []
+
+        def execute(name, upstream):
+            with lock:
+                active.append(name)
+                peak.append(len(active))
+            time.sleep(0.05)
+            with lock:
+                active.remove(name)
+
+        DagScheduler(self.graph, max_workers=2).run(execute)
+        self.assertEqual(max(peak), 2)
+
+    def test_failure_stops_dependents(self):
+        executed = []
+
+        def execute(name, upstream):
+            executed.append(name)
+            if name == 'scan_a':
+                raise RuntimeError('scanner crashed')
+
+        with self.assertRaises(RuntimeError):
+            DagScheduler(self.graph, max_workers=1).run(execute)
+        self.assertNotIn('fix', executed)
+
+    def test_completed_tasks_are_not_run_again(self):
+        executed, finished = [], []
+        completed = {'clone': 'clone()', 'scan_a': 'scan_a(clone)', 'scan_b': 'scan_b(clone)'}
+
+        def execute(name, upstream):
+            executed.append(name)
+            return f"{name}({','.join(upstream[dep] for dep in sorted(upstream))})"
+
+        result = DagScheduler(self.graph, max_workers=2).run(
+            execute, completed=completed, on_done=lambda name, output: finished.append(name))
+        self.assertEqual(executed, ['scan_c', 'fix'])
+        self.assertEqual(finished, ['scan_c', 'fix'])
+        self.assertEqual(result.final_output, 'fix(scan_a(clone),scan_b(clone),scan_c(clone()))')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from src.appsec_agents.findings import Finding, findings_from_json, findings_to_json, parse_trufflehog
+from src.appsec_agents.secret_remediation import WindowEdit, apply_window_edits, remediate_file
+
+
+def secret(file, line, raw, rule="AWS"):
+    return Finding("trufflehog", rule, "high", file, line, f"{rule} secret", "secret", extra={"raw": raw})
+
+
+class TestSecretRemediation(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def write(self, rel_path, content):
+        with open(os.path.join(self.root, rel_path), "w") as f:
+            f.write(content)
+
+    def read(self, rel_path):
+        with open(os.path.join(self.root, rel_path)) as f:
+            return f.read()
+
+    def test_fixes_all_literals_of_a_file_in_one_write(self):
+        self.write("settings.py", '"""Settings."""\nfrom __future__ import annotations\n'
+                                  'AWS_KEY = "AKIAEXAMPLE"\nclient = connect(apiToken="tok_123")\n')
+
+        result = remediate_file(self.root, "settings.py", [
+            secret("settings.py", 3, "AKIAEXAMPLE"), secret("settings.py", 4, "tok_123", rule="Generic")])
+
+        self.assertTrue(result.written)
+        self.assertEqual(result.windows, [])
+        self.assertEqual([(f.line, f.env_var) for f in result.fixes], [(4, "AWS_KEY"), (5, "API_TOKEN")])
+        self.assertEqual(self.read("settings.py"),
+                         '"""Settings."""\nfrom __future__ import annotations\nimport os\n'
+                         'AWS_KEY = os.environ.get("AWS_KEY")\nclient = connect(apiToken=os.environ.get("API_TOKEN"))\n')
+
+    def test_secret_of_a_restored_finding_is_found_again_on_its_line(self):
+        self.write("settings.py", 'import os\nAWS_KEY = "AKIAEXAMPLE"\n')
+        output = json.dumps({"DetectorName": "AWS", "Verified": True, "Raw": "AKIAEXAMPLE", "SourceMetadata": {
+            "Data": {"Filesystem": {"file": os.path.join(self.root, "settings.py"), "line": 2}}}})
+        [finding] = findings_from_json(findings_to_json(parse_trufflehog(output, root=self.root)))
+
+        result = remediate_file(self.root, "settings.py", [finding])
+
+        self.assertEqual([f.env_var for f in result.fixes], ["AWS_KEY"])
+        self.assertEqual(self.read("settings.py"), 'import os\nAWS_KEY = os.environ.get("AWS_KEY")\n')
+
+    def test_config_files_get_placeholders(self):
+        self.write("application.yml", "db:\n  password: hunter2\n  token: \"abc\"\n")
+
+        remediate_file(self.root, "application.yml", [
+            secret("application.yml", 2, "hunter2"), secret("application.yml", 3, "abc")])
+
+        self.assertEqual(self.read("application.yml"), "db:\n  password: ${PASSWORD}\n  token: \"${TOKEN}\"\n")
+
+    def test_unusual_cases_become_windows(self):
+        lines = [f"const line{i} = {i};" for i in range(1, 21)]
+        lines[9] = 'const url = "postgres://admin:s3cret@db:5432/app";'
+        self.write("db.js", "\n".join(lines) + "\n")
+
+        result = remediate_file(self.root, "db.js", [secret("db.js", 10, "s3cret", rule="Postgres")], window=2)
+
+        self.assertFalse(result.written)
+        [window] = result.windows
+        self.assertEqual((window.start, window.end, window.line), (8, 12, 10))
+        self.assertIn("10| const url", window.format())
+
+        status = apply_window_edits(self.root, [
+            WindowEdit("db.js", 8, 12, window.id, "\n".join(lines[7:9] + [
+                "const url = `postgres://admin:${process.env.DB_PASSWORD}@db:5432/app`;"] + lines[10:12])),
+            WindowEdit("db.js", 8, 12, "stale", "x"),
+        ])
+
+        self.assertEqual(status, {window.id: "applied", "stale": "rejected: the lines changed since the window was created"})
+        self.assertIn("process.env.DB_PASSWORD", self.read("db.js"))
+        self.assertEqual(len(self.read("db.js").splitlines()), 20)
+
+
+if __name__ == '__main__':
+    unittest.main()
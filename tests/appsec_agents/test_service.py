@@ -0,0 +1,105 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+import urllib.error
+import urllib.request
+from src.appsec_agents.batch import RepoOutcome
+from src.appsec_agents.service import ScanService, make_server
+
+
+class BlockingScan:
+    """Scan function that records the order of jobs and waits until released."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.started = threading.Event()
+        self.order = []
+        self.states = set()
+
+    def __call__(self, job, workspace, state):
+        state.setdefault("crew", object())
+        self.states.add(id(state["crew"]))
+        self.order.append(job.repo_url)
+        self.started.set()
+        self.release.wait(5)
+        return RepoOutcome({"clone_repository_task": 1.0}, f"scanned {job.repo_url}")
+
+
+class TestScanService(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.scan = BlockingScan()
+        self.service = ScanService(self.scan, self.root, workers=1).start()
+
+    def tearDown(self):
+        self.scan.release.set()
+        self.service.stop()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_duplicate_requests_share_one_job_and_priorities_order_the_queue(self):
+        first, _ = self.service.submit("repo-a", "c1")
+        self.scan.started.wait(5)
+        same, coalesced = self.service.submit("repo-a", "c1")
+        low, _ = self.service.submit("repo-low", "c1", priority=0)
+        high, _ = self.service.submit("repo-high", "c1", priority=5)
+        raised, coalesced_low = self.service.submit("repo-low", "c1", priority=9)
+        # A running job without a commit may have cloned an older head, so it is not joined
+        head, _ = self.service.submit("repo-a")
+        head_again, head_coalesced = self.service.submit("repo-a")
+
+        self.assertTrue(coalesced and coalesced_low and head_coalesced)
+        self.assertIs(same, first)
+        self.assertIs(raised, low)
+        self.assertIs(head_again, head)
+        self.assertEqual(first.requests, 2)
+
+        self.scan.release.set()
+        for job in (first, low, high, head):
+            self.assertTrue(self.service.wait(job, 5))
+        self.assertEqual(self.scan.order, ["repo-a", "repo-low", "repo-high", "repo-a"])
+        self.assertEqual([j.status for j in (first, low, high, head)], ["succeeded"] * 4)
+        self.assertEqual(len(self.scan.states), 1)
+        self.assertEqual(self.service.stats()["coalesced"], 3)
+        self.assertEqual(os.listdir(self.root), [])
+
+        # Finished jobs no longer coalesce
+        again, coalesced = self.service.submit("repo-a", "c1")
+        self.assertFalse(coalesced)
+
+    def test_http_api(self):
+        server = make_server(self.service, port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+
+        def post(payload):
+            request = urllib.request.Request(f"{base}/jobs", json.dumps(payload).encode(), method="POST")
+            with urllib.request.urlopen(request) as response:
+                return response.status, json.load(response)
+
+        status, job = post({"repo_url": "https://example.com/a.git", "commit": "abc"})
+        self.assertEqual((status, job["status"], job["coalesced"]), (202, "queued", False))
+        status, duplicate = post({"repo_url": "https://example.com/a.git", "commit": "abc"})
+        self.assertEqual((status, duplicate["id"], duplicate["coalesced"]), (200, job["id"], True))
+
+        self.scan.release.set()
+        with urllib.request.urlopen(f"{base}/jobs/{job['id']}?wait=5") as response:
+            result = json.load(response)
+        self.assertEqual((result["status"], result["output"]), ("succeeded", "scanned https://example.com/a.git"))
+        with urllib.request.urlopen(f"{base}/health") as response:
+            self.assertEqual(json.load(response)["succeeded"], 1)
+
+        for wait in ("soon", "-1", "nan"):
+            with self.assertRaises(urllib.error.HTTPError) as raised:
+                urllib.request.urlopen(f"{base}/jobs/{job['id']}?wait={wait}")
+            self.assertEqual(raised.exception.code, 400)
+            raised.exception.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from src.appsec_agents.tracing import Tracer, traced_tool
+
+
+class FakeTool:
+    name = "Fake Tool"
+
+    @traced_tool
+    def _run(self, text):
+        return text * 2
+
+
+class TestTracer(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.tracer = Tracer(trace_path=os.path.join(self.root, "trace.json"),
+                             metrics_path=os.path.join(self.root, "metrics.prom"), max_spans=3)
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_spans_are_exported_as_chrome_trace_and_prometheus(self):
+        with self.tracer.span("pmd", "subprocess") as span:
+            span.set("output_bytes", 10)
+        with self.assertRaises(RuntimeError):
+            with self.tracer.span("pmd", "subprocess"):
+                raise RuntimeError("boom")
+        self.tracer.record("gpt-4o", "llm", 1000.0, 2.5, model="gpt-4o", prompt_tokens=100, completion_tokens=20)
+        self.tracer.record("scan_dependencies_task", "task", 1000.0, 40.0)
+        self.tracer.export()
+
+        with open(self.tracer.trace_path) as f:
+            trace = json.load(f)
+        self.assertEqual([e["name"] for e in trace["traceEvents"]], ["pmd", "pmd", "gpt-4o"])
+        self.assertEqual(trace["otherData"]["dropped_spans"], 1)
+        self.assertEqual(trace["traceEvents"][1]["args"], {"error": "RuntimeError"})
+        self.assertEqual((trace["traceEvents"][2]["ts"], trace["traceEvents"][2]["dur"]), (1000000000, 2500000))
+
+        with open(self.tracer.metrics_path) as f:
+            metrics = f.read()
+        self.assertIn('appsec_span_duration_seconds_count{category="subprocess",name="pmd"} 2', metrics)
+        self.assertIn('appsec_span_duration_seconds_bucket{category="task",name="scan_dependencies_task",le="30"} 0',
+                      metrics)
+        self.assertIn('appsec_span_duration_seconds_bucket{category="task",name="scan_dependencies_task",le="60"} 1',
+                      metrics)
+        self.assertIn('appsec_span_errors_total{category="subprocess",name="pmd"} 1', metrics)
+        self.assertIn('appsec_span_output_bytes_total{category="subprocess",name="pmd"} 10', metrics)
+        self.assertIn('appsec_llm_tokens_total{model="gpt-4o",type="prompt"} 100', metrics)
+
+    def test_traced_tool_records_output_size(self):
+        with mock.patch.object(Tracer, "_default", self.tracer):
+            self.assertEqual(FakeTool()._run("ab"), "abab")
+        [span] = self.tracer.spans
+        self.assertEqual((span.name, span.category, span.attrs), ("Fake Tool", "tool", {"output_bytes": 4}))
+
+    def test_disabled_tracer_records_nothing(self):
+        tracer = Tracer(enabled=False)
+        with tracer.span("pmd", "subprocess") as span:
+            span.set("output_bytes", 1)
+        tracer.record("task", "task", 0, 1)
+        self.assertEqual((tracer.spans, tracer.prometheus().count("appsec_span_duration_seconds_count")), ([], 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
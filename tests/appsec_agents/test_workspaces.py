@@ -0,0 +1,150 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from src.appsec_agents.workspaces import WorkspaceManager
+
+KB = 1024
+
+
+class FakeMirrors:
+    """Stand-in for RepoMirrorCache: a 64 KB mirror per repository and a 16 KB checkout."""
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.created = []
+        self.checkouts = []
+
+    def mirror_path(self, repo_url):
+        return os.path.join(self.cache_dir, repo_url.rsplit("/", 1)[-1] + ".git")
+
+    def checkout(self, repo_url, local_path):
+        self.checkouts.append(local_path)
+        mirror = self.mirror_path(repo_url)
+        if not os.path.isdir(mirror):
+            self.created.append(repo_url)
+            os.makedirs(mirror)
+            with open(os.path.join(mirror, "pack"), "wb") as f:
+                f.write(b"\1" * 64 * KB)
+        os.makedirs(local_path)
+        with open(os.path.join(local_path, "app.py"), "wb") as f:
+            f.write(b"\1" * 16 * KB)
+
+
+class TestWorkspaceManager(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.mirrors = FakeMirrors(os.path.join(self.root, "mirrors"))
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def manager(self, quota_kb=1024):
+        return WorkspaceManager(self.root, quota_kb * KB, mirrors=self.mirrors)
+
+    def test_runs_share_the_mirror_and_workspaces_are_removed_on_release(self):
+        manager = self.manager()
+        with manager.workspace("https://example.com/org/app", "run1") as first:
+            self.assertIs(WorkspaceManager.managed(first.path), first)
+            with manager.workspace("https://example.com/org/app", "run2") as second:
+                self.assertTrue(os.path.isfile(os.path.join(second.path, "app.py")))
+                self.assertEqual(len(manager.leases()), 2)
+        self.assertFalse(os.path.exists(first.path) or os.path.exists(second.path))
+        self.assertIsNone(WorkspaceManager.managed(first.path))
+        self.assertEqual(self.mirrors.created, ["https://example.com/org/app"])
+
+        report = manager.report()
+        self.assertEqual((report["acquired"], report["mirror_reuses"], report["shared"]), (2, 1, 1))
+        self.assertEqual((report["leased"], report["mirrors"]), (0, 1))
+        self.assertEqual(report["reuse_rate"], 0.5)
+
+    def test_least_recently_used_idle_mirror_is_evicted_over_quota(self):
+        # Room for two mirrors and one workspace, not for three mirrors
+        manager = self.manager(quota_kb=200)
+        for name in ("a", "b"):
+            with manager.workspace(f"https://example.com/org/{name}", f"run-{name}"):
+                pass
+        with manager.workspace("https://example.com/org/a", "run-a2"):
+            pass
+        with manager.workspace("https://example.com/org/c", "run-c") as workspace:
+            self.assertTrue(os.path.isdir(workspace.mirror))
+            self.assertTrue(os.path.isdir(self.mirrors.mirror_path("https://example.com/org/a")))
+            self.assertFalse(os.path.isdir(self.mirrors.mirror_path("https://example.com/org/b")))
+        self.assertEqual(manager.stats.evicted, 1)
+        self.assertLessEqual(manager.usage(), 200 * KB)
+
+    def test_leases_wait_for_a_manager_in_another_process(self):
+        manager = self.manager()
+        holder = subprocess.Popen([sys.executable, "-c", (
+            "import fcntl, sys, time\n"
+            "f = open(sys.argv[1], 'a')\n"
+            "fcntl.flock(f.fileno(), fcntl.LOCK_EX)\n"
+            "print('locked', flush=True)\n"
+            "time.sleep(0.5)\n"), manager.lock_path], stdout=subprocess.PIPE, text=True)
+        self.addCleanup(holder.wait)
+        self.assertEqual(holder.stdout.readline().strip(), "locked")
+
+        started = time.monotonic()
+        with manager.workspace("https://example.com/org/app", "run1"):
+            self.assertGreaterEqual(time.monotonic() - started, 0.3)
+        holder.stdout.close()
+
+    def test_workspaces_of_dead_processes_are_reaped(self):
+        process = subprocess.Popen(["true"])
+        process.wait()
+        path = os.path.join(self.root, "runs", "crashed")
+        os.makedirs(path)
+        os.makedirs(os.path.join(self.root, "leases"))
+        with open(os.path.join(self.root, "leases", "crashed.json"), "w") as f:
+            json.dump({"run_id": "crashed", "repo_url": "https://example.com/org/app", "path": path,
+                       "mirror": self.mirrors.mirror_path("https://example.com/org/app"), "pid": process.pid}, f)
+        os.makedirs(os.path.join(self.root, "runs", "orphan"))
+
+        manager = self.manager()
+        self.assertEqual(manager.stats.reaped, 2)
+        self.assertEqual((os.listdir(manager.runs_dir), manager.leases()), ([], []))
+
+    def test_failed_run_is_resumed_on_its_kept_workspace(self):
+        with self.assertRaises(RuntimeError):
+            with self.manager().workspace("https://example.com/org/app", "run1", keep_on_error=True) as workspace:
+                with open(os.path.join(workspace.path, "progress"), "w") as f:
+                    f.write("scanned")
+                raise RuntimeError("task failed")
+
+        # The failed run's process has exited; its kept workspace is not reaped
+        process = subprocess.Popen(["true"])
+        process.wait()
+        lease_path = os.path.join(self.root, "leases", "run1.json")
+        with open(lease_path) as f:
+            lease = json.load(f)
+        with open(lease_path, "w") as f:
+            json.dump(dict(lease, pid=process.pid), f)
+
+        manager = self.manager()
+        self.assertEqual(manager.stats.reaped, 0)
+        with manager.workspace("https://example.com/org/app", "run1") as resumed:
+            self.assertEqual(resumed.path, workspace.path)
+            self.assertTrue(os.path.isfile(os.path.join(resumed.path, "progress")))
+            self.assertEqual(len(self.mirrors.checkouts), 1)
+        self.assertFalse(os.path.exists(resumed.path))
+        self.assertEqual(manager.leases(), [])
+
+    def test_kept_workspace_is_removed_on_discard(self):
+        manager = self.manager()
+        with self.assertRaises(RuntimeError):
+            with manager.workspace("https://example.com/org/app", "run1", keep_on_error=True) as workspace:
+                raise RuntimeError("task failed")
+        manager.close()
+        self.assertTrue(os.path.isdir(workspace.path))
+        manager.discard("run1")
+        self.assertFalse(os.path.exists(workspace.path))
+        self.assertEqual(manager.leases(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
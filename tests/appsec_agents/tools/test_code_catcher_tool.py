@@ -1,39 +1,64 @@
+import os
+import tempfile
 import unittest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch
 from src.appsec_agents.tools.code_catcher_tool import CodePatternMatcherTool
 
 
 class TestCodePatternMatcherTool(unittest.TestCase):
 
     def setUp(self):
-        self.tool = CodePatternMatcherTool()
-
-    @patch('subprocess.run')
-    def test_run_success(self, mock_subprocess_run):
-        mock_subprocess_run.return_value = MagicMock(
-            returncode=0, stdout='Match found', stderr='')
-        local_path = '/path/to/repo'
-        pattern = 'regex_pattern'
-        result = self.tool._run(local_path, pattern)
+        self.tool = CodePatternMatcherTool(incremental=False)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.local_path = self.tmp.name
+        self.write('app.py', 'x = eval(user_input)\nprint(x)\nexec(code); eval(y)\n')
+        self.write('vendor/lib.py', 'eval(vendored)\n')
+        self.write('image.bin', 'eval(\0binary')
+        self.write('.gitignore', 'vendor/\n')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, rel_path, content):
+        path = os.path.join(self.local_path, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(content)
+
+    def test_run_success(self):
+        result = self.tool._run(self.local_path, r'eval\(')
+        self.assertEqual(
+            result,
+            "Pattern matching completed successfully:\n"
+            "app.py:1:5: [0] x = eval(user_input)\n"
+            "app.py:3:13: [0] exec(code); eval(y)")
+
+    def test_run_multiple_patterns_in_one_pass(self):
+        result = self.tool._run(self.local_path, r'eval\(', patterns=[r'exec\('])
         self.assertEqual(
-            result, f"Pattern matching completed successfully:\nMatch found")
-
-    @patch('subprocess.run')
-    def test_run_failure(self, mock_subprocess_run):
-        mock_subprocess_run.return_value = MagicMock(
-            returncode=1, stdout='', stderr='Error message')
-        local_path = '/path/to/repo'
-        pattern = 'regex_pattern'
-        result = self.tool._run(local_path, pattern)
-        self.assertEqual(result, f"No matches found for the pattern '{
-                         pattern}' or an error occurred:\nError message")
-
-    @patch('subprocess.run')
-    def test_run_exception(self, mock_subprocess_run):
-        mock_subprocess_run.side_effect = Exception('Mocked exception')
-        local_path = '/path/to/repo'
-        pattern = 'regex_pattern'
-        result = self.tool._run(local_path, pattern)
+            result,
+            "Pattern matching completed successfully:\n"
+            "[0] eval\\(\n"
+            "[1] exec\\(\n"
+            "app.py:1:5: [0] x = eval(user_input)\n"
+            "app.py:3:1: [1] exec(code); eval(y)\n"
+            "app.py:3:13: [0] exec(code); eval(y)")
+
+    def test_run_no_match(self):
+        pattern = 'os\\.system'
+        result = self.tool._run(self.local_path, pattern)
+        self.assertEqual(result, f"No matches found for the pattern '{pattern}' or an error occurred:\n")
+
+    def test_run_truncates_results(self):
+        self.write('many.py', 'eval(1)\n' * 20)
+        tool = CodePatternMatcherTool(incremental=False, max_results=5)
+        result = tool._run(self.local_path, r'eval\(')
+        self.assertTrue(result.endswith("... 17 more matches not shown"))
+
+    @patch('src.appsec_agents.tools.code_catcher_tool.PatternEngine')
+    def test_run_exception(self, mock_engine):
+        mock_engine.side_effect = Exception('Mocked exception')
+        result = self.tool._run(self.local_path, 'regex_pattern')
         self.assertEqual(
             result, "Error running pattern matcher: Mocked exception")
 
@@ -0,0 +1,49 @@
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+from unittest import mock
+from benchmarks import fake_scanners
+from benchmarks.synthetic_repo import Scale, generate
+from src.appsec_agents.findings import parse_trufflehog
+
+
+class TestSyntheticRepo(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.repo = generate(os.path.join(self.root, "repo"), Scale("tiny", files=12, languages=3, secrets=3,
+                                                                     dependencies=20, commits=10))
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_repository_has_the_requested_shape(self):
+        count = subprocess.run(["git", "-C", self.repo.path, "rev-list", "--count", "HEAD"],
+                               capture_output=True, text=True, check=True).stdout.strip()
+        self.assertEqual(count, "10")
+        self.assertEqual(subprocess.run(["git", "-C", self.repo.path, "status", "--porcelain"],
+                                        capture_output=True, text=True).stdout, "")
+        self.assertIn("requirements.txt", self.repo.manifests)
+        for secret in self.repo.secrets:
+            if not secret.in_history_only:
+                with open(os.path.join(self.repo.path, secret.file)) as f:
+                    self.assertIn(secret.value, f.read().split("\n")[secret.line - 1])
+
+    def test_fake_trufflehog_reports_the_planted_secrets(self):
+        bin_dir = os.path.join(self.root, "bin")
+        fake_scanners.install(bin_dir)
+        with mock.patch.dict(os.environ, {"FAKE_SCANNER_STARTUP": "0"}):
+            output = subprocess.run([os.path.join(bin_dir, "trufflehog"), "filesystem", self.repo.path, "--json"],
+                                    capture_output=True, text=True, check=True).stdout
+
+        found = {(f.file, f.line) for f in parse_trufflehog(output, root=self.repo.path)}
+        planted = {(s.file, s.line) for s in self.repo.secrets if not s.in_history_only}
+        self.assertEqual(found, planted)
+        self.assertTrue(all(json.loads(line)["DetectorName"] == "AWS" for line in output.splitlines()))
+
+
+if __name__ == '__main__':
+    unittest.main()